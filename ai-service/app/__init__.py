@@ -1 +1,5 @@
 # AI Service App
+from app.tracing import install
+
+# All app.* loggers go through the non-blocking queue handler
+install()
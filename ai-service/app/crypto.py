@@ -0,0 +1,147 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.writer import BatchWriter, shared_writer
+
+log = logging.getLogger(__name__)
+
+# interval -> (bar seconds, bucket seconds, retention days or None to keep)
+BAR_INTERVALS: Dict[str, Tuple[int, int, Optional[int]]] = {
+    "1m": (60, 86400, 14),
+    "5m": (300, 7 * 86400, 90),
+    "1h": (3600, 90 * 86400, None),
+}
+MARKETS_URL = "https://api.coingecko.com/api/v3/coins/markets"
+MARKETS_PAGE_SIZE = 250
+
+
+def markets_requests(top_n: int, vs_currency: str = "usd") -> List[Dict[str, Any]]:
+    """Paged /coins/markets calls covering the top `top_n` coins by market cap."""
+    pages = max(1, -(-top_n // MARKETS_PAGE_SIZE))
+    return [
+        {
+            "source": "CoinGecko",
+            "method": "get",
+            "url": MARKETS_URL,
+            "params": {
+                "vs_currency": vs_currency,
+                "order": "market_cap_desc",
+                "per_page": min(MARKETS_PAGE_SIZE, top_n),
+                "page": page,
+                "price_change_percentage": "24h",
+            },
+        }
+        for page in range(1, pages + 1)
+    ]
+
+
+def parse_time(value: Any) -> Optional[datetime]:
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+class CryptoBars:
+    """OHLC bars for the top CoinGecko coins in a bucketed time-series layout.
+
+    Ticks are folded into the open 1m/5m/1h bar for each coin in memory, and
+    every poll queues the open bars for `crypto_bars` on the shared
+    write-behind writer: one document per (coin, interval, bucket) holding
+    `bars.<offset> = {o, h, l, c}`, so a chart is one indexed range read per
+    coin. Writes merge with what is
+    already stored (open kept, high/low widened), so a restart mid-bar loses
+    nothing. Fine-grained buckets expire via TTL.
+    """
+
+    def __init__(self, db, intervals: Optional[Iterable[str]] = None, writer: Optional[BatchWriter] = None):
+        self.collection = db["crypto_bars"]
+        self.writer = writer or shared_writer(db)
+        self.intervals = {k: BAR_INTERVALS[k] for k in (intervals or BAR_INTERVALS)}
+        self._bars: Dict[Tuple[str, str], List[Any]] = {}
+        self._last_tick: Dict[str, datetime] = {}
+        try:
+            self.collection.create_index([("coin", 1), ("interval", 1), ("bucket", 1)], name="coin_interval_bucket")
+            self.collection.create_index("expire_at", expireAfterSeconds=0, name="expire_at_ttl")
+        except Exception as e:
+            log.error("Error creating crypto bar indexes: %s", e)
+
+    def add_tick(self, coin: str, price: float, at: datetime) -> bool:
+        """Fold one price into every interval's open bar; stale repeats are ignored."""
+        last = self._last_tick.get(coin)
+        if last is not None and at <= last:
+            return False
+        self._last_tick[coin] = at
+        ts = int(at.timestamp())
+        for interval, (bar_s, _, _) in self.intervals.items():
+            start = ts - ts % bar_s
+            bar = self._bars.get((coin, interval))
+            if bar is None or bar[0] != start:
+                self._bars[(coin, interval)] = [start, price, price, price, price, True]
+            else:
+                bar[2] = max(bar[2], price)
+                bar[3] = min(bar[3], price)
+                bar[4] = price
+                bar[5] = True
+        return True
+
+    def _bar_op(self, coin: str, interval: str, bar: List[Any]) -> UpdateOne:
+        bar_s, bucket_s, keep_days = self.intervals[interval]
+        start, o, h, l, c = bar[:5]
+        bucket = start - start % bucket_s
+        bucket_at = datetime.fromtimestamp(bucket, tz=timezone.utc)
+        path = f"bars.{(start - bucket) // bar_s}"
+        ref = f"${path}"
+        fields: Dict[str, Any] = {
+            "coin": coin,
+            "interval": interval,
+            "bucket": bucket_at,
+            "bar_seconds": bar_s,
+            "updated_at": datetime.now(timezone.utc),
+            path: {
+                "o": {"$ifNull": [f"{ref}.o", o]},
+                "h": {"$max": [f"{ref}.h", h]},
+                "l": {"$min": [f"{ref}.l", l]},
+                "c": c,
+            },
+        }
+        if keep_days is not None:
+            fields["expire_at"] = bucket_at + timedelta(seconds=bucket_s, days=keep_days)
+        # Pipeline update so the stored open/high/low merge with this bar
+        return UpdateOne({"_id": f"{coin}:{interval}:{bucket}"}, [{"$set": fields}], upsert=True)
+
+    def flush(self) -> int:
+        """Queue every bar that changed since the last flush; returns bars queued."""
+        queued = 0
+        for (coin, interval), bar in self._bars.items():
+            if bar[5]:
+                self.writer.write(self.collection.name, self._bar_op(coin, interval, bar))
+                bar[5] = False
+                queued += 1
+        return queued
+
+    def ingest_markets(self, pages: Iterable[Any], now: Optional[datetime] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Fold /coins/markets pages into bars and flush; returns (coin rows, bars written)."""
+        now = now or datetime.now(timezone.utc)
+        rows: List[Dict[str, Any]] = []
+        for page in pages:
+            for row in page if isinstance(page, list) else []:
+                coin = row.get("id") if isinstance(row, dict) else None
+                price = row.get("current_price") if coin else None
+                if not isinstance(price, (int, float)):
+                    continue
+                self.add_tick(coin, float(price), parse_time(row.get("last_updated")) or now)
+                rows.append(row)
+        # Coins that dropped out of the top N stop ticking; drop their state
+        active = {r["id"] for r in rows}
+        if rows:
+            for key in [k for k in self._bars if k[0] not in active and not self._bars[k][5]]:
+                del self._bars[key]
+            for coin in [c for c in self._last_tick if c not in active]:
+                del self._last_tick[coin]
+        return rows, self.flush()
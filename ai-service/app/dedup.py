@@ -0,0 +1,150 @@
+import random
+import re
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from app.keywords import tokenize
+
+_MERSENNE = (1 << 61) - 1
+
+# Stemmed like headline tokens, so every entry matches the token it is meant to drop
+STOPWORDS = frozenset(tokenize(
+    "a an and are as at be by for from has have in into is it its of on or over "
+    "says say said that the this to up was were will with after amid new"
+))
+
+_SOURCE_PREFIX_RE = re.compile(r"^\[[^\]]+\]\s*")
+# Google News appends " - Publisher" to every headline
+_PUBLISHER_SUFFIX_RE = re.compile(r"\s+[-–|]\s+[^-–|]{2,40}$")
+
+
+def story_tokens(title: str) -> FrozenSet[str]:
+    """Content words of a headline with source prefixes and publisher suffixes removed."""
+    t = _SOURCE_PREFIX_RE.sub("", title or "")
+    t = _PUBLISHER_SUFFIX_RE.sub("", t)
+    return frozenset(tok for tok in tokenize(t) if len(tok) > 1 and tok not in STOPWORDS)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicateIndex:
+    """MinHash + LSH index of recent headlines for near-duplicate lookup.
+
+    Each headline's content-word set is reduced to a `num_perm` MinHash
+    signature, split into `bands` buckets. A lookup only compares against
+    headlines sharing at least one bucket and confirms the hit with the
+    exact Jaccard similarity, so cost stays flat as the window grows.
+    Headlines tagged with different entity sets (e.g. linked tickers) never
+    match, however similar the wording: "Apple earnings beat estimates" and
+    "Microsoft earnings beat estimates" are different stories. Entries
+    older than `window` (naive UTC, as Mongo returns them) are evicted as
+    new ones arrive.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 48, bands: int = 16, window: timedelta = timedelta(hours=48), min_tokens: int = 6):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.window = window
+        self.min_tokens = min_tokens
+        rng = random.Random(1)
+        self._perms = [(rng.randrange(1, _MERSENNE), rng.randrange(0, _MERSENNE)) for _ in range(num_perm)]
+        self._tokens: Dict[Any, FrozenSet[str]] = {}
+        self._entities: Dict[Any, FrozenSet[str]] = {}
+        self._entry_buckets: Dict[Any, List[Tuple[int, Tuple[int, ...]]]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[Any]] = {}
+        self._order: Deque[Tuple[datetime, Any]] = deque()
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def empty_like(self) -> "NearDuplicateIndex":
+        """A new, empty index with the same parameters, whose sketches are interchangeable with this one's."""
+        other = NearDuplicateIndex.__new__(NearDuplicateIndex)
+        other.__dict__.update(self.__dict__)
+        other._tokens, other._entities, other._entry_buckets, other._buckets = {}, {}, {}, {}
+        other._order = deque()
+        return other
+
+    def sketch(self, title: str) -> Optional[Tuple[FrozenSet[str], List[Tuple[int, Tuple[int, ...]]]]]:
+        """(tokens, band keys) of a headline, or None if it is too short to compare."""
+        tokens = story_tokens(title)
+        if len(tokens) < self.min_tokens:
+            return None
+        return tokens, self._band_keys(tokens)
+
+    def _signature(self, tokens: FrozenSet[str]) -> List[int]:
+        hashes = [hash(t) & _MERSENNE for t in tokens]
+        return [min((a * h + b) % _MERSENNE for h in hashes) for a, b in self._perms]
+
+    def _band_keys(self, tokens: FrozenSet[str]) -> List[Tuple[int, Tuple[int, ...]]]:
+        sig = self._signature(tokens)
+        r = self.rows
+        return [(i, tuple(sig[i * r:(i + 1) * r])) for i in range(self.bands)]
+
+    def _evict(self, now: datetime) -> None:
+        cutoff = now - self.window
+        while self._order and self._order[0][0] < cutoff:
+            _, key = self._order.popleft()
+            self._drop(key)
+
+    def _drop(self, key: Any) -> None:
+        self._tokens.pop(key, None)
+        self._entities.pop(key, None)
+        for bk in self._entry_buckets.pop(key, []):
+            members = self._buckets.get(bk)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._buckets[bk]
+
+    def lookup(self, sketch, entities: FrozenSet[str] = frozenset()) -> Optional[Any]:
+        """Key of the most similar indexed headline with the same entities, if any clears the threshold."""
+        if sketch is None:
+            return None
+        tokens, band_keys = sketch
+        candidates: Set[Any] = set()
+        for bk in band_keys:
+            candidates.update(self._buckets.get(bk, ()))
+        best, best_sim = None, self.threshold
+        for key in candidates:
+            if self._entities.get(key, frozenset()) != entities:
+                continue
+            sim = jaccard(tokens, self._tokens.get(key, frozenset()))
+            if sim >= best_sim:
+                best, best_sim = key, sim
+        return best
+
+    def query(self, title: str, entities: FrozenSet[str] = frozenset()) -> Optional[Any]:
+        return self.lookup(self.sketch(title), entities)
+
+    def add(self, key: Any, title: str, seen_at: Optional[datetime] = None, entities: FrozenSet[str] = frozenset()) -> None:
+        self.insert(key, self.sketch(title), seen_at, entities)
+
+    def insert(self, key: Any, sketch, seen_at: Optional[datetime] = None, entities: FrozenSet[str] = frozenset()) -> None:
+        if sketch is None or key in self._tokens:
+            return
+        tokens, band_keys = sketch
+        now = datetime.utcnow()
+        self._evict(now)
+        self._tokens[key] = tokens
+        self._entities[key] = frozenset(entities)
+        self._entry_buckets[key] = band_keys
+        for bk in band_keys:
+            self._buckets.setdefault(bk, set()).add(key)
+        self._order.append((seen_at or now, key))
+
+    def match_or_add(self, key: Any, title: str, seen_at: Optional[datetime] = None, entities: FrozenSet[str] = frozenset()) -> Optional[Any]:
+        """Return the key of a near-duplicate already indexed, else index `title` under `key`."""
+        sketch = self.sketch(title)
+        match = self.lookup(sketch, entities)
+        if match is None:
+            self.insert(key, sketch, seen_at, entities)
+        return match
@@ -0,0 +1,151 @@
+import logging
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.keywords import KeywordMatcher
+
+log = logging.getLogger(__name__)
+
+# Legal-form and share-class noise stripped from company names before aliasing
+_NAME_SUFFIX_RE = re.compile(
+    r"[\s,]+(inc|incorporated|corp|corporation|co|company|ltd|limited|plc|llc|lp|sa|nv|ag|se|"
+    r"holdings?|group|class [a-c]|adr|the)\.?$",
+    re.IGNORECASE,
+)
+_SYMBOL_RE = re.compile(r"(?<![A-Za-z0-9])\$?([A-Z]{2,5})(?![A-Za-z0-9])")
+
+# Well-known names that do not follow from the registered company name
+COMPANY_ALIASES: Dict[str, List[str]] = {
+    "GOOGL": ["google", "alphabet"],
+    "GOOG": ["google", "alphabet"],
+    "META": ["meta", "facebook", "instagram"],
+    "AMZN": ["amazon", "aws"],
+    "MSFT": ["microsoft"],
+    "AAPL": ["apple", "iphone"],
+    "TSLA": ["tesla"],
+    "NVDA": ["nvidia"],
+    "AMD": ["amd", "advanced micro devices"],
+    "COIN": ["coinbase"],
+    "BRK-B": ["berkshire hathaway", "berkshire"],
+    "JPM": ["jpmorgan", "jp morgan"],
+}
+
+# Names that are everyday words in headlines; only matched via an explicit alias
+AMBIGUOUS_NAMES = frozenset({
+    "target", "block", "visa", "gap", "best", "first", "general", "american", "united",
+    "national", "global", "international", "energy", "capital", "digital", "square",
+    "snow", "zoom", "plug", "apple hospitality", "match", "progressive", "southern",
+})
+
+# Upper-case tokens that look like tickers but are usually acronyms in headlines
+AMBIGUOUS_SYMBOLS = frozenset({
+    "AI", "IT", "ON", "ALL", "NOW", "CEO", "CFO", "USA", "US", "UK", "EU", "UN", "GDP",
+    "CPI", "FED", "SEC", "DOJ", "IPO", "ETF", "EV", "OPEC", "NATO", "LNG", "ECB", "BOJ",
+    "IMF", "FBI", "CIA", "TV", "PC", "AM", "PM", "OK", "GO", "BIG", "ARE", "CAN", "HAS",
+})
+
+
+def company_aliases(name: str) -> List[str]:
+    """Aliases for a registered company name: the name itself and its core without legal suffixes."""
+    name = " ".join((name or "").replace("&", " and ").split())
+    if not name:
+        return []
+    out = [name.lower()]
+    core = name
+    while True:
+        stripped = _NAME_SUFFIX_RE.sub("", core).strip(" ,.")
+        if stripped.lower().endswith(" and"):
+            stripped = stripped[:-4]
+        if stripped == core or not stripped:
+            break
+        core = stripped
+    core = core.lower()
+    if core and core not in out:
+        out.append(core)
+    return [a for a in out if len(a) >= 3 and a not in AMBIGUOUS_NAMES]
+
+
+class EntityLinker:
+    """Links headlines to tickers and sectors from the screener/fundamentals universe.
+
+    Company names and aliases are compiled into a KeywordMatcher, so linking
+    is one pass over the headline no matter how many companies are loaded;
+    upper-case symbols ("NVDA", "$TSLA") are picked up by a regex and kept
+    only if they belong to the universe. The universe is reloaded from Mongo
+    at most every `refresh_s` seconds.
+    """
+
+    def __init__(self, db, refresh_s: int = 3600):
+        self.db = db
+        self.refresh_s = refresh_s
+        self.matcher = KeywordMatcher()
+        self.sectors: Dict[str, Optional[str]] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _universe(self) -> Iterable[Tuple[str, Optional[str], Optional[str]]]:
+        """Yield (ticker, company name, sector) from screener results and fundamentals."""
+        for doc in self.db["screener_results"].find({}, {"Ticker": 1, "Company": 1, "Sector": 1}):
+            yield doc.get("Ticker"), doc.get("Company"), doc.get("Sector")
+        for doc in self.db["fundamentals"].find(
+            {"timeframe": "current"},
+            {"ticker": 1, "metrics.sector": 1, "metrics.finviz_raw.Company": 1},
+        ):
+            metrics = doc.get("metrics") or {}
+            yield doc.get("ticker"), (metrics.get("finviz_raw") or {}).get("Company"), metrics.get("sector")
+
+    def load(self, rows: Optional[Iterable[Tuple[str, Optional[str], Optional[str]]]] = None) -> int:
+        """(Re)build the name table; `rows` overrides the Mongo universe."""
+        sectors: Dict[str, Optional[str]] = {}
+        names: Dict[str, Set[str]] = {}
+        for ticker, company, sector in (rows if rows is not None else self._universe()):
+            if not isinstance(ticker, str) or not ticker:
+                continue
+            ticker = ticker.upper()
+            if sector and isinstance(sector, str) and sector.lower() != "nan":
+                sectors[ticker] = sector
+            else:
+                sectors.setdefault(ticker, None)
+            if isinstance(company, str):
+                names.setdefault(ticker, set()).update(company_aliases(company))
+        for ticker, aliases in COMPANY_ALIASES.items():
+            if ticker in sectors:
+                names.setdefault(ticker, set()).update(aliases)
+
+        matcher = KeywordMatcher(
+            (alias, ("entity", ticker)) for ticker, aliases in names.items() for alias in aliases
+        )
+        with self._lock:
+            self.matcher = matcher
+            self.sectors = sectors
+            self._loaded_at = time.monotonic()
+        return len(sectors)
+
+    def refresh_if_stale(self) -> None:
+        if time.monotonic() - self._loaded_at < self.refresh_s and self.sectors:
+            return
+        try:
+            n = self.load()
+            log.info("Entity linker: loaded %s tickers (%d names)", n, len(self.matcher))
+        except Exception as e:
+            log.error("Error loading entity universe: %s", e)
+            self._loaded_at = time.monotonic()
+
+    def link(self, text: str) -> Tuple[List[str], List[str]]:
+        """Return (tickers, sectors) mentioned in `text`, in order of first mention."""
+        matcher, sectors = self.matcher, self.sectors
+        tickers: List[str] = []
+        for _, (_, ticker) in matcher.find(text):
+            if ticker not in tickers:
+                tickers.append(ticker)
+        for sym in _SYMBOL_RE.findall(text or ""):
+            if sym in sectors and sym not in AMBIGUOUS_SYMBOLS and sym not in tickers:
+                tickers.append(sym)
+        linked_sectors: List[str] = []
+        for t in tickers:
+            sector = sectors.get(t)
+            if sector and sector not in linked_sectors:
+                linked_sectors.append(sector)
+        return tickers, linked_sectors
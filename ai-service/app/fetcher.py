@@ -0,0 +1,199 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from app.tracing import adopt, current_span, span
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without touching the network while a source's breaker is open."""
+
+
+class UpstreamHTTPError(RuntimeError):
+    def __init__(self, status: int, url: str):
+        super().__init__(f"HTTP {status} from {url}")
+        self.status = status
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failed calls.
+
+    While open every call is refused until `reset_timeout` has passed; then a
+    single half-open probe is let through, closing the breaker on success and
+    re-opening it on failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+def _retryable(exc: BaseException) -> bool:
+    if isinstance(exc, UpstreamHTTPError):
+        return exc.status == 429 or exc.status >= 500
+    return isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+class AsyncJSONFetcher:
+    """Pooled aiohttp client with per-source retries and circuit breakers.
+
+    Runs its own event loop on a daemon thread so the synchronous, scheduled
+    jobs can call `request_json()` as before, while `gather()` fetches several
+    sources concurrently over the same connection pool.
+    """
+
+    def __init__(self, user_agent: str, limit: int = 32, limit_per_host: int = 8, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0, failure_threshold: int = 3, reset_timeout: float = 300.0):
+        self.user_agent = user_agent
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="osint-fetcher", daemon=True)
+        self._thread.start()
+
+    def _breaker(self, source: str) -> CircuitBreaker:
+        br = self.breakers.get(source)
+        if br is None:
+            br = self.breakers[source] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return br
+
+    def _record(self, source: str, latency_s: float, ok: bool, attempts: int) -> None:
+        st = self.stats.setdefault(source, {"calls": 0, "errors": 0, "retries": 0, "avg_latency_ms": 0.0})
+        st["calls"] += 1
+        st["retries"] += max(0, attempts - 1)
+        if not ok:
+            st["errors"] += 1
+        ms = latency_s * 1000.0
+        st["last_latency_ms"] = round(ms, 1)
+        # Exponential moving average keeps the figure responsive to recent polls
+        st["avg_latency_ms"] = round(ms if st["calls"] == 1 else 0.8 * st["avg_latency_ms"] + 0.2 * ms, 1)
+        st["last_ok" if ok else "last_error"] = time.time()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, headers={"User-Agent": self.user_agent})
+        return self._session
+
+    async def _once(self, method: str, url: str, params, data, headers, timeout_s: float) -> Any:
+        session = await self._get_session()
+        async with session.request(
+            method.upper(), url, params=params, data=data, headers=headers,
+            timeout=aiohttp.ClientTimeout(total=timeout_s),
+        ) as resp:
+            current = current_span()
+            if current is not None:
+                current.set(status=resp.status)
+            if resp.status >= 400:
+                raise UpstreamHTTPError(resp.status, url)
+            result = await resp.json(content_type=None)
+            if current is not None and resp.content_length is not None:
+                current.add("bytes", resp.content_length)
+            return result
+
+    async def fetch_json(self, source: str, method: str, url: str, *, params: Optional[Dict[str, Any]] = None,
+                         data: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None, timeout_s: float = 20) -> Any:
+        breaker = self._breaker(source)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{source} circuit open after {breaker.failures} failures")
+        params = {k: str(v) for k, v in (params or {}).items()} or None
+        started = time.monotonic()
+        attempt = 0
+        with span("upstream", sample=f"upstream.{source}", source=source, method=method.upper(), url=url) as sp:
+            while True:
+                attempt += 1
+                sp.set(attempts=attempt)
+                try:
+                    result = await self._once(method, url, params, data, headers, timeout_s)
+                except Exception as e:
+                    if attempt <= self.max_retries and _retryable(e):
+                        # Full jitter: sleep uniformly up to the exponential cap
+                        cap = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+                        await asyncio.sleep(random.uniform(0, cap))
+                        continue
+                    breaker.record_failure()
+                    self._record(source, time.monotonic() - started, False, attempt)
+                    raise
+                breaker.record_success()
+                self._record(source, time.monotonic() - started, True, attempt)
+                return result
+
+    def run(self, coro) -> Any:
+        # Spans opened on the loop thread nest under the caller's current span
+        parent = current_span()
+
+        async def _adopted():
+            with adopt(parent):
+                return await coro
+        return asyncio.run_coroutine_threadsafe(_adopted(), self._loop).result()
+
+    def request_json(self, source: str, method: str, url: str, **kwargs) -> Any:
+        return self.run(self.fetch_json(source, method, url, **kwargs))
+
+    def gather(self, requests: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Fetch {name: {source, method, url, ...}} concurrently; failures come back as exceptions."""
+        async def _all():
+            names = list(requests)
+            results = await asyncio.gather(
+                *(self.fetch_json(**requests[n]) for n in names), return_exceptions=True
+            )
+            return dict(zip(names, results))
+        return self.run(_all())
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for source in set(self.breakers) | set(self.stats):
+            br = self.breakers.get(source)
+            out[source] = {
+                **self.stats.get(source, {}),
+                "breaker": br.state if br else CircuitBreaker.CLOSED,
+                "consecutive_failures": br.failures if br else 0,
+            }
+        return out
+
+    def close(self) -> None:
+        if self._session is not None:
+            self.run(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -1,84 +1,400 @@
+import logging
+import multiprocessing
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
 
 import pandas as pd
 import yfinance as yf
 from pymongo import MongoClient
 
+from app.memory import MemoryTracker, peak_rss_bytes, release_memory
+from app.quotecache import QuoteCache, finviz_quotes
+from app.tracing import Span, current_span, shutdown as shutdown_logging, span
+from app.writer import BatchWriter, shared_writer
+
+log = logging.getLogger(__name__)
+
+
+# Helper to parse Finviz strings (e.g. "1.50B", "2.5%", "100.00")
+def parse_finviz_val(val_str):
+    if val_str is None:
+        return None
+    if isinstance(val_str, (int, float)):
+        return float(val_str)
+    if not isinstance(val_str, str):
+        return None
+    
+    val_str = val_str.strip()
+    if val_str == '-':
+        return None
+
+    # Remove commas
+    val_str = val_str.replace(',', '')
+    
+    # Remove %
+    is_pct = False
+    if val_str.endswith('%'):
+        val_str = val_str[:-1]
+        is_pct = True
+    
+    # Handle B/M/K suffixes
+    multiplier = 1.0
+    if val_str.endswith('B'):
+        multiplier = 1_000_000_000
+        val_str = val_str[:-1]
+    elif val_str.endswith('M'):
+        multiplier = 1_000_000
+        val_str = val_str[:-1]
+    elif val_str.endswith('K'):
+        multiplier = 1_000
+        val_str = val_str[:-1]
+    
+    try:
+        val = float(val_str)
+        if is_pct:
+            val = val / 100.0 # Store 2.5% as 0.025
+        else:
+            val = val * multiplier
+        return val
+    except:
+        return None
+
+
+# Helper to clean and format DataFrame for MongoDB
+def process_yf_df(df):
+    if df is None or df.empty:
+        return []
+    # Transpose so dates are rows (list of records)
+    df_t = df.T
+    df_t.index.name = 'Date'
+    df_t = df_t.reset_index()
+    records = df_t.to_dict('records')
+    # Clean timestamps and NaNs
+    clean_records = []
+    for rec in records:
+        clean_rec = {}
+        for k, v in rec.items():
+            # Handle Date key
+            if k == 'Date':
+                if isinstance(v, (datetime, pd.Timestamp)):
+                    clean_rec['date'] = v.strftime('%Y-%m-%d')
+                else:
+                    clean_rec['date'] = str(v)
+                continue
+            
+            # Handle values
+            if pd.isna(v):
+                clean_rec[k] = None
+            else:
+                clean_rec[k] = v
+        clean_records.append(clean_rec)
+    return clean_records
+
+
+# Helper to safely get latest value from yfinance DF
+def get_latest(df, row):
+    if df is not None and not df.empty and row in df.index:
+        return df.loc[row].iloc[0] # Latest quarter
+    return 0.0
+
+
+def build_comprehensive_metrics(fund_data, q_bs, q_cf):
+    """Flatten a Finviz snapshot plus the latest yfinance quarter into the `metrics` document."""
+    market_cap = parse_finviz_val(fund_data.get('Market Cap'))
+    price = parse_finviz_val(fund_data.get('Price'))
+    
+    # Calculate metrics if not in Finviz
+    # Example: FCF Yield = FCF / Market Cap
+    fcf = get_latest(q_cf, "Free Cash Flow")
+    fcf_yield = (fcf * 4) / market_cap if market_cap and fcf else None # Annualized FCF estimate
+    
+    # Enterprise Value (Finviz usually has it, but let's calculate/check)
+    # EV = Market Cap + Total Debt - Cash
+    total_debt = get_latest(q_bs, "Total Debt")
+    cash = get_latest(q_bs, "Cash And Cash Equivalents")
+    enterprise_value = market_cap + total_debt - cash if market_cap else None
+    
+    # Create a comprehensive metrics dictionary
+    # Ensure keys match frontend exactly (lowercase, snake_case)
+    comprehensive_metrics = {
+        # --- 1. Valuation Metrics ---
+        "market_cap": parse_finviz_val(fund_data.get('Market Cap')),
+        "enterprise_value": parse_finviz_val(fund_data.get('Enterprise Value')), # Check exact key
+        "pe_ratio": parse_finviz_val(fund_data.get('P/E')),
+        "forward_pe": parse_finviz_val(fund_data.get('Forward P/E')),
+        "peg_ratio": parse_finviz_val(fund_data.get('PEG')),
+        "ps_ratio": parse_finviz_val(fund_data.get('P/S')),
+        "pb_ratio": parse_finviz_val(fund_data.get('P/B')),
+        "price_to_cash": parse_finviz_val(fund_data.get('P/C')), # Missing
+        "price_to_fcf": parse_finviz_val(fund_data.get('P/FCF')), # Missing
+        "ev_ebitda": parse_finviz_val(fund_data.get('EV/EBITDA')), # Missing (EV / EBITDA)
+        # EV/Revenue is calculated usually or in finviz as EV/Sales sometimes? Let's check finviz keys.
+        # If not present, calculate: EV / Sales
+        "ev_revenue": parse_finviz_val(fund_data.get('EV/Sales')) if fund_data.get('EV/Sales') else (
+            (enterprise_value / parse_finviz_val(fund_data.get('Sales'))) if enterprise_value and parse_finviz_val(fund_data.get('Sales')) else None
+        ), 
+
+        # --- 2. Profitability Metrics ---
+        "gross_margin": parse_finviz_val(fund_data.get('Gross Margin')),
+        "operating_margin": parse_finviz_val(fund_data.get('Oper. Margin')),
+        "profit_margin": parse_finviz_val(fund_data.get('Profit Margin')),
+        "roa": parse_finviz_val(fund_data.get('ROA')),
+        "roe": parse_finviz_val(fund_data.get('ROE')),
+        "roi": parse_finviz_val(fund_data.get('ROIC')), # Finviz uses ROIC usually
+
+        # --- 3. Growth Metrics ---
+        "eps_growth_past_5y": parse_finviz_val(fund_data.get('EPS past 3/5Y').split()[1]) if fund_data.get('EPS past 3/5Y') else None, # "6.89% 17.91%"
+        "eps_growth_next_5y": parse_finviz_val(fund_data.get('EPS next 5Y')),
+        "sales_growth_past_5y": parse_finviz_val(fund_data.get('Sales past 3/5Y').split()[1]) if fund_data.get('Sales past 3/5Y') else None,
+        "eps_growth_this_year": parse_finviz_val(fund_data.get('EPS this Y')),
+        "eps_growth_next_year": parse_finviz_val(fund_data.get('EPS next Y Percentage')), # Key is 'EPS next Y Percentage' or 'EPS next Y' (EPS next Y is value, Percentage is growth)
+        "eps_growth_qtr_over_qtr": parse_finviz_val(fund_data.get('EPS Q/Q')),
+        "sales_growth_qtr_over_qtr": parse_finviz_val(fund_data.get('Sales Q/Q')),
+        
+        # --- 4. Financial Health & Liquidity ---
+        "current_ratio": parse_finviz_val(fund_data.get('Current Ratio')),
+        "quick_ratio": parse_finviz_val(fund_data.get('Quick Ratio')),
+        "debt_to_equity": parse_finviz_val(fund_data.get('Debt/Eq')),
+        "lt_debt_to_equity": parse_finviz_val(fund_data.get('LT Debt/Eq')),
+        "total_debt": total_debt,
+        "total_cash": cash,
+        "book_value_per_share": parse_finviz_val(fund_data.get('Book/sh')),
+
+        # --- 5. Cash Flow Metrics ---
+        "operating_cash_flow": get_latest(q_cf, "Operating Cash Flow"),
+        "free_cash_flow": fcf,
+        "cash_per_share": parse_finviz_val(fund_data.get('Cash/sh')),
+
+        # --- 6. Earnings & Analyst Data ---
+        "eps_ttm": parse_finviz_val(fund_data.get('EPS (ttm)')),
+        "eps_next_q": parse_finviz_val(fund_data.get('EPS next Q')),
+        "eps_next_y": parse_finviz_val(fund_data.get('EPS next Y')),
+        "eps_surprise": parse_finviz_val(fund_data.get('EPS/Sales Surpr.').split()[0]) if fund_data.get('EPS/Sales Surpr.') else None, # "6.24% 3.88%"
+        "analyst_recom": parse_finviz_val(fund_data.get('Recom')),
+        "target_price": parse_finviz_val(fund_data.get('Target Price')),
+        "earnings_date": fund_data.get('Earnings'),
+
+        # --- 7. Dividends ---
+        "dividend_yield": parse_finviz_val(fund_data.get('Dividend Est.').split('(')[1].replace(')', '')) if '(' in (fund_data.get('Dividend Est.') or '') else parse_finviz_val(fund_data.get('Dividend TTM').split('(')[1].replace(')', '')) if '(' in (fund_data.get('Dividend TTM') or '') else None,
+        "payout_ratio": parse_finviz_val(fund_data.get('Payout')),
+        "dividend_growth": parse_finviz_val(fund_data.get('Dividend Gr. 3/5Y').split()[1]) if fund_data.get('Dividend Gr. 3/5Y') else None,
+        "ex_dividend_date": fund_data.get('Dividend Ex-Date'),
+
+        # --- 8. Ownership & Share Structure ---
+        "insider_own": parse_finviz_val(fund_data.get('Insider Own')),
+        "inst_own": parse_finviz_val(fund_data.get('Inst Own')),
+        "insider_trans": parse_finviz_val(fund_data.get('Insider Trans')),
+        "inst_trans": parse_finviz_val(fund_data.get('Inst Trans')),
+        "float_shares": parse_finviz_val(fund_data.get('Shs Float')),
+        "shares_outstanding": parse_finviz_val(fund_data.get('Shs Outstand')),
+        "short_float": parse_finviz_val(fund_data.get('Short Float')),
+        "short_ratio": parse_finviz_val(fund_data.get('Short Ratio')),
+
+        # --- 9. Risk & Volatility ---
+        "beta": parse_finviz_val(fund_data.get('Beta')),
+        "volatility_week": parse_finviz_val(fund_data.get('Volatility W')), # Direct key
+        "volatility_month": parse_finviz_val(fund_data.get('Volatility M')), # Direct key
+        "atr": parse_finviz_val(fund_data.get('ATR (14)')), # Direct key
+
+        # --- 10. Trading Liquidity ---
+        "avg_volume": parse_finviz_val(fund_data.get('Avg Volume')),
+        "rel_volume": parse_finviz_val(fund_data.get('Rel Volume')),
+
+        # --- 11. Company Information ---
+        "sector": fund_data.get('Sector'),
+        "industry": fund_data.get('Industry'),
+        "country": fund_data.get('Country'),
+        "exchange": fund_data.get('Exchange'),
+        "ipo_date": fund_data.get('IPO'),
+        "employees": parse_finviz_val(fund_data.get('Employees')),
+        
+        # --- PART 2: Advanced Calculated Ratios ---
+        
+        # A. Valuation & Yield Ratios
+        "earnings_yield": (1.0 / parse_finviz_val(fund_data.get('P/E'))) if parse_finviz_val(fund_data.get('P/E')) else None,
+        "forward_earnings_yield": (1.0 / parse_finviz_val(fund_data.get('Forward P/E'))) if parse_finviz_val(fund_data.get('Forward P/E')) else None,
+        "fcf_yield": fcf_yield,
+        # Operating Cash Flow Yield = OCF / Market Cap
+        "ocf_yield": (get_latest(q_cf, "Operating Cash Flow") * 4 / market_cap) if market_cap and get_latest(q_cf, "Operating Cash Flow") else None,
+        # EBITDA Yield = EBITDA / Enterprise Value (Inverse of EV/EBITDA)
+        "ebitda_yield": (1.0 / parse_finviz_val(fund_data.get('EV/EBITDA'))) if parse_finviz_val(fund_data.get('EV/EBITDA')) else None,
+        "revenue_yield": (parse_finviz_val(fund_data.get('Sales')) / enterprise_value) if enterprise_value and parse_finviz_val(fund_data.get('Sales')) else None,
+        # Book-to-Market = 1 / (P/B)
+        "book_to_market": (1.0 / parse_finviz_val(fund_data.get('P/B'))) if parse_finviz_val(fund_data.get('P/B')) else None,
+        # PEG Adjusted Yield (Earnings Yield / Growth) -> Kind of inverse PEG? Or PEG is P/E / Growth. 
+        # Formula given: Earnings Yield / Growth Rate. 
+        # Earnings Yield = E/P. Growth = G. Ratio = (E/P)/G = E/(P*G).
+        # PEG = (P/E)/G = P/(E*G). 
+        # So this is 1/PEG * (1/E^2)? No.
+        # Let's stick to literal: (1/PE) / (EPS this Y / 100)
+        "price_to_growth_adj_yield": ((1.0 / parse_finviz_val(fund_data.get('P/E'))) / parse_finviz_val(fund_data.get('EPS this Y'))) if parse_finviz_val(fund_data.get('P/E')) and parse_finviz_val(fund_data.get('EPS this Y')) else None,
+
+        # B. Profitability & Efficiency
+        "asset_turnover": (parse_finviz_val(fund_data.get('Sales')) / get_latest(q_bs, "Total Assets")) if get_latest(q_bs, "Total Assets") else None,
+        # Operating Efficiency = Operating Income / Revenue (Same as Operating Margin)
+        "operating_efficiency": parse_finviz_val(fund_data.get('Oper. Margin')), 
+        # ROIC (Finviz has it)
+        "roic": parse_finviz_val(fund_data.get('ROIC')),
+        # CROIC = FCF / Invested Capital. Invested Capital ~ Total Equity + Total Debt - Cash? Or just Equity + Debt.
+        # Let's use Equity + Debt.
+        "croic": (fcf * 4 / (parse_finviz_val(fund_data.get('Market Cap')) / parse_finviz_val(fund_data.get('P/B')) + total_debt)) if parse_finviz_val(fund_data.get('P/B')) and total_debt else None, # Approx
+        
+        # C. Growth & Quality
+        # SGR = ROE * (1 - Payout)
+        "sgr": (parse_finviz_val(fund_data.get('ROE')) * (1 - (parse_finviz_val(fund_data.get('Payout')) or 0))) if parse_finviz_val(fund_data.get('ROE')) else None,
+        
+        # D. Leverage & Risk
+        "net_debt_to_ebitda": ((total_debt - cash) / (parse_finviz_val(fund_data.get('Enterprise Value')) / parse_finviz_val(fund_data.get('EV/EBITDA')))) if parse_finviz_val(fund_data.get('EV/EBITDA')) else None, # Deriving EBITDA from EV/EBITDA
+        "liquidity_cushion": (cash / total_debt) if total_debt and total_debt > 0 else None,
+
+        # --- PART 2: Missing Advanced Ratios ---
+        
+        # 13. Gross Profit Efficiency = Gross Profit / Assets
+        # Gross Profit = Revenue * Gross Margin
+        "gross_profit_efficiency": ((parse_finviz_val(fund_data.get('Sales')) * parse_finviz_val(fund_data.get('Gross Margin'))) / get_latest(q_bs, "Total Assets")) if parse_finviz_val(fund_data.get('Sales')) and parse_finviz_val(fund_data.get('Gross Margin')) and get_latest(q_bs, "Total Assets") else None,
+
+        # 15. Earnings Growth Efficiency = EPS Growth / PEG
+        "earnings_growth_efficiency": (parse_finviz_val(fund_data.get('EPS this Y')) / parse_finviz_val(fund_data.get('PEG'))) if parse_finviz_val(fund_data.get('PEG')) and parse_finviz_val(fund_data.get('EPS this Y')) else None,
+
+        # 16. Revenue-to-Earnings Growth Ratio = Revenue Growth / EPS Growth
+        "revenue_to_earnings_growth": (parse_finviz_val(fund_data.get('Sales Q/Q')) / parse_finviz_val(fund_data.get('EPS Q/Q'))) if parse_finviz_val(fund_data.get('EPS Q/Q')) and parse_finviz_val(fund_data.get('Sales Q/Q')) else None,
+
+        # 17. Cash Conversion Ratio = Operating Cash Flow / Net Income
+        "cash_conversion_ratio": (get_latest(q_cf, "Operating Cash Flow") / parse_finviz_val(fund_data.get('Income'))) if parse_finviz_val(fund_data.get('Income')) and get_latest(q_cf, "Operating Cash Flow") else None,
+
+        # 18. Free Cash Flow Conversion = Free Cash Flow / Net Income
+        "fcf_conversion": (fcf / parse_finviz_val(fund_data.get('Income'))) if parse_finviz_val(fund_data.get('Income')) and fcf else None,
+
+        # 20. Debt Service Ratio = Operating Cash Flow / Total Debt
+        "debt_service_ratio": (get_latest(q_cf, "Operating Cash Flow") / total_debt) if total_debt and get_latest(q_cf, "Operating Cash Flow") else None,
+
+        # 21. Financial Leverage Ratio = Total Assets / Equity
+        # Equity = Market Cap / P/B ? Or Total Assets - Total Liab. Let's use Assets / (Assets - Liab)
+        "financial_leverage_ratio": (get_latest(q_bs, "Total Assets") / (get_latest(q_bs, "Total Assets") - get_latest(q_bs, "Total Liabilities Net Minority Interest"))) if get_latest(q_bs, "Total Assets") and get_latest(q_bs, "Total Liabilities Net Minority Interest") and (get_latest(q_bs, "Total Assets") - get_latest(q_bs, "Total Liabilities Net Minority Interest")) != 0 else None,
+
+        # 22. Leverage Adjusted Volatility = Beta × Debt to Equity
+        "leverage_adjusted_volatility": (parse_finviz_val(fund_data.get('Beta')) * parse_finviz_val(fund_data.get('Debt/Eq'))) if parse_finviz_val(fund_data.get('Beta')) and parse_finviz_val(fund_data.get('Debt/Eq')) else None,
+
+        # 24. Shareholder Yield = Dividend Yield + Buyback Yield
+        # Buyback Yield approx = - (Repurchase of Capital Stock / Market Cap)
+        # We need Repurchase of Capital Stock from Cash Flow.
+        "shareholder_yield": (
+            (parse_finviz_val(fund_data.get('Dividend %')) or 0) + 
+            ((abs(get_latest(q_cf, "Repurchase Of Capital Stock")) * 4 / market_cap) if market_cap and get_latest(q_cf, "Repurchase Of Capital Stock") else 0)
+        ) if market_cap else None,
+
+        # 25. Retention Ratio = 1 - Dividend Payout Ratio
+        "retention_ratio": (1 - parse_finviz_val(fund_data.get('Payout'))) if parse_finviz_val(fund_data.get('Payout')) else None,
+
+        # 26. Reinvestment Rate = (Capital Expenditure) / Operating Cash Flow
+        "reinvestment_rate": (abs(get_latest(q_cf, "Capital Expenditure")) / get_latest(q_cf, "Operating Cash Flow")) if get_latest(q_cf, "Operating Cash Flow") and get_latest(q_cf, "Capital Expenditure") else None,
+
+        # 27. Capital Efficiency = Revenue Growth / Capital Investment (Capex/Sales?) -> Formula says Revenue Growth / Capital Investment.
+        # Let's assume Capital Investment ~ Capex.
+        "capital_efficiency": (parse_finviz_val(fund_data.get('Sales Q/Q')) / (abs(get_latest(q_cf, "Capital Expenditure")) / parse_finviz_val(fund_data.get('Sales')))) if parse_finviz_val(fund_data.get('Sales')) and get_latest(q_cf, "Capital Expenditure") and parse_finviz_val(fund_data.get('Sales Q/Q')) else None,
+
+        # 28. Insider Buying Intensity = Insider Purchases / Shares Outstanding
+        # Proxy: Insider Trans % (Net)
+        "insider_buying_intensity": parse_finviz_val(fund_data.get('Insider Trans')),
+
+        # 29. Institutional Accumulation Score = Change in Institutional Ownership
+        # Proxy: Inst Trans %
+        "institutional_accumulation": parse_finviz_val(fund_data.get('Inst Trans')),
+
+        # 30. Float Turnover Ratio = Volume / Float
+        "float_turnover": (parse_finviz_val(fund_data.get('Volume')) / parse_finviz_val(fund_data.get('Shs Float'))) if parse_finviz_val(fund_data.get('Shs Float')) and parse_finviz_val(fund_data.get('Volume')) else None,
+
+        # 31. Volatility-to-Liquidity Ratio = ATR / Average Volume
+        "volatility_liquidity_ratio": (parse_finviz_val(fund_data.get('ATR (14)')) / parse_finviz_val(fund_data.get('Avg Volume'))) if parse_finviz_val(fund_data.get('Avg Volume')) and parse_finviz_val(fund_data.get('ATR (14)')) else None,
+
+        # 32. Turnover Stability = Average Volume / Shares Outstanding
+        "turnover_stability": (parse_finviz_val(fund_data.get('Avg Volume')) / parse_finviz_val(fund_data.get('Shs Outstand'))) if parse_finviz_val(fund_data.get('Shs Outstand')) and parse_finviz_val(fund_data.get('Avg Volume')) else None,
+
+        # --- Composite Scores (Normalized 0-100 approximations) ---
+        # 33. Value Score (Earnings Yield, FCF Yield, Book-to-Market)
+        "value_score": (
+            ((1.0/parse_finviz_val(fund_data.get('P/E')) if parse_finviz_val(fund_data.get('P/E')) else 0) * 100 * 0.4) + 
+            ((fcf_yield or 0) * 100 * 0.4) + 
+            ((1.0/parse_finviz_val(fund_data.get('P/B')) if parse_finviz_val(fund_data.get('P/B')) else 0) * 100 * 0.2)
+        ) if fcf_yield is not None else None,
+
+        # 34. Quality Score (ROE, Margins, Debt)
+        "quality_score": (
+            ((parse_finviz_val(fund_data.get('ROE')) or 0) * 100 * 0.4) +
+            ((parse_finviz_val(fund_data.get('Profit Margin')) or 0) * 100 * 0.4) - 
+            ((parse_finviz_val(fund_data.get('Debt/Eq')) or 0) * 10 * 0.2)
+        ),
+
+        # 35. Growth Score (Rev Growth, EPS Growth)
+        "growth_score": (
+            ((parse_finviz_val(fund_data.get('Sales Q/Q')) or 0) * 100 * 0.5) +
+            ((parse_finviz_val(fund_data.get('EPS Q/Q')) or 0) * 100 * 0.5)
+        ),
+
+        # 36. Low Risk Score (Beta, Volatility) - Inverse
+        "low_risk_score": (
+            (1.0 / (parse_finviz_val(fund_data.get('Beta')) or 1.0)) * 50 +
+            (1.0 / (parse_finviz_val(fund_data.get('ATR')) or 1.0)) * 50
+        ),
+
+        # 37. Risk-Adjusted Return = Expected Return (say, ROE) / Volatility (ATR normalized?)
+        "risk_adjusted_return": (
+            (parse_finviz_val(fund_data.get('ROE')) or 0) / (parse_finviz_val(fund_data.get('Volatility M')) if fund_data.get('Volatility M') else 0.01)
+        ) if fund_data.get('Volatility M') else None,
+        
+        # 38. Fundamental Risk Score = Debt + Volatility + Earnings Stability (Use Debt/Eq + Beta)
+        "fundamental_risk_score": (
+            (parse_finviz_val(fund_data.get('Debt/Eq')) or 0) + 
+            (parse_finviz_val(fund_data.get('Beta')) or 0)
+        ),
+
+        # Missing Part 1
+        "headquarters": fund_data.get('Country'), # Actually Finviz often puts HQ in Country or separate. Finviz finance has 'Country' which is HQ usually.
+
+        # Raw Finviz Data (Backup)
+        "finviz_raw": fund_data
+    }
+    return comprehensive_metrics
+
 
 class FundamentalsModule:
-    def __init__(self, db):
+    def __init__(self, db, quotes: Optional[QuoteCache] = None, writer: Optional[BatchWriter] = None):
         self.collection = db["fundamentals"]
-        print("Initialized Fundamentals Module")
+        # Extracted Finviz quote-page tables, shared with the news job
+        self.quotes = quotes or finviz_quotes
+        # Per-ticker snapshots are written behind, so the next download starts immediately
+        self.writer = writer or shared_writer(db)
+        # Bounded-memory mode drops each cached quote page as soon as it is used
+        self.release_quotes = False
+        log.info("Initialized Fundamentals Module")
 
     def fetch_fundamentals_for_symbol(self, ticker):
-        print(f"[{datetime.now()}] Fetching fundamentals for {ticker} via finvizfinance and yfinance...", flush=True)
+        with span("fundamentals.ticker", ticker=ticker) as sp:
+            self._fetch_symbol(ticker, sp)
+
+    def _fetch_symbol(self, ticker: str, sp: Span) -> None:
         try:
             # --- 1. Finviz Fundamentals (Part 1 - Raw Fundamentals) ---
             # Using finvizfinance.quote to get extensive fundamental table
-            from finvizfinance.quote import finvizfinance
-            
             fund_data = {}
             try:
-                # Add a small delay to avoid rate limiting
-                import time
-                time.sleep(1)
-                
-                stock_finviz = finvizfinance(ticker)
-                fund_data = stock_finviz.ticker_fundament()
-                print(f"Finviz data fetched for {ticker}: {len(fund_data)} fields. Sample Keys: {list(fund_data.keys())[:10]}", flush=True)
+                # Cached/shared quote page tables; the cache paces real downloads
+                fund_data = self.quotes.get(ticker)["fundament"]
+                if self.release_quotes:
+                    self.quotes.invalidate(ticker)
+                if fund_data is None:
+                    raise ValueError("no fundamentals table on the quote page")
+                sp.set(finviz_fields=len(fund_data))
             except Exception as e:
-                print(f"Finviz fetch failed for {ticker}: {e}", flush=True)
+                sp.set(finviz_error=f"{type(e).__name__}: {e}")
+                log.warning("Finviz fetch failed for %s: %s", ticker, e)
                 # Continue with yfinance even if finviz fails
             
             # Map Finviz keys to our schema
             # We will store the raw Finviz dictionary directly under 'finviz_raw' 
             # and also map key metrics to top-level fields for easier access.
             
-            # Helper to parse Finviz strings (e.g. "1.50B", "2.5%", "100.00")
-            def parse_finviz_val(val_str):
-                if val_str is None:
-                    return None
-                if isinstance(val_str, (int, float)):
-                    return float(val_str)
-                if not isinstance(val_str, str):
-                    return None
-                
-                val_str = val_str.strip()
-                if val_str == '-':
-                    return None
-
-                # Remove commas
-                val_str = val_str.replace(',', '')
-                
-                # Remove %
-                is_pct = False
-                if val_str.endswith('%'):
-                    val_str = val_str[:-1]
-                    is_pct = True
-                
-                # Handle B/M/K suffixes
-                multiplier = 1.0
-                if val_str.endswith('B'):
-                    multiplier = 1_000_000_000
-                    val_str = val_str[:-1]
-                elif val_str.endswith('M'):
-                    multiplier = 1_000_000
-                    val_str = val_str[:-1]
-                elif val_str.endswith('K'):
-                    multiplier = 1_000
-                    val_str = val_str[:-1]
-                
-                try:
-                    val = float(val_str)
-                    if is_pct:
-                        val = val / 100.0 # Store 2.5% as 0.025
-                    else:
-                        val = val * multiplier
-                    return val
-                except:
-                    return None
-
             # --- 2. yfinance Quarterly Data (for time-series/growth) ---
             stock_yf = yf.Ticker(ticker)
             q_fin = stock_yf.quarterly_financials
@@ -90,36 +406,6 @@ class FundamentalsModule:
             a_bs = stock_yf.balance_sheet
             a_cf = stock_yf.cashflow
             
-            # Helper to clean and format DataFrame for MongoDB
-            def process_yf_df(df):
-                if df is None or df.empty:
-                    return []
-                # Transpose so dates are rows (list of records)
-                df_t = df.T
-                df_t.index.name = 'Date'
-                df_t = df_t.reset_index()
-                records = df_t.to_dict('records')
-                # Clean timestamps and NaNs
-                clean_records = []
-                for rec in records:
-                    clean_rec = {}
-                    for k, v in rec.items():
-                        # Handle Date key
-                        if k == 'Date':
-                            if isinstance(v, (datetime, pd.Timestamp)):
-                                clean_rec['date'] = v.strftime('%Y-%m-%d')
-                            else:
-                                clean_rec['date'] = str(v)
-                            continue
-                        
-                        # Handle values
-                        if pd.isna(v):
-                            clean_rec[k] = None
-                        else:
-                            clean_rec[k] = v
-                    clean_records.append(clean_rec)
-                return clean_records
-
             financials_annual = process_yf_df(a_fin)
             balance_sheet_annual = process_yf_df(a_bs)
             cashflow_annual = process_yf_df(a_cf)
@@ -153,266 +439,7 @@ class FundamentalsModule:
             # We need values to calculate ratios. We'll use the latest TTM or Quarterly data from yfinance 
             # combined with market price/cap from Finviz.
             
-            market_cap = parse_finviz_val(fund_data.get('Market Cap'))
-            price = parse_finviz_val(fund_data.get('Price'))
-            
-            # Helper to safely get latest value from yfinance DF
-            def get_latest(df, row):
-                if df is not None and not df.empty and row in df.index:
-                    return df.loc[row].iloc[0] # Latest quarter
-                return 0.0
-
-            # Calculate metrics if not in Finviz
-            # Example: FCF Yield = FCF / Market Cap
-            fcf = get_latest(q_cf, "Free Cash Flow")
-            fcf_yield = (fcf * 4) / market_cap if market_cap and fcf else None # Annualized FCF estimate
-            
-            # Enterprise Value (Finviz usually has it, but let's calculate/check)
-            # EV = Market Cap + Total Debt - Cash
-            total_debt = get_latest(q_bs, "Total Debt")
-            cash = get_latest(q_bs, "Cash And Cash Equivalents")
-            enterprise_value = market_cap + total_debt - cash if market_cap else None
-            
-            # Create a comprehensive metrics dictionary
-            # Ensure keys match frontend exactly (lowercase, snake_case)
-            comprehensive_metrics = {
-                # --- 1. Valuation Metrics ---
-                "market_cap": parse_finviz_val(fund_data.get('Market Cap')),
-                "enterprise_value": parse_finviz_val(fund_data.get('Enterprise Value')), # Check exact key
-                "pe_ratio": parse_finviz_val(fund_data.get('P/E')),
-                "forward_pe": parse_finviz_val(fund_data.get('Forward P/E')),
-                "peg_ratio": parse_finviz_val(fund_data.get('PEG')),
-                "ps_ratio": parse_finviz_val(fund_data.get('P/S')),
-                "pb_ratio": parse_finviz_val(fund_data.get('P/B')),
-                "price_to_cash": parse_finviz_val(fund_data.get('P/C')), # Missing
-                "price_to_fcf": parse_finviz_val(fund_data.get('P/FCF')), # Missing
-                "ev_ebitda": parse_finviz_val(fund_data.get('EV/EBITDA')), # Missing (EV / EBITDA)
-                # EV/Revenue is calculated usually or in finviz as EV/Sales sometimes? Let's check finviz keys.
-                # If not present, calculate: EV / Sales
-                "ev_revenue": parse_finviz_val(fund_data.get('EV/Sales')) if fund_data.get('EV/Sales') else (
-                    (enterprise_value / parse_finviz_val(fund_data.get('Sales'))) if enterprise_value and parse_finviz_val(fund_data.get('Sales')) else None
-                ), 
-
-                # --- 2. Profitability Metrics ---
-                "gross_margin": parse_finviz_val(fund_data.get('Gross Margin')),
-                "operating_margin": parse_finviz_val(fund_data.get('Oper. Margin')),
-                "profit_margin": parse_finviz_val(fund_data.get('Profit Margin')),
-                "roa": parse_finviz_val(fund_data.get('ROA')),
-                "roe": parse_finviz_val(fund_data.get('ROE')),
-                "roi": parse_finviz_val(fund_data.get('ROIC')), # Finviz uses ROIC usually
-
-                # --- 3. Growth Metrics ---
-                "eps_growth_past_5y": parse_finviz_val(fund_data.get('EPS past 3/5Y').split()[1]) if fund_data.get('EPS past 3/5Y') else None, # "6.89% 17.91%"
-                "eps_growth_next_5y": parse_finviz_val(fund_data.get('EPS next 5Y')),
-                "sales_growth_past_5y": parse_finviz_val(fund_data.get('Sales past 3/5Y').split()[1]) if fund_data.get('Sales past 3/5Y') else None,
-                "eps_growth_this_year": parse_finviz_val(fund_data.get('EPS this Y')),
-                "eps_growth_next_year": parse_finviz_val(fund_data.get('EPS next Y Percentage')), # Key is 'EPS next Y Percentage' or 'EPS next Y' (EPS next Y is value, Percentage is growth)
-                "eps_growth_qtr_over_qtr": parse_finviz_val(fund_data.get('EPS Q/Q')),
-                "sales_growth_qtr_over_qtr": parse_finviz_val(fund_data.get('Sales Q/Q')),
-                
-                # --- 4. Financial Health & Liquidity ---
-                "current_ratio": parse_finviz_val(fund_data.get('Current Ratio')),
-                "quick_ratio": parse_finviz_val(fund_data.get('Quick Ratio')),
-                "debt_to_equity": parse_finviz_val(fund_data.get('Debt/Eq')),
-                "lt_debt_to_equity": parse_finviz_val(fund_data.get('LT Debt/Eq')),
-                "total_debt": total_debt,
-                "total_cash": cash,
-                "book_value_per_share": parse_finviz_val(fund_data.get('Book/sh')),
-
-                # --- 5. Cash Flow Metrics ---
-                "operating_cash_flow": get_latest(q_cf, "Operating Cash Flow"),
-                "free_cash_flow": fcf,
-                "cash_per_share": parse_finviz_val(fund_data.get('Cash/sh')),
-
-                # --- 6. Earnings & Analyst Data ---
-                "eps_ttm": parse_finviz_val(fund_data.get('EPS (ttm)')),
-                "eps_next_q": parse_finviz_val(fund_data.get('EPS next Q')),
-                "eps_next_y": parse_finviz_val(fund_data.get('EPS next Y')),
-                "eps_surprise": parse_finviz_val(fund_data.get('EPS/Sales Surpr.').split()[0]) if fund_data.get('EPS/Sales Surpr.') else None, # "6.24% 3.88%"
-                "analyst_recom": parse_finviz_val(fund_data.get('Recom')),
-                "target_price": parse_finviz_val(fund_data.get('Target Price')),
-                "earnings_date": fund_data.get('Earnings'),
-
-                # --- 7. Dividends ---
-                "dividend_yield": parse_finviz_val(fund_data.get('Dividend Est.').split('(')[1].replace(')', '')) if '(' in (fund_data.get('Dividend Est.') or '') else parse_finviz_val(fund_data.get('Dividend TTM').split('(')[1].replace(')', '')) if '(' in (fund_data.get('Dividend TTM') or '') else None,
-                "payout_ratio": parse_finviz_val(fund_data.get('Payout')),
-                "dividend_growth": parse_finviz_val(fund_data.get('Dividend Gr. 3/5Y').split()[1]) if fund_data.get('Dividend Gr. 3/5Y') else None,
-                "ex_dividend_date": fund_data.get('Dividend Ex-Date'),
-
-                # --- 8. Ownership & Share Structure ---
-                "insider_own": parse_finviz_val(fund_data.get('Insider Own')),
-                "inst_own": parse_finviz_val(fund_data.get('Inst Own')),
-                "insider_trans": parse_finviz_val(fund_data.get('Insider Trans')),
-                "inst_trans": parse_finviz_val(fund_data.get('Inst Trans')),
-                "float_shares": parse_finviz_val(fund_data.get('Shs Float')),
-                "shares_outstanding": parse_finviz_val(fund_data.get('Shs Outstand')),
-                "short_float": parse_finviz_val(fund_data.get('Short Float')),
-                "short_ratio": parse_finviz_val(fund_data.get('Short Ratio')),
-
-                # --- 9. Risk & Volatility ---
-                "beta": parse_finviz_val(fund_data.get('Beta')),
-                "volatility_week": parse_finviz_val(fund_data.get('Volatility W')), # Direct key
-                "volatility_month": parse_finviz_val(fund_data.get('Volatility M')), # Direct key
-                "atr": parse_finviz_val(fund_data.get('ATR (14)')), # Direct key
-
-                # --- 10. Trading Liquidity ---
-                "avg_volume": parse_finviz_val(fund_data.get('Avg Volume')),
-                "rel_volume": parse_finviz_val(fund_data.get('Rel Volume')),
-
-                # --- 11. Company Information ---
-                "sector": fund_data.get('Sector'),
-                "industry": fund_data.get('Industry'),
-                "country": fund_data.get('Country'),
-                "exchange": fund_data.get('Exchange'),
-                "ipo_date": fund_data.get('IPO'),
-                "employees": parse_finviz_val(fund_data.get('Employees')),
-                
-                # --- PART 2: Advanced Calculated Ratios ---
-                
-                # A. Valuation & Yield Ratios
-                "earnings_yield": (1.0 / parse_finviz_val(fund_data.get('P/E'))) if parse_finviz_val(fund_data.get('P/E')) else None,
-                "forward_earnings_yield": (1.0 / parse_finviz_val(fund_data.get('Forward P/E'))) if parse_finviz_val(fund_data.get('Forward P/E')) else None,
-                "fcf_yield": fcf_yield,
-                # Operating Cash Flow Yield = OCF / Market Cap
-                "ocf_yield": (get_latest(q_cf, "Operating Cash Flow") * 4 / market_cap) if market_cap and get_latest(q_cf, "Operating Cash Flow") else None,
-                # EBITDA Yield = EBITDA / Enterprise Value (Inverse of EV/EBITDA)
-                "ebitda_yield": (1.0 / parse_finviz_val(fund_data.get('EV/EBITDA'))) if parse_finviz_val(fund_data.get('EV/EBITDA')) else None,
-                "revenue_yield": (parse_finviz_val(fund_data.get('Sales')) / enterprise_value) if enterprise_value and parse_finviz_val(fund_data.get('Sales')) else None,
-                # Book-to-Market = 1 / (P/B)
-                "book_to_market": (1.0 / parse_finviz_val(fund_data.get('P/B'))) if parse_finviz_val(fund_data.get('P/B')) else None,
-                # PEG Adjusted Yield (Earnings Yield / Growth) -> Kind of inverse PEG? Or PEG is P/E / Growth. 
-                # Formula given: Earnings Yield / Growth Rate. 
-                # Earnings Yield = E/P. Growth = G. Ratio = (E/P)/G = E/(P*G).
-                # PEG = (P/E)/G = P/(E*G). 
-                # So this is 1/PEG * (1/E^2)? No.
-                # Let's stick to literal: (1/PE) / (EPS this Y / 100)
-                "price_to_growth_adj_yield": ((1.0 / parse_finviz_val(fund_data.get('P/E'))) / parse_finviz_val(fund_data.get('EPS this Y'))) if parse_finviz_val(fund_data.get('P/E')) and parse_finviz_val(fund_data.get('EPS this Y')) else None,
-
-                # B. Profitability & Efficiency
-                "asset_turnover": (parse_finviz_val(fund_data.get('Sales')) / get_latest(q_bs, "Total Assets")) if get_latest(q_bs, "Total Assets") else None,
-                # Operating Efficiency = Operating Income / Revenue (Same as Operating Margin)
-                "operating_efficiency": parse_finviz_val(fund_data.get('Oper. Margin')), 
-                # ROIC (Finviz has it)
-                "roic": parse_finviz_val(fund_data.get('ROIC')),
-                # CROIC = FCF / Invested Capital. Invested Capital ~ Total Equity + Total Debt - Cash? Or just Equity + Debt.
-                # Let's use Equity + Debt.
-                "croic": (fcf * 4 / (parse_finviz_val(fund_data.get('Market Cap')) / parse_finviz_val(fund_data.get('P/B')) + total_debt)) if parse_finviz_val(fund_data.get('P/B')) and total_debt else None, # Approx
-                
-                # C. Growth & Quality
-                # SGR = ROE * (1 - Payout)
-                "sgr": (parse_finviz_val(fund_data.get('ROE')) * (1 - (parse_finviz_val(fund_data.get('Payout')) or 0))) if parse_finviz_val(fund_data.get('ROE')) else None,
-                
-                # D. Leverage & Risk
-                "net_debt_to_ebitda": ((total_debt - cash) / (parse_finviz_val(fund_data.get('Enterprise Value')) / parse_finviz_val(fund_data.get('EV/EBITDA')))) if parse_finviz_val(fund_data.get('EV/EBITDA')) else None, # Deriving EBITDA from EV/EBITDA
-                "liquidity_cushion": (cash / total_debt) if total_debt and total_debt > 0 else None,
-
-                # --- PART 2: Missing Advanced Ratios ---
-                
-                # 13. Gross Profit Efficiency = Gross Profit / Assets
-                # Gross Profit = Revenue * Gross Margin
-                "gross_profit_efficiency": ((parse_finviz_val(fund_data.get('Sales')) * parse_finviz_val(fund_data.get('Gross Margin'))) / get_latest(q_bs, "Total Assets")) if parse_finviz_val(fund_data.get('Sales')) and parse_finviz_val(fund_data.get('Gross Margin')) and get_latest(q_bs, "Total Assets") else None,
-
-                # 15. Earnings Growth Efficiency = EPS Growth / PEG
-                "earnings_growth_efficiency": (parse_finviz_val(fund_data.get('EPS this Y')) / parse_finviz_val(fund_data.get('PEG'))) if parse_finviz_val(fund_data.get('PEG')) and parse_finviz_val(fund_data.get('EPS this Y')) else None,
-
-                # 16. Revenue-to-Earnings Growth Ratio = Revenue Growth / EPS Growth
-                "revenue_to_earnings_growth": (parse_finviz_val(fund_data.get('Sales Q/Q')) / parse_finviz_val(fund_data.get('EPS Q/Q'))) if parse_finviz_val(fund_data.get('EPS Q/Q')) and parse_finviz_val(fund_data.get('Sales Q/Q')) else None,
-
-                # 17. Cash Conversion Ratio = Operating Cash Flow / Net Income
-                "cash_conversion_ratio": (get_latest(q_cf, "Operating Cash Flow") / parse_finviz_val(fund_data.get('Income'))) if parse_finviz_val(fund_data.get('Income')) and get_latest(q_cf, "Operating Cash Flow") else None,
-
-                # 18. Free Cash Flow Conversion = Free Cash Flow / Net Income
-                "fcf_conversion": (fcf / parse_finviz_val(fund_data.get('Income'))) if parse_finviz_val(fund_data.get('Income')) and fcf else None,
-
-                # 20. Debt Service Ratio = Operating Cash Flow / Total Debt
-                "debt_service_ratio": (get_latest(q_cf, "Operating Cash Flow") / total_debt) if total_debt and get_latest(q_cf, "Operating Cash Flow") else None,
-
-                # 21. Financial Leverage Ratio = Total Assets / Equity
-                # Equity = Market Cap / P/B ? Or Total Assets - Total Liab. Let's use Assets / (Assets - Liab)
-                "financial_leverage_ratio": (get_latest(q_bs, "Total Assets") / (get_latest(q_bs, "Total Assets") - get_latest(q_bs, "Total Liabilities Net Minority Interest"))) if get_latest(q_bs, "Total Assets") and get_latest(q_bs, "Total Liabilities Net Minority Interest") and (get_latest(q_bs, "Total Assets") - get_latest(q_bs, "Total Liabilities Net Minority Interest")) != 0 else None,
-
-                # 22. Leverage Adjusted Volatility = Beta × Debt to Equity
-                "leverage_adjusted_volatility": (parse_finviz_val(fund_data.get('Beta')) * parse_finviz_val(fund_data.get('Debt/Eq'))) if parse_finviz_val(fund_data.get('Beta')) and parse_finviz_val(fund_data.get('Debt/Eq')) else None,
-
-                # 24. Shareholder Yield = Dividend Yield + Buyback Yield
-                # Buyback Yield approx = - (Repurchase of Capital Stock / Market Cap)
-                # We need Repurchase of Capital Stock from Cash Flow.
-                "shareholder_yield": (
-                    (parse_finviz_val(fund_data.get('Dividend %')) or 0) + 
-                    ((abs(get_latest(q_cf, "Repurchase Of Capital Stock")) * 4 / market_cap) if market_cap and get_latest(q_cf, "Repurchase Of Capital Stock") else 0)
-                ) if market_cap else None,
-
-                # 25. Retention Ratio = 1 - Dividend Payout Ratio
-                "retention_ratio": (1 - parse_finviz_val(fund_data.get('Payout'))) if parse_finviz_val(fund_data.get('Payout')) else None,
-
-                # 26. Reinvestment Rate = (Capital Expenditure) / Operating Cash Flow
-                "reinvestment_rate": (abs(get_latest(q_cf, "Capital Expenditure")) / get_latest(q_cf, "Operating Cash Flow")) if get_latest(q_cf, "Operating Cash Flow") and get_latest(q_cf, "Capital Expenditure") else None,
-
-                # 27. Capital Efficiency = Revenue Growth / Capital Investment (Capex/Sales?) -> Formula says Revenue Growth / Capital Investment.
-                # Let's assume Capital Investment ~ Capex.
-                "capital_efficiency": (parse_finviz_val(fund_data.get('Sales Q/Q')) / (abs(get_latest(q_cf, "Capital Expenditure")) / parse_finviz_val(fund_data.get('Sales')))) if parse_finviz_val(fund_data.get('Sales')) and get_latest(q_cf, "Capital Expenditure") and parse_finviz_val(fund_data.get('Sales Q/Q')) else None,
-
-                # 28. Insider Buying Intensity = Insider Purchases / Shares Outstanding
-                # Proxy: Insider Trans % (Net)
-                "insider_buying_intensity": parse_finviz_val(fund_data.get('Insider Trans')),
-
-                # 29. Institutional Accumulation Score = Change in Institutional Ownership
-                # Proxy: Inst Trans %
-                "institutional_accumulation": parse_finviz_val(fund_data.get('Inst Trans')),
-
-                # 30. Float Turnover Ratio = Volume / Float
-                "float_turnover": (parse_finviz_val(fund_data.get('Volume')) / parse_finviz_val(fund_data.get('Shs Float'))) if parse_finviz_val(fund_data.get('Shs Float')) and parse_finviz_val(fund_data.get('Volume')) else None,
-
-                # 31. Volatility-to-Liquidity Ratio = ATR / Average Volume
-                "volatility_liquidity_ratio": (parse_finviz_val(fund_data.get('ATR (14)')) / parse_finviz_val(fund_data.get('Avg Volume'))) if parse_finviz_val(fund_data.get('Avg Volume')) and parse_finviz_val(fund_data.get('ATR (14)')) else None,
-
-                # 32. Turnover Stability = Average Volume / Shares Outstanding
-                "turnover_stability": (parse_finviz_val(fund_data.get('Avg Volume')) / parse_finviz_val(fund_data.get('Shs Outstand'))) if parse_finviz_val(fund_data.get('Shs Outstand')) and parse_finviz_val(fund_data.get('Avg Volume')) else None,
-
-                # --- Composite Scores (Normalized 0-100 approximations) ---
-                # 33. Value Score (Earnings Yield, FCF Yield, Book-to-Market)
-                "value_score": (
-                    ((1.0/parse_finviz_val(fund_data.get('P/E')) if parse_finviz_val(fund_data.get('P/E')) else 0) * 100 * 0.4) + 
-                    ((fcf_yield or 0) * 100 * 0.4) + 
-                    ((1.0/parse_finviz_val(fund_data.get('P/B')) if parse_finviz_val(fund_data.get('P/B')) else 0) * 100 * 0.2)
-                ) if fcf_yield is not None else None,
-
-                # 34. Quality Score (ROE, Margins, Debt)
-                "quality_score": (
-                    ((parse_finviz_val(fund_data.get('ROE')) or 0) * 100 * 0.4) +
-                    ((parse_finviz_val(fund_data.get('Profit Margin')) or 0) * 100 * 0.4) - 
-                    ((parse_finviz_val(fund_data.get('Debt/Eq')) or 0) * 10 * 0.2)
-                ),
-
-                # 35. Growth Score (Rev Growth, EPS Growth)
-                "growth_score": (
-                    ((parse_finviz_val(fund_data.get('Sales Q/Q')) or 0) * 100 * 0.5) +
-                    ((parse_finviz_val(fund_data.get('EPS Q/Q')) or 0) * 100 * 0.5)
-                ),
-
-                # 36. Low Risk Score (Beta, Volatility) - Inverse
-                "low_risk_score": (
-                    (1.0 / (parse_finviz_val(fund_data.get('Beta')) or 1.0)) * 50 +
-                    (1.0 / (parse_finviz_val(fund_data.get('ATR')) or 1.0)) * 50
-                ),
-
-                # 37. Risk-Adjusted Return = Expected Return (say, ROE) / Volatility (ATR normalized?)
-                "risk_adjusted_return": (
-                    (parse_finviz_val(fund_data.get('ROE')) or 0) / (parse_finviz_val(fund_data.get('Volatility M')) if fund_data.get('Volatility M') else 0.01)
-                ) if fund_data.get('Volatility M') else None,
-                
-                # 38. Fundamental Risk Score = Debt + Volatility + Earnings Stability (Use Debt/Eq + Beta)
-                "fundamental_risk_score": (
-                    (parse_finviz_val(fund_data.get('Debt/Eq')) or 0) + 
-                    (parse_finviz_val(fund_data.get('Beta')) or 0)
-                ),
-
-                # Missing Part 1
-                "headquarters": fund_data.get('Country'), # Actually Finviz often puts HQ in Country or separate. Finviz finance has 'Country' which is HQ usually.
-
-                # Raw Finviz Data (Backup)
-                "finviz_raw": fund_data
-            }
+            comprehensive_metrics = build_comprehensive_metrics(fund_data, q_bs, q_cf)
 
             # 3. Update 'Current' Timeframe Record with Comprehensive Snapshot
             current_record = {
@@ -437,20 +464,105 @@ class FundamentalsModule:
                 "fetched_at": now_dt,
             }
             
-            self.collection.update_one(
-                {"ticker": ticker, "timeframe": "current"},
-                {"$set": current_record},
-                upsert=True,
-            )
+            self.writer.upsert(self.collection.name, {"ticker": ticker, "timeframe": "current"}, {"$set": current_record})
 
-            print(f"Fundamentals: updated comprehensive records for {ticker}")
+            sp.set(quarters=len(sorted_dates), holders=len(institutional_holders))
 
         except Exception as e:
-            print(f"Error in Fundamentals Module for {ticker}: {e}")
+            sp.fail(e)
+            log.error("Error in Fundamentals Module for %s: %s", ticker, e)
 
 
-def run_fundamentals_batch(db, tickers):
-    module = FundamentalsModule(db)
+def _process_chunk(module: FundamentalsModule, tickers: List[str], tracker: MemoryTracker) -> None:
     for t in tickers:
-        module.fetch_fundamentals_for_symbol(t)
+        with tracker.ticker(t):
+            module.fetch_fundamentals_for_symbol(t)
+    # Bound the queued documents and give freed frames back before the next chunk
+    module.writer.flush()
+    release_memory()
+
+
+def _worker_chunk(mongo_uri: str, db_name: str, tickers: List[str], trace: bool) -> Dict[str, Any]:
+    """One recycled worker: a fresh process handles `tickers` and exits, taking its heap with it."""
+    client = MongoClient(mongo_uri)
+    try:
+        module = FundamentalsModule(client[db_name])
+        module.release_quotes = True
+        tracker = MemoryTracker("fundamentals", trace=trace).start()
+        _process_chunk(module, tickers, tracker)
+        report = tracker.finish()
+        return {"per_ticker": report["per_ticker"], "peak_rss": peak_rss_bytes(), "top_allocations": report.get("top_allocations", [])}
+    finally:
+        client.close()
+        # Pool workers leave via os._exit, skipping atexit; drain queued log lines first
+        shutdown_logging()
+
+
+def _save_report(db, report: Dict[str, Any]) -> None:
+    metrics = db["job_metrics"]
+    try:
+        metrics.create_index("finished_at", expireAfterSeconds=int(timedelta(days=30).total_seconds()))
+        metrics.insert_one(report)
+    except Exception as e:
+        log.error("Error saving fundamentals memory report: %s", e)
+
+
+def run_fundamentals_batch(db, tickers, chunk_size: Optional[int] = None, recycle_after: Optional[int] = None,
+                           trace: bool = False, mongo_uri: Optional[str] = None) -> Dict[str, Any]:
+    """Fetch fundamentals for every ticker and record a memory report in `job_metrics`.
+
+    By default all tickers run in this process. `chunk_size` enables the
+    bounded-memory mode: quote pages are dropped right after use, and the
+    write queue is flushed and freed memory returned to the OS after every
+    chunk. `recycle_after` (needs `mongo_uri`) goes further and runs each
+    group of that many tickers in a fresh spawned worker process.
+    `trace` adds tracemalloc per-ticker peaks and top allocation sites.
+    """
+    tickers = list(tickers)
+    tracker = MemoryTracker("fundamentals", trace=trace and not recycle_after).start()
+    mode = "default"
+    if recycle_after and mongo_uri:
+        mode = f"recycle:{recycle_after}"
+        chunks = [tickers[i:i + recycle_after] for i in range(0, len(tickers), recycle_after)]
+        # spawn, not fork: the parent's Mongo client and writer thread must not be inherited
+        ctx = multiprocessing.get_context("spawn")
+        top_allocations: List[Dict[str, Any]] = []
+        with ctx.Pool(processes=1, maxtasksperchild=1) as pool:
+            for chunk in chunks:
+                try:
+                    result = pool.apply(_worker_chunk, (mongo_uri, db.name, chunk, trace))
+                except Exception as e:
+                    log.error("Fundamentals worker failed on %s..%s: %s", chunk[0], chunk[-1], e)
+                    continue
+                tracker.merge(result["per_ticker"], result["peak_rss"])
+                top_allocations.extend(result["top_allocations"])
+        extra = {"mode": mode, "workers": len(chunks)}
+        if top_allocations:
+            top_allocations.sort(key=lambda a: a["size_diff_kb"], reverse=True)
+            extra["top_allocations"] = top_allocations[: tracker.top_n]
+        report = tracker.finish(**extra)
+    else:
+        if recycle_after:
+            log.warning("recycle_after needs mongo_uri; falling back to in-process chunks")
+            chunk_size = chunk_size or recycle_after
+        module = FundamentalsModule(db)
+        if chunk_size:
+            mode = f"chunked:{chunk_size}"
+            module.release_quotes = True
+            for i in range(0, len(tickers), chunk_size):
+                _process_chunk(module, tickers[i:i + chunk_size], tracker)
+        else:
+            for t in tickers:
+                with tracker.ticker(t):
+                    module.fetch_fundamentals_for_symbol(t)
+            module.writer.flush()
+        report = tracker.finish(mode=mode)
+
+    log.info("Memory: %d tickers, RSS %s -> %s MB, peak %s MB (%s); heaviest: %s", report["tickers"], report["rss_start_mb"],
+             report["rss_end_mb"], report["peak_rss_mb"], mode, ", ".join(report["heaviest_tickers"]))
+    job = current_span()
+    if job is not None:
+        job.set(tickers=report["tickers"], mode=mode, peak_rss_mb=report["peak_rss_mb"])
+    _save_report(db, report)
+    return report
 
@@ -0,0 +1,181 @@
+import logging
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from pymongo import DeleteMany
+
+from app.writer import BatchWriter, shared_writer
+
+log = logging.getLogger(__name__)
+
+# Web-Mercator quad tiles; an event's finest quadkey prefixes every coarser cell
+ZOOM_LEVELS: Tuple[int, ...] = (2, 4, 6, 8, 10)
+MAX_ZOOM = max(ZOOM_LEVELS)
+_MAX_LAT = 85.05112878
+
+
+def quadkey(lon: float, lat: float, zoom: int = MAX_ZOOM) -> str:
+    """Bing-style quadkey of the tile containing (lon, lat) at `zoom`."""
+    lat = max(-_MAX_LAT, min(_MAX_LAT, lat))
+    x = (lon + 180.0) / 360.0
+    s = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)
+    n = 1 << zoom
+    tx = min(n - 1, max(0, int(x * n)))
+    ty = min(n - 1, max(0, int(y * n)))
+    digits = []
+    for z in range(zoom, 0, -1):
+        mask = 1 << (z - 1)
+        digits.append(str((1 if tx & mask else 0) + (2 if ty & mask else 0)))
+    return "".join(digits)
+
+
+def tile_bounds(key: str) -> Tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) of a quadkey's tile."""
+    tx = ty = 0
+    for ch in key:
+        d = int(ch)
+        tx = (tx << 1) | (d & 1)
+        ty = (ty << 1) | (d >> 1)
+    n = 1 << len(key)
+
+    def _lat(y: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+    return tx / n * 360.0 - 180.0, _lat(ty + 1), (tx + 1) / n * 360.0 - 180.0, _lat(ty)
+
+
+def event_cell(event: Dict[str, Any]) -> Optional[str]:
+    geo = event.get("geo") or {}
+    coords = geo.get("coordinates") if isinstance(geo, dict) else None
+    if not coords or len(coords) < 2:
+        return None
+    lon, lat = coords[0], coords[1]
+    if not isinstance(lon, (int, float)) or not isinstance(lat, (int, float)):
+        return None
+    return quadkey(float(lon), float(lat))
+
+
+def event_magnitude(event: Dict[str, Any]) -> Optional[float]:
+    mag = (event.get("metrics") or {}).get("magnitude")
+    return float(mag) if isinstance(mag, (int, float)) and not isinstance(mag, bool) else None
+
+
+class GridAggregator:
+    """Per-cell OSINT aggregates at several zoom levels, updated incrementally.
+
+    Each written event moves one unit of count (and of its kind's count)
+    from the cell it used to be in to the cell it is in now, at every zoom in
+    ZOOM_LEVELS. Deltas are coalesced per cell so an ingest costs one upsert
+    per touched cell, queued on the shared write-behind writer. `max_magnitude`
+    is a high-water mark since the cell was created; `rebuild()` recomputes
+    everything from osint_events.
+    """
+
+    def __init__(self, db, zooms: Iterable[int] = ZOOM_LEVELS, writer: Optional[BatchWriter] = None):
+        self.events = db["osint_events"]
+        self.collection = db["osint_grid"]
+        self.zooms = tuple(sorted(zooms))
+        self.writer = writer or shared_writer(db)
+        try:
+            self.collection.create_index([("zoom", 1), ("center", "2dsphere")], name="zoom_center")
+        except Exception as e:
+            log.error("Error creating grid index: %s", e)
+
+    def _cell_doc(self, zoom: int, key: str) -> Dict[str, Any]:
+        min_lon, min_lat, max_lon, max_lat = tile_bounds(key)
+        return {
+            "zoom": zoom,
+            "quadkey": key,
+            "bbox": [min_lon, min_lat, max_lon, max_lat],
+            "center": {"type": "Point", "coordinates": [(min_lon + max_lon) / 2, (min_lat + max_lat) / 2]},
+        }
+
+    def apply(self, changes: Iterable[Tuple[Optional[str], Optional[str], Optional[str], Optional[str], Optional[float]]]) -> int:
+        """Apply (old_cell, old_kind, new_cell, new_kind, magnitude) moves; returns cells touched."""
+        deltas: Dict[Tuple[int, str], Dict[str, Any]] = {}
+
+        def _delta(zoom: int, key: str) -> Dict[str, Any]:
+            d = deltas.get((zoom, key))
+            if d is None:
+                d = deltas[(zoom, key)] = {"count": 0, "kinds": {}, "max": None}
+            return d
+
+        for old_cell, old_kind, new_cell, new_kind, mag in changes:
+            for zoom in self.zooms:
+                old_key = old_cell[:zoom] if old_cell else None
+                new_key = new_cell[:zoom] if new_cell else None
+                if old_key == new_key and old_kind == new_kind:
+                    if new_key and mag is not None:
+                        d = _delta(zoom, new_key)
+                        d["max"] = mag if d["max"] is None else max(d["max"], mag)
+                    continue
+                if old_key:
+                    d = _delta(zoom, old_key)
+                    d["count"] -= 1
+                    kind = old_kind or "other"
+                    d["kinds"][kind] = d["kinds"].get(kind, 0) - 1
+                if new_key:
+                    d = _delta(zoom, new_key)
+                    d["count"] += 1
+                    kind = new_kind or "other"
+                    d["kinds"][kind] = d["kinds"].get(kind, 0) + 1
+                    if mag is not None:
+                        d["max"] = mag if d["max"] is None else max(d["max"], mag)
+
+        if not deltas:
+            return 0
+        now = datetime.now(timezone.utc)
+        emptied = []
+        for (zoom, key), d in deltas.items():
+            inc = {"count": d["count"]}
+            inc.update({f"kinds.{k}": v for k, v in d["kinds"].items() if v})
+            update: Dict[str, Any] = {
+                "$inc": inc,
+                "$set": {"updated_at": now},
+                "$setOnInsert": self._cell_doc(zoom, key),
+            }
+            if d["max"] is not None:
+                update["$max"] = {"max_magnitude": d["max"]}
+            self.writer.upsert(self.collection.name, {"_id": f"{zoom}:{key}"}, update)
+            if d["count"] < 0:
+                emptied.append(f"{zoom}:{key}")
+        if emptied:
+            # Behind a barrier, so the delete sees the decrements queued above
+            self.writer.write(self.collection.name, DeleteMany({"_id": {"$in": emptied}, "count": {"$lte": 0}}), barrier=True)
+        return len(deltas)
+
+    def rebuild(self) -> int:
+        """Recompute all cells from osint_events and stamp each event's cell; returns cells queued."""
+        cells: Dict[Tuple[int, str], Dict[str, Any]] = {}
+        for doc in self.events.find({"geo": {"$ne": None}}, {"geo": 1, "kind": 1, "metrics.magnitude": 1, "grid_cell": 1}):
+            cell = event_cell(doc)
+            if cell != doc.get("grid_cell"):
+                self.writer.upsert(self.events.name, {"_id": doc["_id"]}, {"$set": {"grid_cell": cell}}, upsert=False)
+            if not cell:
+                continue
+            kind = doc.get("kind") or "other"
+            mag = event_magnitude(doc)
+            for zoom in self.zooms:
+                key = cell[:zoom]
+                c = cells.get((zoom, key))
+                if c is None:
+                    c = cells[(zoom, key)] = {**self._cell_doc(zoom, key), "count": 0, "kinds": {}, "max_magnitude": None}
+                c["count"] += 1
+                c["kinds"][kind] = c["kinds"].get(kind, 0) + 1
+                if mag is not None and (c["max_magnitude"] is None or mag > c["max_magnitude"]):
+                    c["max_magnitude"] = mag
+        now = datetime.now(timezone.utc)
+        self.writer.write(self.collection.name, DeleteMany({}), barrier=True)
+        for (zoom, key), c in cells.items():
+            self.writer.replace(self.collection.name, {"_id": f"{zoom}:{key}"}, {"_id": f"{zoom}:{key}", **c, "updated_at": now})
+        log.info("OSINT grid: rebuilt %d cells", len(cells))
+        return len(cells)
+
+    def rebuild_if_empty(self) -> None:
+        try:
+            if self.collection.estimated_document_count() == 0 and self.events.estimated_document_count() > 0:
+                self.rebuild()
+        except Exception as e:
+            log.error("Error rebuilding OSINT grid: %s", e)
@@ -0,0 +1,240 @@
+import logging
+import math
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+# Hand-picked HQs and key facilities for a few watchlist names. Nothing in the
+# app writes `asset_locations`: sites loaded into it by hand as
+# {ticker, label, lat, lon} are added on the next refresh. Every other ticker is
+# placed from its stored profile (fundamentals `metrics.country`) via
+# COUNTRY_AREAS below.
+ASSET_LOCATIONS: List[Tuple[str, str, float, float]] = [
+    ("AAPL", "Cupertino HQ", 37.3349, -122.0090),
+    ("GOOGL", "Mountain View HQ", 37.4220, -122.0841),
+    ("MSFT", "Redmond HQ", 47.6396, -122.1283),
+    ("AMZN", "Seattle HQ", 47.6223, -122.3365),
+    ("AMZN", "AWS us-east-1 (Ashburn)", 39.0438, -77.4874),
+    ("TSLA", "Austin Gigafactory", 30.2222, -97.6167),
+    ("TSLA", "Fremont Factory", 37.4945, -121.9441),
+    ("TSLA", "Giga Shanghai", 30.8780, 121.7850),
+    ("TSLA", "Giga Berlin", 52.3946, 13.7915),
+    ("NVDA", "Santa Clara HQ", 37.3705, -121.9630),
+    ("AMD", "Santa Clara HQ", 37.3829, -121.9717),
+    ("NVDA", "TSMC Hsinchu foundry", 24.7736, 120.9996),
+    ("AMD", "TSMC Hsinchu foundry", 24.7736, 120.9996),
+    ("AAPL", "TSMC Hsinchu foundry", 24.7736, 120.9996),
+    ("AAPL", "Foxconn Zhengzhou", 34.7197, 113.8519),
+    ("RIVN", "Normal IL plant", 40.4842, -88.9937),
+    ("LCID", "Casa Grande plant", 32.8795, -111.7574),
+    ("COIN", "San Francisco HQ", 37.7890, -122.3942),
+    ("ZM", "San Jose HQ", 37.3327, -121.8880),
+    ("SNOW", "Bozeman HQ", 45.6770, -111.0429),
+    ("ROKU", "San Jose HQ", 37.2580, -121.7853),
+    ("DOCU", "San Francisco HQ", 37.7879, -122.3962),
+    ("PTON", "New York HQ", 40.7500, -73.9967),
+    ("DKNG", "Boston HQ", 42.3505, -71.0480),
+    ("SOFI", "San Francisco HQ", 37.7897, -122.3972),
+    ("PLUG", "Latham NY HQ", 42.7470, -73.7590),
+    ("MARA", "Fort Lauderdale HQ", 26.1224, -80.1373),
+]
+
+# Finviz profile country -> (lat, lon, radius_km) of a circle covering it. Only
+# countries compact enough for a country-wide match to mean something are
+# listed; tickers profiled in large countries (USA, China, Canada, ...) are
+# linked through sites only.
+COUNTRY_AREAS: Dict[str, Tuple[float, float, float]] = {
+    "Taiwan": (23.7, 121.0, 200.0),
+    "Israel": (31.4, 35.0, 200.0),
+    "Netherlands": (52.2, 5.3, 150.0),
+    "Switzerland": (46.8, 8.2, 150.0),
+    "Ireland": (53.4, -8.0, 200.0),
+    "Belgium": (50.6, 4.6, 120.0),
+    "Luxembourg": (49.8, 6.1, 40.0),
+    "Denmark": (56.0, 10.0, 200.0),
+    "United Kingdom": (54.0, -2.5, 500.0),
+    "Germany": (51.2, 10.4, 400.0),
+    "France": (46.6, 2.4, 500.0),
+    "Italy": (42.8, 12.5, 600.0),
+    "Spain": (40.2, -3.7, 500.0),
+    "Greece": (39.0, 22.0, 350.0),
+    "Cyprus": (35.0, 33.2, 120.0),
+    "Monaco": (43.74, 7.42, 5.0),
+    "Japan": (36.2, 138.3, 800.0),
+    "South Korea": (36.5, 127.8, 250.0),
+    "Singapore": (1.35, 103.82, 30.0),
+    "Hong Kong": (22.32, 114.17, 30.0),
+    "Bermuda": (32.3, -64.78, 20.0),
+    "Cayman Islands": (19.3, -81.25, 40.0),
+}
+# Smaller events (aircraft, quakes below ~M5) are too local to touch a whole country
+COUNTRY_MIN_RADIUS_KM = 50.0
+
+# Impact radius per OSINT kind; earthquakes scale with magnitude instead
+EVENT_RADIUS_KM: Dict[str, float] = {
+    "disaster": 100.0,
+    "aviation": 25.0,
+}
+_EARTH_KM = 6371.0
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * _EARTH_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def quake_radius_km(magnitude: Optional[float]) -> float:
+    """Rough felt-damage radius: 25 km at M4, doubling per magnitude unit, capped at 800 km."""
+    if not isinstance(magnitude, (int, float)):
+        return 50.0
+    return max(10.0, min(800.0, 25.0 * 2 ** (magnitude - 4.0)))
+
+
+class GeoLinker:
+    """Links located OSINT events to tickers with a known site or home country nearby.
+
+    Sites (ASSET_LOCATIONS plus hand-loaded `asset_locations` documents) are
+    bucketed into `cell_deg` lat/lon cells; a lookup only scans the cells
+    overlapping the event's impact radius and then checks exact distances,
+    so matching cost depends on local density rather than the size of the
+    universe. Fundamentals tickers without a site fall back to their profile
+    country when it is in COUNTRY_AREAS: an event of at least
+    COUNTRY_MIN_RADIUS_KM whose radius reaches that country links them with
+    `precision: "country"`. Locations are reloaded at most every `refresh_s`
+    seconds.
+    """
+
+    def __init__(self, db, refresh_s: int = 3600, cell_deg: float = 1.0):
+        self.db = db
+        self.refresh_s = refresh_s
+        self.cell_deg = cell_deg
+        self.cells: Dict[Tuple[int, int], List[Tuple[str, str, float, float]]] = {}
+        self.sectors: Dict[str, Optional[str]] = {}
+        self.country_tickers: Dict[str, List[str]] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def _universe(self) -> Tuple[Dict[str, Optional[str]], Dict[str, str]]:
+        """Ticker -> sector and ticker -> profile country for the fundamentals universe."""
+        sectors: Dict[str, Optional[str]] = {}
+        countries: Dict[str, str] = {}
+        for doc in self.db["fundamentals"].find({"timeframe": "current"}, {"ticker": 1, "metrics.sector": 1, "metrics.country": 1}):
+            ticker = doc.get("ticker")
+            if isinstance(ticker, str) and ticker:
+                metrics = doc.get("metrics") or {}
+                sectors[ticker.upper()] = metrics.get("sector")
+                if isinstance(metrics.get("country"), str):
+                    countries[ticker.upper()] = metrics["country"]
+        return sectors, countries
+
+    def load(self, locations: Optional[List[Tuple[str, str, float, float]]] = None, sectors: Optional[Dict[str, Optional[str]]] = None,
+             countries: Optional[Dict[str, str]] = None) -> int:
+        """(Re)build the cell and country indexes; arguments override the seed list and Mongo."""
+        if sectors is None:
+            sectors, stored = self._universe()
+            countries = stored if countries is None else countries
+        if locations is None:
+            locations = list(ASSET_LOCATIONS)
+            for doc in self.db["asset_locations"].find({}, {"ticker": 1, "label": 1, "lat": 1, "lon": 1}):
+                lat, lon = doc.get("lat"), doc.get("lon")
+                if isinstance(doc.get("ticker"), str) and isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
+                    locations.append((doc["ticker"].upper(), doc.get("label") or "", float(lat), float(lon)))
+        cells: Dict[Tuple[int, int], List[Tuple[str, str, float, float]]] = {}
+        n = 0
+        for ticker, label, lat, lon in locations:
+            # Seeds outside the fundamentals universe are kept only when it is still empty
+            if sectors and ticker not in sectors:
+                continue
+            cells.setdefault(self._cell(lat, lon), []).append((ticker, label, lat, lon))
+            n += 1
+        sited = {site[0] for bucket in cells.values() for site in bucket}
+        country_tickers: Dict[str, List[str]] = {}
+        for ticker, country in sorted((countries or {}).items()):
+            if country in COUNTRY_AREAS and ticker not in sited:
+                country_tickers.setdefault(country, []).append(ticker)
+        with self._lock:
+            self.cells = cells
+            self.sectors = sectors
+            self.country_tickers = country_tickers
+            self._loaded_at = time.monotonic()
+        return n
+
+    def refresh_if_stale(self) -> None:
+        if time.monotonic() - self._loaded_at < self.refresh_s and (self.cells or self.country_tickers):
+            return
+        try:
+            n = self.load()
+            log.info("Geo linker: indexed %s asset locations in %d cells, %d tickers by country",
+                     n, len(self.cells), sum(len(t) for t in self.country_tickers.values()))
+        except Exception as e:
+            log.error("Error loading asset locations: %s", e)
+            self._loaded_at = time.monotonic()
+
+    def nearby(self, lat: float, lon: float, radius_km: float) -> List[Dict[str, Any]]:
+        """Assets within `radius_km` of (lat, lon), nearest first."""
+        cells = self.cells
+        dlat = radius_km / 111.0
+        dlon = radius_km / max(1e-6, 111.0 * math.cos(math.radians(min(89.0, abs(lat)))))
+        lat0, lon0 = self._cell(lat - dlat, lon - dlon)
+        lat1, lon1 = self._cell(lat + dlat, lon + dlon)
+        n_lon = int(round(360.0 / self.cell_deg))
+        if lon1 - lon0 + 1 >= n_lon:
+            lon0, lon1 = 0, n_lon - 1
+        hits = []
+        for ci in range(lat0, lat1 + 1):
+            for cj in range(lon0, lon1 + 1):
+                # Wrap across the antimeridian
+                cj_w = (cj + n_lon // 2) % n_lon - n_lon // 2
+                for ticker, label, alat, alon in cells.get((ci, cj_w), ()):
+                    d = haversine_km(lat, lon, alat, alon)
+                    if d <= radius_km:
+                        hits.append({"ticker": ticker, "label": label, "distance_km": round(d, 1), "precision": "site"})
+        hits.sort(key=lambda h: h["distance_km"])
+        return hits
+
+    def nearby_countries(self, lat: float, lon: float, radius_km: float) -> List[Dict[str, Any]]:
+        """Tickers placed by profile country whose country lies within `radius_km`, nearest country first."""
+        hits = []
+        for country, tickers in self.country_tickers.items():
+            clat, clon, cradius = COUNTRY_AREAS[country]
+            d = haversine_km(lat, lon, clat, clon)
+            if d <= cradius + radius_km:
+                hits.extend({"ticker": t, "label": country, "distance_km": round(d, 1), "precision": "country"} for t in tickers)
+        hits.sort(key=lambda h: h["distance_km"])
+        return hits
+
+    def radius_for(self, event: Dict[str, Any]) -> Optional[float]:
+        kind = event.get("kind")
+        if kind == "earthquake":
+            return quake_radius_km((event.get("metrics") or {}).get("magnitude"))
+        return EVENT_RADIUS_KM.get(kind)
+
+    def enrich(self, event: Dict[str, Any]) -> None:
+        """Set related_tickers / related_sectors / impacted_assets on a located event in place."""
+        radius = self.radius_for(event)
+        coords = (event.get("geo") or {}).get("coordinates") or []
+        if radius is None or len(coords) < 2 or not (self.cells or self.country_tickers):
+            return
+        lat, lon = float(coords[1]), float(coords[0])
+        hits = self.nearby(lat, lon, radius)
+        if radius >= COUNTRY_MIN_RADIUS_KM:
+            hits += self.nearby_countries(lat, lon, radius)
+        tickers: List[str] = []
+        sectors: List[str] = []
+        for h in hits:
+            if h["ticker"] not in tickers:
+                tickers.append(h["ticker"])
+                sector = self.sectors.get(h["ticker"])
+                if sector and sector not in sectors:
+                    sectors.append(sector)
+        event["related_tickers"] = tickers
+        event["related_sectors"] = sectors
+        event["impacted_assets"] = hits[:20]
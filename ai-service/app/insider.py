@@ -1,16 +1,22 @@
+import logging
 import time
 from datetime import datetime
 from finvizfinance.insider import Insider
 from pymongo import MongoClient
 
+from app.writer import WriteResult, shared_writer
+
+log = logging.getLogger(__name__)
+
 class InsiderModule:
-    def __init__(self, db):
+    def __init__(self, db, writer=None):
         self.collection = db['insider_trades']
+        self.writer = writer or shared_writer(db)
         # self.collection.create_index("link", unique=True) # Assuming link or combination of fields is unique
-        print("Initialized Insider Module")
+        log.info("Initialized Insider Module")
 
     def fetch_insider_trades(self):
-        print(f"[{datetime.now()}] Fetching Insider Trades (Latest)...")
+        log.info("Fetching Insider Trades (Latest)...")
         try:
             # Finviz 'latest' option captures recent filings across the market.
             # There isn't a direct "filter by NASDAQ" in the `Insider` class of finvizfinance.
@@ -28,12 +34,12 @@ class InsiderModule:
             df = minsider.get_insider()
             
             if df is None or df.empty:
-                print("No insider trades found.")
+                log.warning("No insider trades found.")
                 return
 
             records = df.to_dict('records')
             
-            count = 0
+            result = WriteResult()
             for record in records:
                 # Parse Date "Feb 17 '26" -> ISO Format "2026-02-17"
                 try:
@@ -42,7 +48,7 @@ class InsiderModule:
                         dt_obj = datetime.strptime(raw_date, "%b %d '%y")
                         record['Date'] = dt_obj.strftime("%Y-%m-%d")
                 except Exception as parse_err:
-                    print(f"Error parsing date {raw_date}: {parse_err}")
+                    log.error("Error parsing date %s: %s", raw_date, parse_err)
 
                 # Create a unique ID or use provided fields if available. 
                 query = {
@@ -59,16 +65,14 @@ class InsiderModule:
                 # For now, we ingest all 'latest' trades. The user asked for "all stocks on nasdaq to be checked".
                 # By fetching the global "latest" feed, we effectively check everything including NASDAQ.
                 
-                result = self.collection.update_one(
-                    query,
-                    {"$setOnInsert": record},
-                    upsert=True
-                )
-                
-                if result.upserted_id:
-                    count += 1
+                self.writer.upsert(self.collection.name, query, {"$setOnInsert": record}, result=result)
             
-            print(f"Insider: Inserted {count} new trades.")
+            # New trades are this batch's own upserts, whatever else shares the writer
+            if not self.writer.flush(timeout=120):
+                log.warning("Insider trade writes still pending after 120s")
+            log.info("Inserted %s new trades.", result.upserted)
+            if result.errors:
+                log.warning("%s insider trade writes failed", result.errors)
             
         except Exception as e:
-            print(f"Error in Insider Module: {e}")
+            log.error("Error in Insider Module: %s", e)
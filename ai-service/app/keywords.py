@@ -0,0 +1,115 @@
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+# Words whose final "s" is not a plural ending
+_KEEP_S = frozenset({"news", "series", "species", "always", "perhaps", "whereas"})
+
+
+def _stem(token: str) -> str:
+    # Light normalisation so "sanctions", "Iran's" and "chips" hit their
+    # singular keywords without re-introducing substring matches. Short words
+    # and -ss/-is/-us endings ("this", "crisis", "bonus") are left alone.
+    if token.endswith("'s"):
+        token = token[:-2]
+    elif "'" in token:
+        token = token.split("'", 1)[0]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "is", "us")) and token not in _KEEP_S:
+        token = token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(t) for t in _TOKEN_RE.findall((text or "").lower())]
+
+
+class KeywordMatcher:
+    """Word-boundary multi-keyword matcher.
+
+    Keywords (single words or phrases) are compiled into a dict keyed by
+    their stemmed token tuple. `find()` walks the headline once and probes
+    every n-gram up to the longest phrase length, so the cost per headline
+    depends on its length, not on how many keywords are registered.
+
+    Each keyword can carry several payloads (e.g. a score weight and a tag),
+    letting one pass serve both scoring and tagging. Updates rebuild the
+    table off to the side and swap it in, so readers never see a partial
+    state and need no lock.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Any]] = ()):
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, ...], List[Tuple[str, Any]]] = {}
+        self._table: Dict[Tuple[str, ...], Tuple[Tuple[str, Any], ...]] = {}
+        self._max_len = 0
+        self.extend(entries)
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def _key(self, keyword: str) -> Tuple[str, ...]:
+        return tuple(tokenize(keyword))
+
+    def _rebuild(self) -> None:
+        table = {k: tuple(v) for k, v in self._entries.items() if v}
+        max_len = max((len(k) for k in table), default=0)
+        self._table, self._max_len = table, max_len
+
+    def extend(self, entries: Iterable[Tuple[str, Any]]) -> None:
+        with self._lock:
+            for keyword, payload in entries:
+                key = self._key(keyword)
+                if not key:
+                    continue
+                bucket = self._entries.setdefault(key, [])
+                if (keyword, payload) not in bucket:
+                    bucket.append((keyword, payload))
+            self._rebuild()
+
+    def add(self, keyword: str, payload: Any) -> None:
+        self.extend([(keyword, payload)])
+
+    def remove(self, keyword: str, payload: Any = None) -> None:
+        """Drop a keyword entirely, or only the entries carrying `payload`."""
+        with self._lock:
+            key = self._key(keyword)
+            if payload is None:
+                self._entries.pop(key, None)
+            elif key in self._entries:
+                self._entries[key] = [e for e in self._entries[key] if e[1] != payload]
+            self._rebuild()
+
+    def replace(self, predicate, entries: Iterable[Tuple[str, Any]]) -> None:
+        """Atomically drop every payload matching `predicate` and add `entries`."""
+        with self._lock:
+            for key in list(self._entries):
+                self._entries[key] = [e for e in self._entries[key] if not predicate(e[1])]
+            for keyword, payload in entries:
+                key = self._key(keyword)
+                if key:
+                    self._entries.setdefault(key, []).append((keyword, payload))
+            self._rebuild()
+
+    def find(self, text: str) -> List[Tuple[str, Any]]:
+        """Return (keyword, payload) for every keyword occurrence in `text`.
+
+        A keyword found several times in one headline is reported once.
+        """
+        table, max_len = self._table, self._max_len
+        if not table:
+            return []
+        tokens = tokenize(text)
+        hits: List[Tuple[str, Any]] = []
+        seen = set()
+        n = len(tokens)
+        for i in range(n):
+            for size in range(1, min(max_len, n - i) + 1):
+                key = tuple(tokens[i:i + size])
+                entries = table.get(key)
+                if entries and key not in seen:
+                    seen.add(key)
+                    hits.extend(entries)
+        return hits
@@ -0,0 +1,163 @@
+import ctypes
+import ctypes.util
+import gc
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+_MB = 1024 * 1024
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+# Allocation sites from these files are the tracer itself, not the job
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+_libc = None
+if sys.platform.startswith("linux"):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+    except OSError:
+        _libc = None
+
+
+def rss_bytes() -> int:
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes(children: bool = False) -> int:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def release_memory() -> None:
+    """Collect garbage and hand freed malloc arenas back to the OS (glibc only)."""
+    gc.collect()
+    if _libc is not None:
+        try:
+            _libc.malloc_trim(0)
+        except AttributeError:
+            pass
+
+
+class MemoryTracker:
+    """Per-ticker and per-job memory accounting for a batch job.
+
+    RSS is sampled around every ticker (cheap, always on). With `trace`,
+    tracemalloc also records each ticker's Python-heap peak and, at the end,
+    the `top_n` allocation sites that grew the most over the job. Tracing
+    roughly doubles allocation cost, so it is opt-in.
+    """
+
+    def __init__(self, job: str, trace: bool = False, top_n: int = 10, frames: int = 1):
+        self.job = job
+        self.trace = trace
+        self.top_n = top_n
+        self.frames = frames
+        self.per_ticker: List[Dict[str, Any]] = []
+        self._started_tracing = False
+        self._baseline = None
+        self._t0 = 0.0
+        self._rss0 = 0
+        self._peak = 0
+        self.started_at = None
+
+    def start(self) -> "MemoryTracker":
+        self.started_at = datetime.utcnow()
+        self._t0 = time.monotonic()
+        self._rss0 = self._peak = rss_bytes()
+        if self.trace:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._started_tracing = True
+            self._baseline = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        return self
+
+    @contextmanager
+    def ticker(self, ticker: str):
+        before = rss_bytes()
+        high_water = peak_rss_bytes()
+        traced_before = 0
+        if self.trace:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            after = rss_bytes()
+            # The process high-water mark only moves if this ticker set a new one;
+            # otherwise its peak is bounded by the samples around it
+            new_high = peak_rss_bytes()
+            peak = max(before, after, new_high if new_high > high_water else 0)
+            self._peak = max(self._peak, peak)
+            entry = {
+                "ticker": ticker,
+                "seconds": round(time.monotonic() - t0, 3),
+                "rss_mb": round(after / _MB, 1),
+                "rss_delta_mb": round((after - before) / _MB, 2),
+                "peak_rss_mb": round(peak / _MB, 1),
+            }
+            if self.trace:
+                # Python-heap peak above what was already live when the ticker started
+                entry["py_peak_mb"] = round((tracemalloc.get_traced_memory()[1] - traced_before) / _MB, 2)
+            self.per_ticker.append(entry)
+
+    def merge(self, entries: List[Dict[str, Any]], peak_rss: int) -> None:
+        """Fold in per-ticker entries measured in a worker process."""
+        self.per_ticker.extend(entries)
+        self._peak = max(self._peak, peak_rss)
+
+    def _top_allocations(self) -> List[Dict[str, Any]]:
+        current = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        stats = current.compare_to(self._baseline, "lineno") if self._baseline is not None else current.statistics("lineno")
+        top = []
+        for stat in stats[: self.top_n]:
+            frame = stat.traceback[0]
+            top.append({
+                "site": f"{frame.filename}:{frame.lineno}",
+                "size_kb": round(stat.size / 1024, 1),
+                "size_diff_kb": round(getattr(stat, "size_diff", stat.size) / 1024, 1),
+                "count": stat.count,
+            })
+        return top
+
+    def finish(self, **extra: Any) -> Dict[str, Any]:
+        rss_end = rss_bytes()
+        self._peak = max(self._peak, rss_end)
+        report: Dict[str, Any] = {
+            "job": self.job,
+            "started_at": self.started_at,
+            "finished_at": datetime.utcnow(),
+            "seconds": round(time.monotonic() - self._t0, 2),
+            "tickers": len(self.per_ticker),
+            "rss_start_mb": round(self._rss0 / _MB, 1),
+            "rss_end_mb": round(rss_end / _MB, 1),
+            "peak_rss_mb": round(self._peak / _MB, 1),
+            "per_ticker": self.per_ticker,
+        }
+        heaviest = sorted(self.per_ticker, key=lambda e: e.get("py_peak_mb", e["rss_delta_mb"]), reverse=True)[:5]
+        report["heaviest_tickers"] = [e["ticker"] for e in heaviest]
+        if self.trace:
+            report["py_traced_mb"] = round(tracemalloc.get_traced_memory()[0] / _MB, 1)
+            report["top_allocations"] = self._top_allocations()
+            self._baseline = None
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+        report.update(extra)
+        return report
@@ -1,18 +1,34 @@
+import logging
 import time
-from datetime import datetime
-from finvizfinance.quote import finvizfinance
+from datetime import datetime, timedelta, timezone
 from pymongo import MongoClient
-from textblob import TextBlob
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
 import pandas as pd
 import hashlib
+import io
 import random
 import re
 from email.utils import parsedate_to_datetime
 from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 import requests
+from requests.adapters import HTTPAdapter
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Stocks to track for news (default list)
+from app.dedup import NearDuplicateIndex
+from app.entities import EntityLinker
+from app.keywords import KeywordMatcher
+from app.quotecache import QuoteCache, finviz_quotes
+from app.sentiment import SentimentScorer, headline_key
+from app.snapshots import SnapshotPublisher, shared_publisher
+from app.tracing import bind, event, span
+from app.writer import BatchWriter, shared_writer
+
+log = logging.getLogger(__name__)
+
+# Stocks to track for news when no ticker universe is passed in
 TICKERS = ["AAPL", "GOOGL", "TSLA", "MSFT", "AMZN", "NVDA", "AMD"]
 
 RSS_FEEDS: List[Tuple[str, str]] = [
@@ -26,6 +42,35 @@ RSS_FEEDS: List[Tuple[str, str]] = [
     ("Al Jazeera", "https://www.aljazeera.com/xml/rss/all.xml"),
 ]
 
+# Newest articles kept in the `news_latest` snapshot; covers the monitor feed's
+# default over-fetch (limit 20 x 15)
+SNAPSHOT_ARTICLES = 500
+# news field -> backend NewsArticle JSON name
+SNAPSHOT_FIELDS = {
+    "_id": "id", "title": "title", "content": "content", "source": "source", "url": "url",
+    "timestamp": "timestamp", "sentiment": "sentiment", "tags": "tags", "relevance": "relevance", "sources": "sources",
+}
+
+# Query parameters that only track the referrer and never identify the article
+TRACKING_PARAMS = frozenset({"oc", "ocid", "cmpid", "ref", "guccounter", ".tsrc", "fbclid", "gclid"})
+
+# Retention tiers: (minimum relevance, days kept in `news`, copied to `news_archive`
+# before expiry). The first tier an article's relevance reaches wins.
+RETENTION_TIERS: List[Tuple[int, int, bool]] = [
+    (15, 90, True),
+    (8, 30, False),
+    (-1000, 7, False),
+]
+# How far ahead of expiry the archive sweep picks up archive-tier articles
+ARCHIVE_LEAD = timedelta(days=2)
+
+FEED_STATE_FIELDS = ("etag", "last_modified", "wm_pub", "wm_guids")
+# GUIDs remembered per feed; comfortably above any feed's item count
+WATERMARK_GUIDS = 300
+# Consecutive already-seen items after which a feed is considered caught up.
+# More than one, because Google News does not order items strictly by date.
+WATERMARK_STOP_AFTER = 3
+
 HIGH_IMPACT_KEYWORDS: List[Tuple[str, int]] = [
     ("breaking", 6),
     ("attack", 6),
@@ -85,11 +130,204 @@ HIGH_IMPACT_KEYWORDS: List[Tuple[str, int]] = [
     ("semiconductor", 5),
 ]
 
+# Headline markers that bump the score without being topical keywords
+SCORE_MODIFIERS: List[Tuple[str, int]] = [
+    ("live", 2),
+    ("developing", 3),
+]
+
+# Broad category tags (order here is the order tags are emitted in)
+TAG_KEYWORDS: Dict[str, List[str]] = {
+    "Technology": ["tech", "technology", "semiconductor", "ai", "artificial intelligence", "chip", "chipmaker"],
+    "Finance": ["earnings", "revenue", "profit", "guidance"],
+    "Crypto": ["crypto", "cryptocurrency", "bitcoin", "ethereum"],
+    "Macro": ["fed", "federal reserve", "rate", "interest rate", "inflation", "cpi", "gdp"],
+    "Geopolitics": ["iran", "israel", "gaza", "ukraine", "russia", "china", "taiwan", "sanction", "tariff", "embargo", "nuclear"],
+    "Natural Resources": ["oil", "opec", "gas", "lng", "copper", "uranium", "rare earth"],
+}
+
 class NewsModule:
-    def __init__(self, db):
+    def __init__(self, db, feeds: Optional[List[Tuple[str, str]]] = None, max_feed_workers: int = 16, max_ticker_workers: int = 8, quotes: Optional[QuoteCache] = None, writer: Optional[BatchWriter] = None,
+                 snapshots: Optional[SnapshotPublisher] = None):
         self.collection = db['news']
         self.collection.create_index("title", unique=True)
-        print("Initialized News Module")
+        try:
+            # Partial so legacy documents written before fingerprints existed don't collide on null
+            self.collection.create_index(
+                "fingerprint",
+                unique=True,
+                partialFilterExpression={"fingerprint": {"$exists": True}},
+            )
+        except Exception as e:
+            log.error("Error creating news fingerprint index: %s", e)
+        self._ensure_read_indexes()
+        # High-relevance articles are copied here before they expire from `news`
+        self.archive = db['news_archive']
+        self.archive.create_index([("timestamp", -1)])
+        # Per-feed HTTP validators (ETag / Last-Modified) for conditional GETs
+        # and the pubDate/GUID watermark of items already ingested
+        self.feed_state = db['news_feed_state']
+        self.feeds: List[Tuple[str, str]] = list(feeds or RSS_FEEDS)
+        self.max_feed_workers = max_feed_workers
+        self._feed_state: Dict[str, Dict[str, Any]] = {}
+        self._feed_state_loaded = False
+        # Per-ticker last-fetched timestamps for Finviz news
+        self.ticker_state = db['news_ticker_state']
+        self.max_ticker_workers = max_ticker_workers
+        # Extracted Finviz quote-page tables, shared with the fundamentals job
+        self.quotes = quotes or finviz_quotes
+        self.last_ticker_cycle: Dict[str, Any] = {}
+        # State updates and story merges are write-behind; new articles are still
+        # inserted synchronously because duplicate-key rejections decide what is new
+        self.writer = writer or shared_writer(db)
+        self.snapshots = snapshots or shared_publisher()
+        self.session = self._build_session()
+        self.sentiment = SentimentScorer(db)
+        # Near-duplicate stories across sources within the recent window
+        self.stories = NearDuplicateIndex()
+        # Company name / ticker linking against the screener + fundamentals universe
+        self.entities = EntityLinker(db)
+        self._stories_warm = False
+        self._tag_order: List[str] = list(TAG_KEYWORDS)
+        self.matcher = KeywordMatcher(
+            [(kw, ("score", w)) for kw, w in HIGH_IMPACT_KEYWORDS + SCORE_MODIFIERS]
+            + [(kw, ("tag", tag)) for tag, kws in TAG_KEYWORDS.items() for kw in kws]
+        )
+        log.info("Initialized News Module")
+
+    def set_keyword_weights(self, weights: Dict[str, int]) -> None:
+        """Replace the scoring keywords at runtime (tags are left untouched)."""
+        self.matcher.replace(lambda p: p[0] == "score", [(kw, ("score", int(w))) for kw, w in weights.items()])
+
+    def set_tag_keywords(self, tag: str, keywords: List[str]) -> None:
+        """Replace (or add) the keyword list for one tag at runtime."""
+        if tag not in self._tag_order:
+            self._tag_order.append(tag)
+        self.matcher.replace(lambda p: p == ("tag", tag), [(kw, ("tag", tag)) for kw in keywords])
+
+    def _ensure_read_indexes(self) -> None:
+        # Mirrors the backend's news_service queries so each is an index scan
+        # in sort order: latest (optionally after a timestamp), by tag, by ticker.
+        try:
+            self.collection.create_index([("timestamp", -1)], name="timestamp_desc")
+            self.collection.create_index([("tags", 1), ("timestamp", -1)], name="tags_timestamp")
+            self.collection.create_index(
+                [("related_ticker", 1), ("timestamp", -1)],
+                name="ticker_timestamp",
+                partialFilterExpression={"related_ticker": {"$exists": True}},
+            )
+            # TTL: Mongo deletes each article once its tier's expire_at passes
+            self.collection.create_index("expire_at", expireAfterSeconds=0, name="expire_at_ttl")
+        except Exception as e:
+            log.error("Error creating news read indexes: %s", e)
+
+    def _expire_at(self, relevance: int, now: datetime) -> datetime:
+        for min_rel, days, _ in RETENTION_TIERS:
+            if relevance >= min_rel:
+                return now + timedelta(days=days)
+        return now + timedelta(days=RETENTION_TIERS[-1][1])
+
+    def apply_retention(self) -> Dict[str, int]:
+        """Backfill expiry on legacy articles and archive high-relevance ones nearing expiry."""
+        stats = {"backfilled": 0, "archived": 0}
+        now = datetime.utcnow()
+        try:
+            # Legacy documents: derive expire_at from their timestamp and drop the
+            # redundant `content` field. A no-op once every document has expire_at.
+            upper = None
+            for min_rel, days, _ in RETENTION_TIERS:
+                rel_filter: Dict[str, Any] = {"$gte": min_rel}
+                if upper is not None:
+                    rel_filter["$lt"] = upper
+                res = self.collection.update_many(
+                    {"expire_at": {"$exists": False}, "relevance": rel_filter},
+                    [
+                        {"$set": {"expire_at": {"$add": [{"$ifNull": ["$timestamp", now]}, days * 86400 * 1000]}}},
+                        {"$unset": "content"},
+                    ],
+                )
+                stats["backfilled"] += res.modified_count
+                upper = min_rel
+            res = self.collection.update_many(
+                {"expire_at": {"$exists": False}, "relevance": {"$exists": False}},
+                [
+                    {"$set": {"expire_at": {"$add": [{"$ifNull": ["$timestamp", now]}, RETENTION_TIERS[-1][1] * 86400 * 1000]}}},
+                    {"$unset": "content"},
+                ],
+            )
+            stats["backfilled"] += res.modified_count
+
+            archive_min = min((r for r, _, archive in RETENTION_TIERS if archive), default=None)
+            if archive_min is not None:
+                due = list(self.collection.find(
+                    {"expire_at": {"$lte": now + ARCHIVE_LEAD}, "relevance": {"$gte": archive_min}, "archived_at": {"$exists": False}},
+                    {"expire_at": 0, "fingerprint": 0, "content": 0},
+                ))
+                if due:
+                    try:
+                        self.archive.insert_many(due, ordered=False)
+                    except BulkWriteError:
+                        pass  # already archived on a previous sweep
+                    self.collection.update_many({"_id": {"$in": [d["_id"] for d in due]}}, {"$set": {"archived_at": now}})
+                    stats["archived"] = len(due)
+        except Exception as e:
+            log.error("Error applying news retention: %s", e)
+        return stats
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        # Keep-alive pool sized to the worker count so concurrent feeds on the
+        # same host (news.google.com, feeds.bbci.co.uk) reuse TLS connections
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=self.max_feed_workers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["User-Agent"] = f"ScopeMonitor/1.0 (+https://localhost) {random.randint(1000,9999)}"
+        return session
+
+    def add_feeds(self, feeds: List[Tuple[str, str]]) -> None:
+        known = {url for _, url in self.feeds}
+        for name, url in feeds:
+            if url not in known:
+                self.feeds.append((name, url))
+                known.add(url)
+
+    def _load_feed_state(self) -> None:
+        if self._feed_state_loaded:
+            return
+        try:
+            for doc in self.feed_state.find({}, {"etag": 1, "last_modified": 1, "wm_pub": 1, "wm_guids": 1}):
+                self._feed_state[doc["_id"]] = {k: doc[k] for k in FEED_STATE_FIELDS if doc.get(k)}
+            self._feed_state_loaded = True
+        except Exception as e:
+            log.error("Error loading feed state: %s", e)
+
+    def _advance_watermark(self, source_name: str, url: str, items: List[Dict[str, Any]], validators: Optional[Dict[str, str]] = None) -> None:
+        """Record the newest pubDate, recent GUIDs and the response's HTTP validators once a feed's items are stored.
+
+        Validators are only saved here: saved earlier, a failed store would
+        turn the next poll into a 304 and the items would never be retried.
+        """
+        state = self._feed_state.setdefault(url, {})
+        update: Dict[str, Any] = {}
+        if validators and any(state.get(k) != v for k, v in validators.items()):
+            state.update(validators)
+            update.update(validators)
+        if items:
+            guids = [it["guid"] for it in items if it.get("guid")]
+            fresh = set(guids)
+            old = [g for g in state.get("wm_guids") or [] if g not in fresh]
+            state["wm_guids"] = (guids + old)[:WATERMARK_GUIDS]
+            pubs = [it["pub_utc"] for it in items if it.get("pub_utc")]
+            if pubs:
+                state["wm_pub"] = max(pubs + ([state["wm_pub"]] if state.get("wm_pub") else []))
+            update.update({"wm_guids": state["wm_guids"], "wm_pub": state.get("wm_pub")})
+        if not update:
+            return
+        self.writer.upsert(
+            self.feed_state.name,
+            {"_id": url},
+            {"$set": {**update, "source": source_name, "updated_at": datetime.now()}},
+        )
 
     def _clean(self, s: str) -> str:
         s = (s or "").strip()
@@ -97,24 +335,22 @@ class NewsModule:
         return s
 
     def analyze_sentiment(self, text):
-        analysis = TextBlob(text)
-        return analysis.sentiment.polarity
+        return self.sentiment.score(text)
 
-    def generate_tags(self, text, ticker):
+    def _match_headline(self, text: str) -> Tuple[int, List[str]]:
+        """Single matcher pass returning (keyword score, category tags)."""
+        score = 0
+        found = set()
+        for _, (kind, value) in self.matcher.find(text):
+            if kind == "score":
+                score += value
+            else:
+                found.add(value)
+        return score, [t for t in self._tag_order if t in found]
+
+    def _build_tags(self, categories: List[str], ticker) -> List[str]:
         tags = [ticker] if ticker else []
-        t = (text or "").lower()
-        if "tech" in t or "semiconductor" in t or "ai" in t or "chip" in t:
-            tags.append("Technology")
-        if "earnings" in t or "revenue" in t or "profit" in t or "guidance" in t:
-            tags.append("Finance")
-        if "crypto" in t or "bitcoin" in t or "ethereum" in t:
-            tags.append("Crypto")
-        if "fed" in t or "rate" in t or "inflation" in t or "cpi" in t or "gdp" in t:
-            tags.append("Macro")
-        if any(k in t for k in ["iran", "israel", "gaza", "ukraine", "russia", "china", "taiwan", "sanction", "tariff", "embargo", "nuclear"]):
-            tags.append("Geopolitics")
-        if any(k in t for k in ["oil", "opec", "gas", "lng", "copper", "uranium", "rare earth"]):
-            tags.append("Natural Resources")
+        tags.extend(categories)
         if len(tags) == 0:
             tags.append("General")
         deduped = []
@@ -125,181 +361,531 @@ class NewsModule:
                 deduped.append(tag)
         return deduped
 
-    def _score_headline(self, title: str, source_name: str) -> int:
-        t = self._clean(title).lower()
-        score = 0
-        for kw, w in HIGH_IMPACT_KEYWORDS:
-            if kw in t:
-                score += w
+    def _adjust_score(self, score: int, title: str, source_name: str) -> int:
         if source_name.lower().startswith("google"):
             score += 2
-        if "live" in t:
-            score += 2
-        if "developing" in t:
-            score += 3
-        if len(t) >= 90:
+        if len(title) >= 90:
             score += 1
-        if len(t) < 35:
+        if len(title) < 35:
             score -= 2
         return score
 
-    def _fingerprint(self, title: str, url: str, source: str) -> str:
-        raw = f"{source}||{title}||{url}".encode("utf-8", errors="ignore")
+    def score_and_tag(self, title: str, source_name: str, ticker) -> Tuple[int, List[str]]:
+        t = self._clean(title)
+        score, categories = self._match_headline(t)
+        return self._adjust_score(score, t, source_name), self._build_tags(categories, ticker)
+
+    def _link_entities(self, text: str, article: Dict[str, Any]) -> None:
+        """Attach tickers and sectors mentioned in the headline to the article."""
+        tickers, sectors = self.entities.link(text)
+        if not tickers:
+            return
+        primary = article.get("related_ticker")
+        related = ([primary] if primary else []) + [t for t in tickers if t != primary]
+        article["related_ticker"] = related[0]
+        article["related_tickers"] = related
+        tags = [t for t in article.get("tags") or [] if t != "General"]
+        for tag in tickers + sectors:
+            if tag not in tags:
+                tags.append(tag)
+        article["tags"] = tags
+
+    def generate_tags(self, text, ticker):
+        _, categories = self._match_headline(text or "")
+        return self._build_tags(categories, ticker)
+
+    def _score_headline(self, title: str, source_name: str) -> int:
+        t = self._clean(title)
+        score, _ = self._match_headline(t)
+        return self._adjust_score(score, t, source_name)
+
+    def _canonical_url(self, url: str) -> str:
+        try:
+            parts = urlsplit(self._clean(url))
+        except ValueError:
+            return self._clean(url).lower()
+        query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                 if not (k.lower().startswith("utm_") or k.lower() in TRACKING_PARAMS)]
+        host = (parts.hostname or "").lower()
+        if host.startswith("www."):
+            host = host[4:]
+        path = parts.path.rstrip("/") or "/"
+        return urlunsplit(("", host, path, urlencode(sorted(query)), ""))
+
+    def _fingerprint(self, title: str, url: str) -> str:
+        """Content fingerprint: normalized headline plus canonical URL, independent of feed."""
+        norm_title = re.sub(r"^\[[^\]]+\]\s*", "", self._clean(title)).lower()
+        raw = f"{norm_title}||{self._canonical_url(url)}".encode("utf-8", errors="ignore")
         return hashlib.sha1(raw).hexdigest()
 
-    def _parse_rss(self, xml_text: str) -> List[Dict[str, Any]]:
-        root = ET.fromstring(xml_text)
+    def _pub_utc(self, pub: str) -> Optional[datetime]:
+        pub = self._clean(pub)
+        if not pub:
+            return None
+        try:
+            dt = parsedate_to_datetime(pub)
+        except Exception:
+            return None
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        return dt
+
+    def _parse_rss(self, source, seen: Optional[set] = None, watermark: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Stream <item>s out of an RSS document, stopping at already-ingested items.
+
+        `source` may be text, bytes or a file-like object (e.g. a streaming
+        response body). Each item is cleared and detached as soon as it is read.
+        Items whose GUID is in `seen` are skipped. Parsing stops after
+        WATERMARK_STOP_AFTER consecutive items that are seen or older than
+        `watermark`, so the rest of the feed is never downloaded or built into a
+        tree. An unseen item older than `watermark` is still returned, because
+        feeds are not strictly date-ordered.
+        """
+        if isinstance(source, str):
+            source = io.BytesIO(source.encode("utf-8"))
+        elif isinstance(source, bytes):
+            source = io.BytesIO(source)
         out: List[Dict[str, Any]] = []
-        for item in root.findall(".//item"):
-            title = item.findtext("title") or ""
-            link = item.findtext("link") or ""
-            pub = item.findtext("pubDate") or ""
-            out.append({"title": title, "link": link, "pubDate": pub})
+        channel = None
+        streak = 0
+        try:
+            for event, elem in ET.iterparse(source, events=("start", "end")):
+                if event == "start":
+                    if elem.tag == "channel":
+                        channel = elem
+                    continue
+                if elem.tag != "item":
+                    continue
+                title = elem.findtext("title") or ""
+                link = elem.findtext("link") or ""
+                pub = elem.findtext("pubDate") or ""
+                guid = self._clean(elem.findtext("guid") or link)
+                elem.clear()
+                if channel is not None:
+                    channel.remove(elem)
+
+                pub_utc = self._pub_utc(pub)
+                known = bool(seen) and guid in seen
+                stale = bool(watermark and pub_utc and pub_utc < watermark)
+                streak = streak + 1 if known or stale else 0
+                if not known:
+                    out.append({"title": title, "link": link, "pubDate": pub, "pub_utc": pub_utc, "guid": guid})
+                if streak >= WATERMARK_STOP_AFTER:
+                    break
+        except ET.ParseError as e:
+            if not out:
+                raise
+            log.warning("RSS parse stopped early: %s", e)
         return out
 
-    def fetch_rss_headlines(self) -> int:
-        inserted = 0
-        headers = {
-            "User-Agent": f"ScopeMonitor/1.0 (+https://localhost) {random.randint(1000,9999)}"
-        }
+    def _fetch_feed(self, source_name: str, url: str) -> Tuple[str, str, Optional[List[Dict[str, Any]]], Dict[str, str]]:
+        """GET and stream-parse one feed; returns (source_name, url, new_items, validators), items None on 304.
 
-        for source_name, url in RSS_FEEDS:
-            try:
-                res = requests.get(url, headers=headers, timeout=15)
+        Any other non-200 status raises, so the caller counts it as a failed feed.
+        """
+        headers: Dict[str, str] = {}
+        cached = self._feed_state.get(url) or {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        with span("upstream", source="rss", feed=source_name, url=url) as sp:
+            with self.session.get(url, headers=headers, timeout=15, stream=True) as res:
+                sp.set(status=res.status_code)
+                if res.status_code == 304:
+                    return source_name, url, None, {}
+                res.raise_for_status()
                 if res.status_code != 200:
-                    continue
-                items = self._parse_rss(res.text)
-                if not items:
-                    continue
+                    raise requests.HTTPError(f"unexpected status {res.status_code}", response=res)
 
-                for it in items:
-                    raw_title = self._clean(it.get("title") or "")
-                    link = self._clean(it.get("link") or "")
-                    if not raw_title or not link:
-                        continue
+                validators = {}
+                if res.headers.get("ETag"):
+                    validators["etag"] = res.headers["ETag"]
+                if res.headers.get("Last-Modified"):
+                    validators["last_modified"] = res.headers["Last-Modified"]
 
-                    score = self._score_headline(raw_title, source_name)
-                    if score < 8:
-                        continue
+                res.raw.decode_content = True
+                items = self._parse_rss(res.raw, seen=set(cached.get("wm_guids") or []), watermark=cached.get("wm_pub"))
+                # Compressed bytes off the wire (the parser may stop at the watermark)
+                sp.set(items=len(items), bytes=res.raw.tell())
+            return source_name, url, items, validators
 
-                    pub_dt = None
-                    pub_raw = self._clean(it.get("pubDate") or "")
-                    if pub_raw:
-                        try:
-                            pub_dt = parsedate_to_datetime(pub_raw)
-                        except Exception:
-                            pub_dt = None
-                    if pub_dt is None:
-                        pub_dt = datetime.now()
-
-                    title = f"[{source_name}] {raw_title}"
-                    sentiment_score = self.analyze_sentiment(raw_title)
-                    tags = self.generate_tags(raw_title, "")
-
-                    article = {
-                        "title": title,
-                        "content": f"{raw_title}. Read more at {link}",
-                        "source": source_name,
-                        "url": link,
-                        "timestamp": pub_dt,
-                        "sentiment": sentiment_score,
-                        "tags": tags,
-                        "relevance": score,
-                        "fingerprint": self._fingerprint(raw_title, link, source_name),
-                    }
+    def _build_rss_articles(self, source_name: str, items: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+        """Turn parsed feed items into (sentiment_text, article) pairs, unscored."""
+        out: List[Tuple[str, Dict[str, Any]]] = []
+        for it in items:
+            raw_title = self._clean(it.get("title") or "")
+            link = self._clean(it.get("link") or "")
+            if not raw_title or not link:
+                continue
+
+            score, tags = self.score_and_tag(raw_title, source_name, "")
+            if score < 8:
+                continue
 
+            pub_dt = it.get("pub_utc")
+            if pub_dt is None:
+                pub_raw = self._clean(it.get("pubDate") or "")
+                if pub_raw:
                     try:
-                        result = self.collection.update_one(
-                            {"title": title},
-                            {"$setOnInsert": article},
-                            upsert=True
-                        )
-                        if result.upserted_id:
-                            inserted += 1
+                        pub_dt = parsedate_to_datetime(pub_raw)
                     except Exception:
-                        continue
-            except Exception:
+                        pub_dt = None
+            if pub_dt is None:
+                pub_dt = datetime.now()
+
+            title = f"[{source_name}] {raw_title}"
+            article = {
+                "title": title,
+                "source": source_name,
+                "url": link,
+                "timestamp": pub_dt,
+                "tags": tags,
+                "relevance": score,
+                "fingerprint": self._fingerprint(raw_title, link),
+            }
+            self._link_entities(raw_title, article)
+            out.append((raw_title, article))
+        return out
+
+    def _warm_story_index(self) -> None:
+        if self._stories_warm:
+            return
+        self._stories_warm = True
+        since = ObjectId.from_datetime(datetime.utcnow() - self.stories.window)
+        try:
+            for doc in self.collection.find({"_id": {"$gte": since}}, {"title": 1, "related_tickers": 1}).sort("_id", 1):
+                seen_at = doc["_id"].generation_time.replace(tzinfo=None)
+                self.stories.add(doc["_id"], doc.get("title") or "", seen_at, frozenset(doc.get("related_tickers") or ()))
+            log.info("story index warmed with %d recent headlines", len(self.stories))
+        except Exception as e:
+            log.error("Error warming story index: %s", e)
+
+    def _cluster_articles(self, pending: List[Tuple[str, Dict[str, Any]]]) -> Tuple[List[Tuple[str, Dict[str, Any]]], int]:
+        """Split articles into new stories and near-duplicates of other stories.
+
+        A near-duplicate of a stored story is folded into that story's
+        `sources` list (the outlets carrying it) instead of being inserted;
+        one of a new story earlier in the same batch is folded into that
+        article before it is written. Headlines only match when they link the
+        same tickers. New stories are not added to the story index here; see
+        `_index_stories`, which runs once their insert has succeeded.
+        """
+        self._warm_story_index()
+        fresh: List[Tuple[str, Dict[str, Any]]] = []
+        batch = self.stories.empty_like()
+        primaries: Dict[Any, Dict[str, Any]] = {}
+        merged = 0
+        for text, article in pending:
+            entry = {"source": article["source"], "url": article["url"], "title": text}
+            entities = frozenset(article.get("related_tickers") or ())
+            sketch = self.stories.sketch(text)
+            match = self.stories.lookup(sketch, entities)
+            if match is None:
+                local = batch.lookup(sketch, entities)
+                if local is not None:
+                    primary = primaries[local]
+                    if entry not in primary["sources"]:
+                        primary["sources"].append(entry)
+                    primary["tags"] = list(dict.fromkeys((primary.get("tags") or []) + (article.get("tags") or [])))
+                    primary["relevance"] = max(primary.get("relevance") or 0, article.get("relevance") or 0)
+                    merged += 1
+                    continue
+                article["_id"] = ObjectId()
+                # The primary outlet is listed too, so `sources` covers every outlet carrying the story
+                article["sources"] = [entry]
+                batch.insert(article["_id"], sketch, entities=entities)
+                primaries[article["_id"]] = article
+                fresh.append((text, article))
                 continue
+            self.writer.upsert(
+                self.collection.name,
+                {"_id": match},
+                {
+                    "$addToSet": {
+                        "sources": entry,
+                        "tags": {"$each": article.get("tags") or []},
+                        "related_tickers": {"$each": article.get("related_tickers") or []},
+                    },
+                    "$max": {"relevance": article.get("relevance") or 0},
+                },
+                upsert=False,
+            )
+            merged += 1
+        return fresh, merged
+
+    def _index_stories(self, stored: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Make successfully inserted stories available to later near-duplicate lookups."""
+        for text, article in stored:
+            self.stories.add(article["_id"], text, entities=frozenset(article.get("related_tickers") or ()))
+
+    def _insert_new(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """One unordered insert_many; duplicate-key rejections count as already seen.
 
+        Any other failure raises, so callers do not record the batch as ingested.
+        """
+        if not docs:
+            return []
+        with span("mongo.insert_many", collection=self.collection.name, docs=len(docs)) as sp:
+            inserted = self._insert_docs(docs)
+            sp.set(inserted=len(inserted))
         return inserted
 
-    def fetch_news_for_ticker(self, ticker):
-        print(f"[{datetime.now()}] Fetching news for {ticker} using Finviz...")
+    def _insert_docs(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         try:
-            stock = finvizfinance(ticker)
-            news_df = stock.ticker_news()
-            
-            if news_df is None or news_df.empty:
-                print(f"No news found for {ticker}")
-                return
+            self.collection.insert_many(docs, ordered=False)
+            return docs
+        except BulkWriteError as bwe:
+            errors = bwe.details.get("writeErrors", [])
+            real = [err for err in errors if err.get("code") != 11000]
+            if real:
+                log.error("Error inserting %d articles: %s", len(real), real[0].get("errmsg"))
+                raise
+            failed = {err.get("index") for err in errors}
+            return [d for i, d in enumerate(docs) if i not in failed]
 
-            news_records = news_df.to_dict('records')
-            
-            for item in news_records:
-                title = item.get('Title')
-                link = item.get('Link')
-                dt_raw = item.get('Date')
-                
-                title = self._clean(title or "")
-                link = self._clean(link or "")
-                if not title or not link:
-                    continue
+    def _store_articles(self, pending: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Sentiment-score and insert articles not already stored; returns the inserted ones.
 
-                ts = datetime.now()
-                try:
-                    if isinstance(dt_raw, datetime):
-                        ts = dt_raw
-                    elif isinstance(dt_raw, pd.Timestamp):
-                        ts = dt_raw.to_pydatetime()
-                    elif isinstance(dt_raw, str):
-                        ds = self._clean(dt_raw)
-                        for fmt in ["%b-%d-%y %I:%M%p", "%b-%d-%y"]:
-                            try:
-                                ts = datetime.strptime(ds, fmt)
-                                break
-                            except Exception:
-                                pass
-                except Exception:
-                    ts = datetime.now()
-
-                sentiment_score = self.analyze_sentiment(title)
-                tags = self.generate_tags(title, ticker)
-                relevance = self._score_headline(title, "Finviz Aggregated")
-                
-                article = {
-                    "title": title,
-                    "content": f"{title}. Read more at {link}",
-                    "source": "Finviz Aggregated",
-                    "url": link,
-                    "timestamp": ts,
-                    "sentiment": sentiment_score,
-                    "tags": tags,
-                    "related_ticker": ticker,
-                    "relevance": relevance,
-                }
+        Raises when the insert fails, so callers must not advance any "already
+        ingested" state past `pending`.
+
+        Articles whose fingerprint (or legacy title) is already stored are dropped
+        with one indexed `$in` query and near-duplicates are folded into their
+        story before any TextBlob work; the rest are scored as a single batch
+        and written with a single unordered insert.
+        """
+        if not pending:
+            return []
+        by_fp: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        titles = set()
+        for text, article in pending:
+            if article["title"] in titles:
+                continue
+            titles.add(article["title"])
+            by_fp.setdefault(article["fingerprint"], (text, article))
+        try:
+            cursor = self.collection.find(
+                {"$or": [{"fingerprint": {"$in": list(by_fp)}}, {"title": {"$in": list(titles)}}]},
+                {"fingerprint": 1, "title": 1},
+            )
+            existing_fp, existing_titles = set(), set()
+            for d in cursor:
+                existing_fp.add(d.get("fingerprint"))
+                existing_titles.add(d.get("title"))
+        except Exception as e:
+            log.error("Error checking existing news: %s", e)
+            existing_fp, existing_titles = set(), set()
+        unseen = [v for fp, v in by_fp.items() if fp not in existing_fp and v[1]["title"] not in existing_titles]
+        fresh, merged = self._cluster_articles(unseen)
+        if merged:
+            log.info("folded %s near-duplicate headlines into existing stories", merged)
+        if not fresh:
+            return []
+
+        scores = self.sentiment.score_batch(text for text, _ in fresh)
+        now = datetime.utcnow()
+        for text, article in fresh:
+            article["sentiment"] = scores[headline_key(text)]
+            article["expire_at"] = self._expire_at(article.get("relevance") or 0, now)
+        inserted = self._insert_new([article for _, article in fresh])
+        ids = {article["_id"] for article in inserted}
+        self._index_stories([(text, article) for text, article in fresh if article["_id"] in ids])
+        return inserted
+
+    def fetch_rss_headlines(self) -> int:
+        not_modified = 0
+        failed = 0
+        self._load_feed_state()
+        if not self.feeds:
+            return 0
 
+        # Download and streaming parse fan out across the pool, so cycle time
+        # tracks the slowest feed rather than the sum of all of them. Scoring,
+        # sentiment and writes run on this thread once all I/O is done, and
+        # watermarks only advance after the items are stored.
+        pending: List[Tuple[str, Dict[str, Any]]] = []
+        fetched: List[Tuple[str, str, List[Dict[str, Any]], Dict[str, str]]] = []
+        workers = min(self.max_feed_workers, len(self.feeds))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(bind(self._fetch_feed), name, url) for name, url in self.feeds]
+            for fut in as_completed(futures):
                 try:
-                    result = self.collection.update_one(
-                        {"title": title},
-                        {"$setOnInsert": article},
-                        upsert=True
-                    )
-                    if result.upserted_id:
-                        print(f"News: Inserted new article for {ticker}: {title[:30]}... | Sentiment: {sentiment_score:.2f}")
+                    source_name, url, items, validators = fut.result()
+                    if items is None:
+                        not_modified += 1
+                        continue
+                    fetched.append((source_name, url, items, validators))
+                    pending.extend(self._build_rss_articles(source_name, items))
                 except Exception as e:
-                    print(f"Error inserting article: {e}")
+                    failed += 1
+                    log.warning("RSS feed failed: %s", e)
+                    continue
+
+        # Raises on a failed insert, leaving every watermark where it was
+        inserted = len(self._store_articles(pending))
+        for source_name, url, items, validators in fetched:
+            self._advance_watermark(source_name, url, items, validators)
+
+        if not_modified:
+            log.info("%d/%d feeds unchanged", not_modified, len(self.feeds))
+        if failed:
+            log.warning("%d/%d feeds failed", failed, len(self.feeds))
+        return inserted
+
+    def _fetch_ticker_records(self, ticker: str) -> List[Dict[str, Any]]:
+        with span("news.ticker", sample="news.ticker", ticker=ticker) as sp:
+            records = self.quotes.get(ticker)["news"]
+            if records is None:
+                raise ValueError(f"no news table on the Finviz quote page for {ticker}")
+            sp.set(articles=len(records))
+            return records
+
+    def _build_ticker_articles(self, ticker: str, news_records: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+        pending: List[Tuple[str, Dict[str, Any]]] = []
+        for item in news_records:
+            title = item.get('Title')
+            link = item.get('Link')
+            dt_raw = item.get('Date')
+            
+            title = self._clean(title or "")
+            link = self._clean(link or "")
+            if not title or not link:
+                continue
+
+            ts = datetime.now()
+            try:
+                if isinstance(dt_raw, datetime):
+                    ts = dt_raw
+                elif isinstance(dt_raw, pd.Timestamp):
+                    ts = dt_raw.to_pydatetime()
+                elif isinstance(dt_raw, str):
+                    ds = self._clean(dt_raw)
+                    for fmt in ["%b-%d-%y %I:%M%p", "%b-%d-%y"]:
+                        try:
+                            ts = datetime.strptime(ds, fmt)
+                            break
+                        except Exception:
+                            pass
+            except Exception:
+                ts = datetime.now()
+
+            relevance, tags = self.score_and_tag(title, "Finviz Aggregated", ticker)
+            
+            article = {
+                "title": title,
+                "source": "Finviz Aggregated",
+                "url": link,
+                "timestamp": ts,
+                "tags": tags,
+                "related_ticker": ticker,
+                "relevance": relevance,
+                "fingerprint": self._fingerprint(title, link),
+            }
+            self._link_entities(title, article)
+            pending.append((title, article))
+        return pending
+
+    def fetch_news_for_ticker(self, ticker):
+        log.debug("Fetching news for %s using Finviz", ticker)
+        try:
+            news_records = self._fetch_ticker_records(ticker)
+            if not news_records:
+                log.info("No news found for %s", ticker)
+                return
+
+            inserted = self._store_articles(self._build_ticker_articles(ticker, news_records))
+            self._log_inserted(inserted)
+            self._mark_tickers_fetched({ticker: len(news_records)})
 
         except Exception as e:
-            print(f"Error fetching news for {ticker}: {e}")
+            log.error("Error fetching news for %s: %s", ticker, e)
+
+    def _log_inserted(self, inserted: List[Dict[str, Any]]) -> None:
+        # One event per article, thinned by the `news.article` sample rate
+        for article in inserted:
+            event(log, "inserted article", sample="news.article", ticker=article.get("related_ticker"),
+                  source=article.get("source"), title=article["title"][:60], sentiment=round(article["sentiment"], 2))
+
+    def _mark_tickers_fetched(self, counts: Dict[str, int]) -> None:
+        if not counts:
+            return
+        now = datetime.now()
+        for t, n in counts.items():
+            self.writer.upsert(self.ticker_state.name, {"_id": t}, {"$set": {"last_fetched": now, "last_count": n}})
+
+    def fetch_ticker_news(self, tickers: List[str]) -> Dict[str, Any]:
+        """Fetch Finviz news for every ticker concurrently under the shared Finviz rate limit.
+
+        Returns the cycle stats (also kept on `last_ticker_cycle`).
+        """
+        started = time.monotonic()
+        counts: Dict[str, int] = {}
+        failed: List[str] = []
+        pending: List[Tuple[str, Dict[str, Any]]] = []
+        tickers = list(dict.fromkeys(t for t in tickers if t))
+        if tickers:
+            with ThreadPoolExecutor(max_workers=min(self.max_ticker_workers, len(tickers))) as pool:
+                futures = {pool.submit(bind(self._fetch_ticker_records), t): t for t in tickers}
+                for fut in as_completed(futures):
+                    ticker = futures[fut]
+                    try:
+                        records = fut.result()
+                    except Exception as e:
+                        failed.append(ticker)
+                        log.error("Error fetching news for %s: %s", ticker, e)
+                        continue
+                    counts[ticker] = len(records)
+                    pending.extend(self._build_ticker_articles(ticker, records))
+        fetch_s = time.monotonic() - started
+
+        inserted = self._store_articles(pending)
+        self._log_inserted(inserted)
+        self._mark_tickers_fetched(counts)
 
-    def fetch_all_news(self):
-        print(f"[{datetime.now()}] Starting news fetch cycle...")
+        elapsed = time.monotonic() - started
+        stats = {
+            "tickers": len(tickers),
+            "fetched": len(counts),
+            "failed": len(failed),
+            "articles_seen": len(pending),
+            "articles_inserted": len(inserted),
+            "fetch_seconds": round(fetch_s, 2),
+            "cycle_seconds": round(elapsed, 2),
+            "tickers_per_second": round(len(counts) / elapsed, 2) if elapsed > 0 else 0.0,
+            "finished_at": datetime.now(),
+        }
+        self.last_ticker_cycle = stats
+        event(log, "ticker news cycle", **{k: v for k, v in stats.items() if k != "finished_at"})
+        return stats
+
+    def fetch_all_news(self, tickers: Optional[List[str]] = None):
+        log.info("Starting news fetch cycle")
+        self.entities.refresh_if_stale()
         try:
-            n = self.fetch_rss_headlines()
+            with span("news.rss", feeds=len(self.feeds)) as sp:
+                n = self.fetch_rss_headlines()
+                sp.set(inserted=n)
             if n:
-                print(f"News: inserted {n} breaking headlines (RSS)")
+                log.info("Inserted %d breaking headlines (RSS)", n)
+        except Exception as e:
+            log.error("Error fetching RSS headlines: %s", e)
+        try:
+            self.fetch_ticker_news(tickers or TICKERS)
+        except Exception as e:
+            log.error("Error fetching ticker news: %s", e)
+        retention = self.apply_retention()
+        self.writer.flush()
+        if any(retention.values()):
+            log.info("Retention: backfilled %d, archived %d", retention["backfilled"], retention["archived"])
+        self.publish_snapshot()
+
+    def publish_snapshot(self) -> None:
+        """Publish the newest articles as the `news_latest` snapshot (the backend's /news/latest view)."""
+        try:
+            cursor = self.collection.find({}, list(SNAPSHOT_FIELDS)).sort("timestamp", -1).limit(SNAPSHOT_ARTICLES)
+            rows = [{SNAPSHOT_FIELDS[k]: v for k, v in doc.items() if k in SNAPSHOT_FIELDS} for doc in cursor]
+            self.snapshots.publish("news_latest", rows, limit=SNAPSHOT_ARTICLES)
         except Exception as e:
-            print(f"Error fetching RSS headlines: {e}")
-        for ticker in TICKERS:
-            self.fetch_news_for_ticker(ticker)
-            time.sleep(2)
+            log.error("Error building news snapshot: %s", e)
@@ -1,17 +1,105 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import hashlib
 import json
+import logging
+import time
 from typing import Any, Dict, List, Optional, Tuple
 
-import requests
+import numpy as np
+from pymongo import DeleteOne
+
+from app.crypto import CryptoBars, parse_time, markets_requests
+from app.fetcher import AsyncJSONFetcher
+from app.geolink import GeoLinker
+from app.geogrid import GridAggregator, event_cell, event_magnitude
+from app.ratelimit import COINGECKO_HOST, RateLimiter, upstream_limiter
+from app.snapshots import SnapshotPublisher, shared_publisher
+from app.tracks import TrackStore, parse_states, valid_positions
+from app.writer import BatchWriter, WriteResult, shared_writer
+
+log = logging.getLogger(__name__)
+
+# Fields that change on every write and must not feed the content hash
+_VOLATILE_FIELDS = ("updated_at", "created_at", "content_hash", "grid_cell")
+# USGS summary feeds, smallest first, with the gap each one covers
+USGS_SUMMARY_FEEDS = (
+    (timedelta(hours=1), "all_hour"),
+    (timedelta(days=1), "all_day"),
+    (timedelta(days=7), "all_week"),
+    (timedelta(days=30), "all_month"),
+)
+USGS_OVERLAP = timedelta(minutes=5)
+USGS_INITIAL_LOOKBACK = timedelta(hours=1)
+GDELT_QUERY = "conflict OR earthquake OR wildfire OR flood OR cyber"
+# GDELT publishes in 15-minute batches: one window per batch, re-reading one behind
+GDELT_OVERLAP = timedelta(minutes=15)
+GDELT_WINDOW = timedelta(minutes=15)
+# GDELT asks for gentle polling (about one request per 5 s; faster callers get a
+# plain-text refusal): windows go out one at a time, and a longer outage is
+# caught up over several polls
+GDELT_MAX_WINDOWS = 8
+GDELT_MIN_INTERVAL_S = 5.0
+GDELT_MAX_RECORDS = 250
+# Cap on remembered (source, source_id) -> hash entries before the cache is reset
+_HASH_CACHE_MAX = 100_000
+# World-view grid levels published as snapshots (the map's initial, unfiltered zooms)
+SNAPSHOT_ZOOMS = (2, 4)
+# Events are deleted this long after their last change, and leave the grid with it;
+# aircraft markers go stale soon after a flight lands or leaves coverage
+EVENT_RETENTION = timedelta(days=30)
+EVENT_RETENTION_BY_KIND = {"aviation": timedelta(hours=6)}
+EXPIRE_BATCH = 5000
+
+# (content_hash, grid_cell, kind) as last written for an event
+_Stored = Tuple[Optional[str], Optional[str], Optional[str]]
+# (old_cell, old_kind, new_cell, new_kind, magnitude) for GridAggregator.apply
+_GridMove = Tuple[Optional[str], Optional[str], Optional[str], Optional[str], Optional[float]]
 
 
 class OSINTModule:
-    def __init__(self, db):
+    def __init__(self, db, fetcher: Optional[AsyncJSONFetcher] = None, writer: Optional[BatchWriter] = None,
+                 snapshots: Optional[SnapshotPublisher] = None):
         self.db = db
+        # Pooled async HTTP with per-source retries and circuit breakers
+        self.fetcher = fetcher or AsyncJSONFetcher(user_agent="ScopeOSINT/1.0")
         self.collection = db["osint_events"]
+        # Changed events and watermarks are queued on the shared write-behind writer
+        self.writer = writer or shared_writer(db)
         self.collection.create_index([("source", 1), ("source_id", 1)], unique=True)
         self.collection.create_index([("published_at", -1)])
+        self.collection.create_index([("kind", 1), ("updated_at", 1)], name="kind_updated")
+        # Bounding-box / near queries for the map
+        self.collection.create_index([("geo", "2dsphere")], name="geo_2dsphere")
+        # Precomputed per-cell counts at several zoom levels
+        self.grid = GridAggregator(db, writer=self.writer)
+        self.grid.rebuild_if_empty()
+        self.snapshots = snapshots or shared_publisher()
+        self._map_dirty = True
+        # Nearby company sites, or home countries from fundamentals, for quakes, wildfires and aircraft
+        self.geolinker = GeoLinker(db)
+        self.collection.create_index([("related_tickers", 1), ("published_at", -1)], name="related_tickers_published", sparse=True)
+        # Full-fleet OpenSky positions, bucketed per aircraft with a TTL
+        self.tracks = TrackStore(db, writer=self.writer)
+        # Top-N CoinGecko coins as 1m/5m/1h OHLC bars; only the top few also feed osint_events
+        self.crypto = CryptoBars(db, writer=self.writer)
+        self.crypto_top_n = 250
+        self.coingecko_limiter: RateLimiter = upstream_limiter.limiter(COINGECKO_HOST)
+        self.crypto_event_coins = 10
+        self._hashes: Dict[Tuple[str, str], _Stored] = {}
+        # Queued event writes and deletes as (source, source_id, stored, grid move, result).
+        # Their hashes are remembered and their grid moves applied only once the
+        # writer confirms them, so a failed write is retried and never counted twice.
+        self._unconfirmed: List[Tuple[str, str, Optional[_Stored], _GridMove, WriteResult]] = []
+        # Newest event time ingested per source, so incremental fetchers only ask for the gap.
+        # A new watermark waits in _pending_watermarks until its source's event writes land.
+        self.watermarks = db["osint_watermarks"]
+        self._watermarks: Dict[str, Optional[datetime]] = {}
+        self._pending_watermarks: List[Tuple[str, datetime, List[WriteResult]]] = []
+        # Events per source that the last _upsert_many left for the next poll
+        self._deferred: Dict[str, int] = {}
+        self._gdelt_last = 0.0
+        # Per-source write metrics: events written vs skipped as unchanged
+        self.write_stats: Dict[str, Dict[str, Any]] = {}
 
     def _now(self) -> datetime:
         return datetime.now(timezone.utc)
@@ -27,16 +115,140 @@ class OSINTModule:
             return s
         return s[: max_len - 1] + "…"
 
-    def _request_json(self, method: str, url: str, *, params: Optional[Dict[str, Any]] = None, data: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None, timeout_s: int = 20) -> Dict[str, Any]:
-        hdrs = {"User-Agent": "ScopeOSINT/1.0"}
-        if headers:
-            hdrs.update(headers)
-        if method.lower() == "post":
-            resp = requests.post(url, data=data, params=params, headers=hdrs, timeout=timeout_s)
-        else:
-            resp = requests.get(url, params=params, headers=hdrs, timeout=timeout_s)
-        resp.raise_for_status()
-        return resp.json()
+    def _request_json(self, source: str, method: str, url: str, *, params: Optional[Dict[str, Any]] = None, data: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None, timeout_s: int = 20) -> Dict[str, Any]:
+        return self.fetcher.request_json(source, method, url, params=params, data=data, headers=headers, timeout_s=timeout_s)
+
+    def _fetch(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        return self.fetcher.request_json(**spec)
+
+    def source_status(self) -> Dict[str, Dict[str, Any]]:
+        """Per-source latency, retry and circuit-breaker state, merged with write stats."""
+        status = self.fetcher.status()
+        for source, stats in self.write_stats.items():
+            status.setdefault(source, {}).update({f"write_{k}": v for k, v in stats.items()})
+        return status
+
+    def fetch_all(self) -> Dict[str, Any]:
+        """Fetch every source concurrently, then ingest each payload; returns written count or error per source."""
+        jobs = {
+            "usgs": (self._usgs_request(), self._ingest_usgs),
+            "eonet": (self._eonet_request(), self._ingest_eonet),
+            "urlhaus": (self._urlhaus_request(), self._ingest_urlhaus),
+            "coingecko": (self._coingecko_request(), self._ingest_coingecko),
+            "opensky": (self._opensky_request(), self._ingest_opensky),
+        }
+        # A job's spec may be a list of paged requests; its ingest then gets every page
+        flat: Dict[str, Dict[str, Any]] = {}
+        for name, (spec, _) in jobs.items():
+            if isinstance(spec, list):
+                flat.update({f"{name}#{i}": s for i, s in enumerate(spec)})
+            else:
+                flat[name] = spec
+        payloads = self.fetcher.gather(flat)
+        results: Dict[str, Any] = {}
+        for name, (spec, ingest) in jobs.items():
+            if isinstance(spec, list):
+                data = [payloads.get(f"{name}#{i}") for i in range(len(spec))]
+                if data and all(isinstance(d, BaseException) for d in data):
+                    data = data[0]
+                elif not data:
+                    results[name] = 0
+                    continue
+            else:
+                data = payloads.get(name)
+            if isinstance(data, BaseException):
+                log.error("Error running osint %s: %s", name, data)
+                results[name] = data
+                continue
+            try:
+                results[name] = ingest(data)
+            except Exception as e:
+                log.error("Error ingesting osint %s: %s", name, e)
+                results[name] = e
+        # GDELT is rate limited, so its windows are fetched one at a time after the rest
+        try:
+            results["gdelt"] = self.fetch_gdelt()
+        except Exception as e:
+            log.error("Error running osint gdelt: %s", e)
+            results["gdelt"] = e
+        try:
+            self.expire_events()
+        except Exception as e:
+            log.error("Error expiring osint events: %s", e)
+        self.flush_writes()
+        self.publish_map()
+        return results
+
+    def flush_writes(self) -> bool:
+        """Wait for every queued event write, then settle the ones that landed and write their grid moves."""
+        flushed = self.writer.flush()
+        if self._confirm_writes():
+            flushed = self.writer.flush() and flushed
+        return flushed
+
+    def publish_map(self) -> None:
+        """Publish the world-view grid levels as `osint_grid:<zoom>` snapshots if any cell changed."""
+        if self._confirm_writes():
+            # Read the cells back only once the moves just queued are written
+            self.writer.flush(timeout=60)
+        if not self._map_dirty:
+            return
+        self._map_dirty = False
+        try:
+            for zoom in SNAPSHOT_ZOOMS:
+                cells = list(self.grid.collection.find(
+                    {"zoom": zoom, "count": {"$gt": 0}},
+                    {"_id": 0, "quadkey": 1, "zoom": 1, "bbox": 1, "center": 1, "count": 1, "kinds": 1, "max_magnitude": 1},
+                ).limit(5000))
+                self.snapshots.publish(f"osint_grid:{zoom}", {"zoom": zoom, "cells": cells})
+        except Exception as e:
+            self._map_dirty = True
+            log.error("Error building OSINT map snapshot: %s", e)
+
+    def _watermark(self, source: str) -> Optional[datetime]:
+        if source not in self._watermarks:
+            doc = None
+            try:
+                doc = self.watermarks.find_one({"_id": source})
+            except Exception as e:
+                log.error("Error loading %s watermark: %s", source, e)
+            wm = (doc or {}).get("event_time")
+            if isinstance(wm, datetime) and wm.tzinfo is None:
+                wm = wm.replace(tzinfo=timezone.utc)
+            self._watermarks[source] = wm
+        return self._watermarks[source]
+
+    def _advance_watermark(self, source: str, event_time: Optional[datetime]) -> None:
+        """Move the watermark to `event_time` once every queued write of `source` has landed.
+
+        Until then the next poll still asks for the old gap. If a write fails,
+        or events were left for the next poll, the watermark stays put so the
+        next poll fetches those events again.
+        """
+        deferred = self._deferred.pop(source, 0)
+        current = self._watermark(source)
+        if event_time is None or (current is not None and event_time <= current):
+            return
+        if deferred:
+            log.info("OSINT %s: watermark held back until deferred events are written", source)
+            return
+        results = [result for src, _, _, _, result in self._unconfirmed if src == source]
+        self._pending_watermarks.append((source, event_time, results))
+        self._confirm_watermarks()
+
+    def _confirm_watermarks(self) -> None:
+        pending: List[Tuple[str, datetime, List[WriteResult]]] = []
+        for source, event_time, results in self._pending_watermarks:
+            if not all(r.done for r in results):
+                pending.append((source, event_time, results))
+            elif not all(r.ok for r in results):
+                log.warning("OSINT %s: watermark kept at %s after failed writes", source, self._watermarks.get(source))
+            else:
+                current = self._watermark(source)
+                if current is None or event_time > current:
+                    self._watermarks[source] = event_time
+                    self.writer.upsert(self.watermarks.name, {"_id": source}, {"$set": {"event_time": event_time, "updated_at": self._now()}})
+        self._pending_watermarks = pending
 
     def _hash_id(self, source: str, payload: Dict[str, Any]) -> str:
         raw = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
@@ -47,36 +259,224 @@ class OSINTModule:
             return None
         return {"type": "Point", "coordinates": [float(lon), float(lat)]}
 
+    def _published(self, parsed: Optional[datetime]) -> Dict[str, Any]:
+        """`published_at` fields for an event; without an upstream date it is the first-seen time."""
+        if parsed is not None:
+            return {"published_at": parsed}
+        return {"published_at": self._now(), "published_estimated": True}
+
+    def _parse_iso(self, value: Any) -> Optional[datetime]:
+        if not isinstance(value, str) or not value:
+            return None
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+
+    def _content_hash(self, event: Dict[str, Any]) -> str:
+        # Events are built field by field in a fixed order, so repr() is stable
+        # and far cheaper than a sorted JSON dump. A first-seen published_at
+        # changes every poll, so only the fact that it is estimated is hashed.
+        volatile = _VOLATILE_FIELDS + ("published_at",) if event.get("published_estimated") else _VOLATILE_FIELDS
+        body = [(k, v) for k, v in event.items() if k not in volatile]
+        return hashlib.blake2b(repr(body).encode("utf-8"), digest_size=12).hexdigest()
+
+    def _stored_hashes(self, source: str, source_ids: List[str]) -> Dict[str, _Stored]:
+        """(content_hash, grid_cell, kind) last written for each known source_id."""
+        known = {sid: self._hashes[(source, sid)] for sid in source_ids if (source, sid) in self._hashes}
+        missing = [sid for sid in source_ids if sid not in known]
+        if missing:
+            for doc in self.collection.find(
+                {"source": source, "source_id": {"$in": missing}},
+                {"source_id": 1, "content_hash": 1, "grid_cell": 1, "kind": 1, "_id": 0},
+            ):
+                known[doc["source_id"]] = (doc.get("content_hash"), doc.get("grid_cell"), doc.get("kind"))
+        return known
+
+    def _remember_hashes(self, source: str, hashes: Dict[str, _Stored]) -> None:
+        if len(self._hashes) + len(hashes) > _HASH_CACHE_MAX:
+            self._hashes.clear()
+        for sid, h in hashes.items():
+            self._hashes[(source, sid)] = h
+
+    def _confirm_writes(self) -> int:
+        """Settle finished event writes; returns the grid moves queued.
+
+        A landed write has its hash remembered (or forgotten, for a delete)
+        and its grid move applied. A failed one leaves the old hash so the
+        next poll retries it, and its move is dropped with it. Watermarks
+        waiting on these writes move (or stay) accordingly.
+        """
+        pending: List[Tuple[str, str, Optional[_Stored], _GridMove, WriteResult]] = []
+        landed: Dict[str, Dict[str, _Stored]] = {}
+        moves: List[_GridMove] = []
+        failed: Dict[str, int] = {}
+        for entry in self._unconfirmed:
+            source, sid, stored, move, result = entry
+            if not result.done:
+                pending.append(entry)
+            elif not result.ok:
+                failed[source] = failed.get(source, 0) + 1
+            else:
+                if stored is None:
+                    self._hashes.pop((source, sid), None)
+                else:
+                    landed.setdefault(source, {})[sid] = stored
+                moves.append(move)
+        self._unconfirmed = pending
+        self._confirm_watermarks()
+        for source, hashes in landed.items():
+            self._remember_hashes(source, hashes)
+        for source, n in failed.items():
+            log.warning("OSINT %s: %d event writes failed; they are retried next poll", source, n)
+        if not moves:
+            return 0
+        self._map_dirty = True
+        try:
+            self.grid.apply(moves)
+        except Exception as e:
+            log.error("Error updating OSINT grid: %s", e)
+        return len(moves)
+
+    def expire_events(self) -> int:
+        """Queue deletes for events unchanged for longer than their retention; returns deletes queued."""
+        now = self._now()
+        inflight = {(source, sid) for source, sid, _, _, _ in self._unconfirmed}
+        rules = [({"kind": kind}, now - keep) for kind, keep in EVENT_RETENTION_BY_KIND.items()]
+        rules.append(({"kind": {"$nin": list(EVENT_RETENTION_BY_KIND)}}, now - EVENT_RETENTION))
+        queued = 0
+        for match, cutoff in rules:
+            expired = self.collection.find(
+                {**match, "updated_at": {"$lt": cutoff}},
+                {"source": 1, "source_id": 1, "grid_cell": 1, "kind": 1},
+            ).limit(EXPIRE_BATCH)
+            for doc in expired:
+                if (doc["source"], doc["source_id"]) in inflight:
+                    continue
+                result = WriteResult()
+                self.writer.write(self.collection.name, DeleteOne({"_id": doc["_id"], "updated_at": {"$lt": cutoff}}), result=result)
+                move = (doc.get("grid_cell"), doc.get("kind"), None, None, None)
+                self._unconfirmed.append((doc["source"], doc["source_id"], None, move, result))
+                queued += 1
+        if queued:
+            log.info("OSINT: expiring %d events", queued)
+        return queued
+
     def _upsert_many(self, events: List[Dict[str, Any]]) -> int:
+        """Queue only events whose content changed since the last poll on the batch writer.
+
+        Returns the number of events written; unchanged ones are counted in
+        `write_stats` as skipped, as are events whose previous write is still
+        unconfirmed (the next poll compares them against that write).
+        """
+        events = [e for e in events if e.get("source") and e.get("source_id")]
         if not events:
             return 0
         now = self._now()
-        upserted = 0
+        self._confirm_writes()
+        inflight = {(source, sid) for source, sid, _, _, _ in self._unconfirmed}
+        self.geolinker.refresh_if_stale()
+        by_source: Dict[str, List[Dict[str, Any]]] = {}
         for e in events:
-            if not e.get("source") or not e.get("source_id"):
-                continue
-            e["updated_at"] = now
-            self.collection.update_one(
-                {"source": e["source"], "source_id": e["source_id"]},
-                {"$set": e, "$setOnInsert": {"created_at": now}},
-                upsert=True,
-            )
-            upserted += 1
-        return upserted
+            # Links are part of the content, so a changed universe rewrites affected events
+            self.geolinker.enrich(e)
+            by_source.setdefault(e["source"], []).append(e)
+
+        written = 0
+        for source, batch in by_source.items():
+            latest: Dict[str, Dict[str, Any]] = {}
+            for e in batch:
+                latest[e["source_id"]] = e
+            deferred = [sid for sid in latest if (source, sid) in inflight]
+            for sid in deferred:
+                del latest[sid]
+            self._deferred[source] = len(deferred)
+            stored = self._stored_hashes(source, list(latest))
+            queued = 0
+            changed: Dict[str, _Stored] = {}
+            for sid, e in latest.items():
+                h = self._content_hash(e)
+                prev_hash, prev_cell, prev_kind = stored.get(sid, (None, None, None))
+                if prev_hash == h:
+                    continue
+                cell = event_cell(e)
+                e["content_hash"] = h
+                e["grid_cell"] = cell
+                e["updated_at"] = now
+                changed[sid] = (h, cell, e.get("kind"))
+                # One handle per event, so each write is settled on its own
+                result = WriteResult()
+                move = (prev_cell, prev_kind, cell, e.get("kind"), event_magnitude(e))
+                self._unconfirmed.append((source, sid, changed[sid], move, result))
+                fields, on_insert = dict(e), {"created_at": now}
+                if e.get("published_estimated"):
+                    # Keep the first-seen time rather than moving it on every rewrite
+                    on_insert["published_at"] = fields.pop("published_at")
+                self.writer.upsert(
+                    self.collection.name,
+                    {"source": source, "source_id": sid},
+                    {"$set": fields, "$setOnInsert": on_insert},
+                    result=result,
+                )
+                queued += 1
+            # Hashes read back from Mongo are already stored; changed ones wait for the writer
+            self._remember_hashes(source, {sid: h for sid, h in stored.items() if sid not in changed})
+
+            skipped = len(latest) + len(deferred) - queued
+            stats = self.write_stats.setdefault(source, {"written": 0, "skipped": 0})
+            stats["written"] += queued
+            stats["skipped"] += skipped
+            stats["last_written"] = queued
+            stats["last_skipped"] = skipped
+            stats["last_run"] = now
+            written += queued
+            log.info("OSINT %s: wrote %s, skipped %d unchanged, %d awaiting their last write", source, queued, len(latest) - queued, len(deferred))
+        return written
+
+    def _usgs_since(self, now: Optional[datetime] = None) -> datetime:
+        """Start of the gap still to cover: the `updated` watermark minus a small overlap."""
+        wm = self._watermark("USGS")
+        if wm is None:
+            return (now or self._now()) - USGS_INITIAL_LOOKBACK
+        return wm - USGS_OVERLAP
+
+    def _usgs_request(self) -> Dict[str, Any]:
+        now = self._now()
+        since = self._usgs_since(now)
+        # Smallest summary feed that still covers the gap; FDSN for anything longer
+        for span, feed in USGS_SUMMARY_FEEDS:
+            if now - since <= span:
+                return {"source": "USGS", "method": "get", "url": f"https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/{feed}.geojson"}
+        stamp = since.strftime("%Y-%m-%dT%H:%M:%S")
+        return {
+            "source": "USGS",
+            "method": "get",
+            "url": "https://earthquake.usgs.gov/fdsnws/event/1/query",
+            "params": {"format": "geojson", "starttime": stamp, "updatedafter": stamp, "orderby": "time-asc", "limit": 20000},
+            "timeout_s": 60,
+        }
 
     def fetch_usgs_earthquakes(self) -> int:
-        data = self._request_json("get", "https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/all_hour.geojson")
+        return self._ingest_usgs(self._fetch(self._usgs_request()))
+
+    def _ingest_usgs(self, data: Dict[str, Any]) -> int:
+        since_ms = self._usgs_since().timestamp() * 1000
+        newest_ms: Optional[float] = None
         out: List[Dict[str, Any]] = []
         for f in data.get("features", []):
             props = f.get("properties") or {}
+            updated_ms = props.get("updated")
+            if isinstance(updated_ms, (int, float)):
+                # Feeds span more than the gap; events not updated since the watermark are old work
+                if updated_ms < since_ms:
+                    continue
+                newest_ms = updated_ms if newest_ms is None else max(newest_ms, updated_ms)
             geom = f.get("geometry") or {}
             coords = geom.get("coordinates") or []
             lon = coords[0] if len(coords) > 0 else None
             lat = coords[1] if len(coords) > 1 else None
             ts_ms = props.get("time")
-            published_at = self._now()
-            if isinstance(ts_ms, (int, float)):
-                published_at = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
+            published_at = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc) if isinstance(ts_ms, (int, float)) else None
             mag = props.get("mag")
             place = props.get("place") or ""
             title = props.get("title") or f"M{mag} {place}".strip()
@@ -84,37 +484,40 @@ class OSINTModule:
             out.append(
                 {
                     "source": "USGS",
-                    "source_id": f"usgs:{f.get('id') or self._hash_id('usgs', f)}",
+                    "source_id": f"usgs:{f.get('id') or self._hash_id('usgs', {'time': ts_ms, 'coords': coords})}",
                     "kind": "earthquake",
                     "title": self._truncate(str(title), 160),
                     "summary": self._truncate(str(summary), 320),
                     "url": props.get("url") or "",
                     "region": place,
                     "category": "Earthquake",
-                    "published_at": published_at,
+                    **self._published(published_at),
                     "geo": self._point(lon, lat),
                     "tags": ["earthquake", "usgs"],
                     "metrics": {"magnitude": mag, "tsunami": props.get("tsunami"), "depth_km": coords[2] if len(coords) > 2 else None},
                 }
             )
-        return self._upsert_many(out)
+        written = self._upsert_many(out)
+        if newest_ms is not None:
+            self._advance_watermark("USGS", datetime.fromtimestamp(newest_ms / 1000, tz=timezone.utc))
+        return written
+
+    def _eonet_request(self) -> Dict[str, Any]:
+        return {"source": "NASA EONET", "method": "get", "url": "https://eonet.gsfc.nasa.gov/api/v3/events", "params": {"status": "open", "limit": 50}}
 
     def fetch_nasa_eonet(self) -> int:
-        data = self._request_json("get", "https://eonet.gsfc.nasa.gov/api/v3/events", params={"status": "open", "limit": 50})
+        return self._ingest_eonet(self._fetch(self._eonet_request()))
+
+    def _ingest_eonet(self, data: Dict[str, Any]) -> int:
         out: List[Dict[str, Any]] = []
         for ev in data.get("events", []):
             geometries = ev.get("geometry") or []
-            published_at = self._now()
+            published_at = None
             lon = None
             lat = None
             if geometries:
                 g0 = geometries[-1]
-                date_str = g0.get("date")
-                if isinstance(date_str, str) and date_str:
-                    try:
-                        published_at = datetime.fromisoformat(date_str.replace("Z", "+00:00"))
-                    except Exception:
-                        published_at = self._now()
+                published_at = self._parse_iso(g0.get("date"))
                 coords = g0.get("coordinates")
                 if isinstance(coords, list) and len(coords) == 2 and all(isinstance(x, (int, float)) for x in coords):
                     lon, lat = coords[0], coords[1]
@@ -124,41 +527,107 @@ class OSINTModule:
             out.append(
                 {
                     "source": "NASA EONET",
-                    "source_id": f"eonet:{ev.get('id') or self._hash_id('eonet', ev)}",
+                    "source_id": f"eonet:{ev.get('id') or self._hash_id('eonet', {'title': title, 'link': ev.get('link')})}",
                     "kind": "disaster",
                     "title": self._truncate(str(title), 160),
                     "summary": self._truncate(str(title), 320),
                     "url": ev.get("link") or "",
                     "region": "Global",
                     "category": cat or "Disaster",
-                    "published_at": published_at if isinstance(published_at, datetime) else self._now(),
+                    **self._published(published_at),
                     "geo": self._point(lon, lat),
                     "tags": ["disaster", "eonet"],
                 }
             )
         return self._upsert_many(out)
 
-    def fetch_gdelt(self, query: str = "conflict OR earthquake OR wildfire OR flood OR cyber") -> int:
-        data = self._request_json(
-            "get",
-            "https://api.gdeltproject.org/api/v2/doc/doc",
-            params={
-                "query": query,
-                "mode": "ArtList",
-                "format": "json",
-                "maxrecords": 50,
-                "sort": "HybridRel",
-            },
-        )
+    def _gdelt_request(self, query: str = GDELT_QUERY) -> List[Dict[str, Any]]:
+        """One DateAsc request per GDELT_WINDOW between the watermark and now."""
+        now = self._now()
+        wm = self._watermark("GDELT")
+        start = (wm - GDELT_OVERLAP) if wm is not None else now - GDELT_WINDOW
+        # GDELT's DOC API only searches the last three months
+        start = max(start, now - timedelta(days=89))
+        specs: List[Dict[str, Any]] = []
+        while start < now and len(specs) < GDELT_MAX_WINDOWS:
+            end = min(now, start + GDELT_WINDOW)
+            specs.append({
+                "source": "GDELT",
+                "method": "get",
+                "url": "https://api.gdeltproject.org/api/v2/doc/doc",
+                "params": {
+                    "query": query,
+                    "mode": "ArtList",
+                    "format": "json",
+                    "maxrecords": GDELT_MAX_RECORDS,
+                    "sort": "DateAsc",
+                    "startdatetime": start.strftime("%Y%m%d%H%M%S"),
+                    "enddatetime": end.strftime("%Y%m%d%H%M%S"),
+                },
+            })
+            start = end
+        return specs
+
+    def _gdelt_pages(self, specs: List[Dict[str, Any]]) -> List[Any]:
+        """Fetch windows in order, at least GDELT_MIN_INTERVAL_S apart, stopping at the first failure.
+
+        The watermark cannot pass a failed window anyway, and pressing on
+        would only collect more refusals toward the circuit breaker.
+        """
+        pages: List[Any] = []
+        for spec in specs:
+            wait = self._gdelt_last + GDELT_MIN_INTERVAL_S - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                pages.append(self._fetch(spec))
+            except Exception as e:
+                pages.append(e)
+                break
+            finally:
+                self._gdelt_last = time.monotonic()
+        return pages
+
+    def fetch_gdelt(self, query: str = GDELT_QUERY) -> int:
+        specs = self._gdelt_request(query)
+        return self._ingest_gdelt(self._gdelt_pages(specs), specs)
+
+    def _gdelt_seendate(self, a: Dict[str, Any]) -> Optional[datetime]:
+        # GDELT sends "20240125T151500Z"; keep only the digits
+        seendate = "".join(ch for ch in str(a.get("seendate") or "") if ch.isdigit())
+        if len(seendate) >= 14:
+            try:
+                return datetime.strptime(seendate[:14], "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
+            except Exception:
+                return None
+        return None
+
+    def _ingest_gdelt(self, pages: List[Any], specs: List[Dict[str, Any]]) -> int:
+        """Store every window's articles and move the watermark through the contiguous fetched windows.
+
+        A failed window stops the watermark so the next poll retries it. The
+        DOC API cannot page inside a window, so a full window is only logged.
+        """
+        articles: List[Dict[str, Any]] = []
+        covered: Optional[datetime] = None
+        contiguous = True
+        for page, spec in zip(pages, specs):
+            if isinstance(page, BaseException) or not isinstance(page, dict):
+                if isinstance(page, BaseException):
+                    log.error("Error fetching GDELT window %s: %s", spec['params']['startdatetime'], page)
+                contiguous = False
+                continue
+            batch = page.get("articles") or []
+            articles.extend(batch)
+            if len(batch) >= GDELT_MAX_RECORDS:
+                log.warning("GDELT window %s hit %s records; older articles in it were cut", spec['params']['startdatetime'], GDELT_MAX_RECORDS)
+            if contiguous:
+                covered = datetime.strptime(spec["params"]["enddatetime"], "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
+
         out: List[Dict[str, Any]] = []
-        for a in data.get("articles", []):
+        for a in articles:
             seendate = a.get("seendate") or ""
-            published_at = self._now()
-            if isinstance(seendate, str) and len(seendate) >= 14:
-                try:
-                    published_at = datetime.strptime(seendate[:14], "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
-                except Exception:
-                    published_at = self._now()
+            published_at = self._gdelt_seendate(a)
             title = a.get("title") or ""
             url = a.get("url") or ""
             source_country = a.get("sourceCountry") or ""
@@ -172,23 +641,25 @@ class OSINTModule:
                     "url": url,
                     "region": source_country or "Global",
                     "category": "Global Events",
-                    "published_at": published_at,
+                    **self._published(published_at),
                     "tags": ["gdelt", "events"],
                 }
             )
-        return self._upsert_many(out)
+        written = self._upsert_many(out)
+        self._advance_watermark("GDELT", covered)
+        return written
+
+    def _urlhaus_request(self, limit: int = 50) -> Dict[str, Any]:
+        return {"source": "URLhaus", "method": "post", "url": "https://urlhaus-api.abuse.ch/v1/urls/recent/", "data": {"limit": str(limit)}}
 
     def fetch_urlhaus_recent(self, limit: int = 50) -> int:
-        data = self._request_json("post", "https://urlhaus-api.abuse.ch/v1/urls/recent/", data={"limit": str(limit)})
+        return self._ingest_urlhaus(self._fetch(self._urlhaus_request(limit)))
+
+    def _ingest_urlhaus(self, data: Dict[str, Any]) -> int:
         out: List[Dict[str, Any]] = []
         for u in data.get("urls", []) or []:
             date_added = u.get("date_added") or ""
-            published_at = self._now()
-            if isinstance(date_added, str) and date_added:
-                try:
-                    published_at = datetime.fromisoformat(date_added.replace("Z", "+00:00"))
-                except Exception:
-                    published_at = self._now()
+            published_at = self._parse_iso(date_added)
             threat = u.get("threat") or "malicious"
             url = u.get("url") or ""
             title = f"URLhaus: {threat}"
@@ -205,57 +676,72 @@ class OSINTModule:
                     "url": url,
                     "region": "Global",
                     "category": threat,
-                    "published_at": published_at,
+                    **self._published(published_at),
                     "tags": ["cyber", "urlhaus"] + [str(t) for t in tags[:8]],
                 }
             )
         return self._upsert_many(out)
 
-    def fetch_coingecko_prices(self, ids: Optional[List[str]] = None) -> int:
-        if ids is None:
-            ids = ["bitcoin", "ethereum", "solana", "cardano", "ripple"]
-        data = self._request_json(
-            "get",
-            "https://api.coingecko.com/api/v3/simple/price",
-            params={
-                "ids": ",".join(ids),
-                "vs_currencies": "usd",
-                "include_24hr_change": "true",
-            },
-        )
+    def _coingecko_request(self) -> List[Dict[str, Any]]:
+        return markets_requests(self.crypto_top_n)
+
+    def fetch_coingecko_prices(self) -> int:
+        # Pages over the CoinGecko budget are skipped rather than waited for,
+        # so a large crypto_top_n cannot stall the scheduler or trip a 429
+        specs = self._coingecko_request()
+        allowed = [spec for spec in specs if self.coingecko_limiter.acquire(timeout=0)]
+        if len(allowed) < len(specs):
+            log.warning("CoinGecko: %d/%d markets pages skipped, over the rate budget", len(specs) - len(allowed), len(specs))
+        if not allowed:
+            return 0
+        pages = self.fetcher.gather({str(i): spec for i, spec in enumerate(allowed)})
+        return self._ingest_coingecko(list(pages.values()))
+
+    def _ingest_coingecko(self, pages: List[Any]) -> int:
+        """Fold the market pages into OHLC bars; keep one live event per top coin for the feed."""
         now = self._now()
+        for page in pages:
+            if isinstance(page, BaseException):
+                log.error("Error fetching CoinGecko markets page: %s", page)
+        rows, bars = self.crypto.ingest_markets([p for p in pages if not isinstance(p, BaseException)], now)
+        log.info("CoinGecko: %d coins, %s bars updated", len(rows), bars)
         out: List[Dict[str, Any]] = []
-        for coin_id, v in (data or {}).items():
-            if not isinstance(v, dict):
-                continue
-            price = v.get("usd")
-            change = v.get("usd_24h_change")
-            title = f"{coin_id.upper()} ${price}"
+        for row in rows[: self.crypto_event_coins]:
+            coin_id = row["id"]
+            symbol = (row.get("symbol") or coin_id).upper()
+            price = row.get("current_price")
+            change = row.get("price_change_percentage_24h")
+            title = f"{symbol} ${price}"
             if change is not None:
-                title = f"{coin_id.upper()} ${price} ({change:+.2f}% 24h)"
+                title = f"{symbol} ${price} ({change:+.2f}% 24h)"
             out.append(
                 {
                     "source": "CoinGecko",
-                    "source_id": f"coingecko:{coin_id}:{now.strftime('%Y%m%d%H%M')}",
+                    "source_id": f"coingecko:{coin_id}",
                     "kind": "crypto",
                     "title": self._truncate(title, 160),
                     "summary": self._truncate(f"USD price for {coin_id}: {price} (24h change: {change})", 320),
                     "url": f"https://www.coingecko.com/en/coins/{coin_id}",
                     "region": "Global",
                     "category": "Crypto",
-                    "published_at": now,
+                    "published_at": parse_time(row.get("last_updated")) or now,
                     "tags": ["crypto", "coingecko", coin_id],
-                    "metrics": {"usd": price, "usd_24h_change": change},
+                    "metrics": {"usd": price, "usd_24h_change": change, "market_cap_rank": row.get("market_cap_rank")},
                 }
             )
         return self._upsert_many(out)
 
-    def fetch_opensky_states(self, lamin: Optional[float] = None, lomin: Optional[float] = None, lamax: Optional[float] = None, lomax: Optional[float] = None, limit: int = 200) -> int:
+    def _opensky_request(self, lamin: Optional[float] = None, lomin: Optional[float] = None, lamax: Optional[float] = None, lomax: Optional[float] = None) -> Dict[str, Any]:
         params: Dict[str, Any] = {}
         if lamin is not None and lomin is not None and lamax is not None and lomax is not None:
             params.update({"lamin": lamin, "lomin": lomin, "lamax": lamax, "lomax": lomax})
-        data = self._request_json("get", "https://opensky-network.org/api/states/all", params=params)
-        states = data.get("states") or []
+        # OpenSky is the slowest upstream; give it longer before retrying
+        return {"source": "OpenSky", "method": "get", "url": "https://opensky-network.org/api/states/all", "params": params, "timeout_s": 30}
+
+    def fetch_opensky_states(self, lamin: Optional[float] = None, lomin: Optional[float] = None, lamax: Optional[float] = None, lomax: Optional[float] = None, limit: Optional[int] = 200) -> int:
+        return self._ingest_opensky(self._fetch(self._opensky_request(lamin, lomin, lamax, lomax)), limit)
+
+    def _ingest_opensky(self, data: Dict[str, Any], limit: Optional[int] = 200) -> int:
         ts = data.get("time")
         published_at = self._now()
         if isinstance(ts, (int, float)):
@@ -263,34 +749,46 @@ class OSINTModule:
                 published_at = datetime.fromtimestamp(ts, tz=timezone.utc)
             except Exception:
                 published_at = self._now()
+        cols = parse_states(data.get("states"))
+        mask = valid_positions(cols, published_at.timestamp())
+
+        # Every aircraft goes to the bucketed track store ...
+        try:
+            stats = self.tracks.record(cols, mask, now_ts=published_at.timestamp())
+            log.info("OpenSky: %s aircraft, %s track points, %s downsampled", stats['seen'], stats['written'], stats['skipped'])
+        except Exception as e:
+            log.error("Error writing OpenSky tracks: %s", e)
+
+        # ... while map markers stay capped at `limit`, airborne aircraft first
+        idx = np.flatnonzero(mask)
+        idx = idx[np.argsort(cols["on_ground"][idx], kind="stable")]
+        if limit is not None:
+            idx = idx[:limit]
+        icao24 = cols["icao24"][idx].tolist()
+        callsign = cols["callsign"][idx].tolist()
+        origin = cols["origin"][idx].tolist()
+        lon = cols["lon"][idx].tolist()
+        lat = cols["lat"][idx].tolist()
+        velocity = [None if v != v else v for v in cols["velocity"][idx].tolist()]
+        heading = [None if h != h else h for h in cols["heading"][idx].tolist()]
         out: List[Dict[str, Any]] = []
-        for s in states[: limit]:
-            if not isinstance(s, list) or len(s) < 8:
-                continue
-            icao24 = s[0] or ""
-            callsign = (s[1] or "").strip()
-            origin = s[2] or ""
-            lon = s[5]
-            lat = s[6]
-            velocity = s[9] if len(s) > 9 else None
-            heading = s[10] if len(s) > 10 else None
-            if not isinstance(lon, (int, float)) or not isinstance(lat, (int, float)):
-                continue
-            title = f"{callsign or icao24} over {origin}" if origin else (callsign or icao24)
+        for i in range(len(idx)):
+            name = callsign[i] or icao24[i]
+            title = f"{name} over {origin[i]}" if origin[i] else name
             out.append(
                 {
                     "source": "OpenSky",
-                    "source_id": f"opensky:{icao24}",
+                    "source_id": f"opensky:{icao24[i]}",
                     "kind": "aviation",
                     "title": self._truncate(title, 160),
-                    "summary": self._truncate(f"{callsign or icao24} {origin}", 320),
+                    "summary": self._truncate(f"{name} {origin[i]}", 320),
                     "url": "https://opensky-network.org",
-                    "region": origin or "Global",
+                    "region": origin[i] or "Global",
                     "category": "Aircraft",
                     "published_at": published_at,
-                    "geo": self._point(lon, lat),
+                    "geo": self._point(lon[i], lat[i]),
                     "tags": ["aviation", "opensky"],
-                    "metrics": {"velocity": velocity, "heading": heading},
+                    "metrics": {"velocity": velocity[i], "heading": heading[i]},
                 }
             )
         return self._upsert_many(out)
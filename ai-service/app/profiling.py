@@ -0,0 +1,215 @@
+import cProfile
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+MODES = ("cprofile", "sample")
+
+
+def parse_requests(spec: str) -> Dict[str, Tuple[int, str]]:
+    """`"news:3:sample, fundamentals"` -> {job: (runs, mode)}; runs default 1, mode cprofile."""
+    out: Dict[str, Tuple[int, str]] = {}
+    for part in re.split(r"[,\n]", spec or ""):
+        part = part.split("#", 1)[0].strip()
+        if not part:
+            continue
+        fields = [f.strip() for f in part.split(":")]
+        job = fields[0]
+        runs = 1
+        mode = "cprofile"
+        for f in fields[1:]:
+            if f.isdigit():
+                runs = int(f)
+            elif f in MODES:
+                mode = f
+        if job:
+            out[job] = (runs, mode)
+    return out
+
+
+class StackSampler:
+    """Low-overhead wall-clock sampler producing collapsed stacks (flamegraph.pl / speedscope input).
+
+    Every `interval_s` a daemon thread reads `sys._current_frames()` and
+    counts each thread's stack, rooted at the thread name, so time spent in
+    thread-pool workers (network waits, pandas, TextBlob) shows up next to
+    the job's own thread.
+    """
+
+    def __init__(self, interval_s: float = 0.005):
+        self.interval_s = interval_s
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stack(self, frame) -> str:
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(parts))
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                self.samples[f"{names.get(ident, ident)};{self._stack(frame)}"] += 1
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="job-profiler-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class JobProfiler:
+    """Profiles named scheduled jobs for their next N runs.
+
+    Requests come from the PROFILE_JOBS env var at startup and from the
+    control file PROFILE_CONTROL (re-read whenever its mtime changes after
+    startup, so a file left over from an earlier run is not replayed), both
+    in the form `job[:runs][:mode]`, comma or newline separated, e.g.
+    `news:3:sample, fundamentals`. Mode `cprofile` is deterministic and
+    covers the job's own thread and writes `.pstats`; `sample` is a
+    wall-clock sampler over all threads and writes `.collapsed` stacks.
+    Files go to PROFILE_DIR, keeping the newest `keep`.
+    """
+
+    def __init__(self, directory: str = "profiles", keep: int = 50, control_file: Optional[str] = None,
+                 requests: Optional[Dict[str, Tuple[int, str]]] = None, sample_interval_s: float = 0.005):
+        self.directory = directory
+        self.keep = keep
+        self.control_file = control_file
+        self.sample_interval_s = sample_interval_s
+        self._armed: Dict[str, List[Any]] = {job: [runs, mode] for job, (runs, mode) in (requests or {}).items()}
+        # Only edits made while running arm jobs; startup requests come from PROFILE_JOBS
+        self._control_mtime: Optional[float] = self._file_mtime()
+        self._lock = threading.Lock()
+        if self._armed:
+            log.info("Profiling armed: %s", self._describe())
+
+    @classmethod
+    def from_env(cls) -> "JobProfiler":
+        return cls(
+            directory=os.getenv("PROFILE_DIR", "profiles"),
+            keep=int(os.getenv("PROFILE_KEEP", "50")),
+            control_file=os.getenv("PROFILE_CONTROL", "profile_control.txt"),
+            requests=parse_requests(os.getenv("PROFILE_JOBS", "")),
+            sample_interval_s=float(os.getenv("PROFILE_SAMPLE_MS", "5")) / 1000.0,
+        )
+
+    def _describe(self) -> str:
+        return ", ".join(f"{job} x{runs} ({mode})" for job, (runs, mode) in self._armed.items())
+
+    def _file_mtime(self) -> Optional[float]:
+        if not self.control_file:
+            return None
+        try:
+            return os.path.getmtime(self.control_file)
+        except OSError:
+            return None
+
+    def _poll_control(self) -> None:
+        mtime = self._file_mtime()
+        if mtime is None or mtime == self._control_mtime:
+            return
+        self._control_mtime = mtime
+        try:
+            with open(self.control_file, "r", encoding="utf-8") as f:
+                requests = parse_requests(f.read())
+        except Exception as e:
+            log.error("Error reading profile control file %s: %s", self.control_file, e)
+            return
+        with self._lock:
+            # An edit re-arms the listed jobs with fresh counts
+            for job, (runs, mode) in requests.items():
+                self._armed[job] = [runs, mode]
+            if requests:
+                log.info("Profiling armed from %s: %s", self.control_file, self._describe())
+
+    def _take(self, job: str) -> Optional[str]:
+        self._poll_control()
+        with self._lock:
+            entry = self._armed.get(job)
+            if not entry or entry[0] <= 0:
+                return None
+            entry[0] -= 1
+            if entry[0] <= 0:
+                del self._armed[job]
+            return entry[1]
+
+    def _rotate(self) -> None:
+        try:
+            files = [os.path.join(self.directory, n) for n in os.listdir(self.directory)
+                     if n.endswith((".pstats", ".collapsed"))]
+        except OSError:
+            return
+        files.sort(key=os.path.getmtime, reverse=True)
+        for old in files[self.keep:]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def run(self, job: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call `fn`, under a profiler if `job` is armed."""
+        mode = self._take(job)
+        if mode is None:
+            return fn(*args, **kwargs)
+
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S_%f")
+        started = time.perf_counter()
+        if mode == "sample":
+            sampler = StackSampler(self.sample_interval_s)
+            sampler.start()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                sampler.stop()
+                path = os.path.join(self.directory, f"{job}-{stamp}.collapsed")
+                self._finish(job, mode, started, path, lambda: sampler.write(path))
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            path = os.path.join(self.directory, f"{job}-{stamp}.pstats")
+            self._finish(job, mode, started, path, lambda: profile.dump_stats(path))
+
+    def _finish(self, job: str, mode: str, started: float, path: str, dump: Callable[[], None]) -> None:
+        try:
+            dump()
+            self._rotate()
+            log.info("Profiled %s (%s, %.1fs) -> %s", job, mode, time.perf_counter() - started, path)
+        except Exception as e:
+            log.error("Error writing %s profile: %s", job, e)
+
+    def wrap(self, job: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """`fn` as a schedulable callable that honours profiling requests for `job`."""
+        def _job(*args, **kwargs):
+            return self.run(job, fn, *args, **kwargs)
+        _job.__name__ = getattr(fn, "__name__", job)
+        return _job
@@ -0,0 +1,152 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.ratelimit import FINVIZ_HOST, RateLimiter, upstream_limiter
+from app.tracing import span
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def load_quote_page(ticker: str) -> Dict[str, Any]:
+    """Download a Finviz quote page and keep only its two tables.
+
+    Returns `{"fundament": dict | None, "news": list of records | None}`; a
+    table that fails to extract is None. A page where neither table extracts
+    raises instead, so it is never cached as a result. The parsed
+    BeautifulSoup tree is dropped here, so cached pages cost kilobytes rather
+    than megabytes.
+    """
+    from finvizfinance.quote import finvizfinance
+
+    stock = finvizfinance(ticker)
+    page: Dict[str, Any] = {"fundament": None, "news": None}
+    errors = []
+    try:
+        page["fundament"] = stock.ticker_fundament()
+    except Exception as e:
+        errors.append(f"fundament: {type(e).__name__}: {e}")
+    try:
+        news_df = stock.ticker_news()
+        page["news"] = [] if news_df is None or news_df.empty else news_df.to_dict("records")
+    except Exception as e:
+        errors.append(f"news: {type(e).__name__}: {e}")
+    if page["fundament"] is None and page["news"] is None:
+        raise ValueError(f"no tables extracted from the Finviz quote page for {ticker} ({'; '.join(errors) or 'empty page'})")
+    return page
+
+
+class QuoteCache:
+    """Process-wide, single-flight cache of extracted Finviz quote-page tables.
+
+    One quote page download carries both the fundamentals table and the news
+    table. News and fundamentals jobs share one cache, so a page fetched by
+    either is reused by the other for `ttl_s` seconds. Concurrent requests for
+    the same ticker wait on the single download in flight instead of starting
+    their own. Only the extracted tables are kept (see `load_quote_page`) and
+    every caller gets its own copy, so threads never share mutable state.
+    Expired entries are purged as the cache is used and the rest are evicted
+    least-recently-used beyond `max_entries`, which `size_for()` grows to the
+    ticker universe so one pass over it is still cached for the next job.
+    Failures are passed to every waiter but never cached.
+    """
+
+    def __init__(self, ttl_s: float = 900.0, max_entries: int = 128, rate_limiter: Optional[RateLimiter] = None,
+                 loader: Optional[Callable[[str], Dict[str, Any]]] = None):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        # Only real downloads spend the shared Finviz budget; cache hits are free
+        self.rate_limiter = rate_limiter or upstream_limiter.limiter(FINVIZ_HOST)
+        self._loader = loader
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+        self.stats = {"hits": 0, "misses": 0, "shared": 0, "errors": 0, "expired": 0}
+
+    def _load(self, ticker: str) -> Dict[str, Any]:
+        return (self._loader or load_quote_page)(ticker)
+
+    def _purge(self, now: float) -> None:
+        # Callers hold the lock; a full sweep at most every ttl/10 keeps lookups O(1) on average
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.ttl_s / 10
+        expired = [k for k, (loaded, _) in self._entries.items() if now - loaded >= self.ttl_s]
+        for k in expired:
+            del self._entries[k]
+        self.stats["expired"] += len(expired)
+
+    def get(self, ticker: str) -> Dict[str, Any]:
+        """`{"fundament", "news"}` tables for `ticker` (a private copy), from cache or a single shared download."""
+        key = ticker.upper()
+        with self._lock:
+            now = time.monotonic()
+            self._purge(now)
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl_s:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return copy.deepcopy(entry[1])
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.stats["misses"] += 1
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.value)
+
+        try:
+            self.rate_limiter.acquire()
+            with span("upstream", sample="upstream.finviz", source="finviz", ticker=key):
+                flight.value = self._load(key)
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        else:
+            with self._lock:
+                self._entries[key] = (time.monotonic(), flight.value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return copy.deepcopy(flight.value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def size_for(self, tickers: int) -> None:
+        """Grow `max_entries` to hold `tickers` pages; never shrinks."""
+        with self._lock:
+            self.max_entries = max(self.max_entries, int(tickers))
+
+    def invalidate(self, ticker: Optional[str] = None) -> None:
+        with self._lock:
+            if ticker is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(ticker.upper(), None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared by NewsModule and FundamentalsModule
+finviz_quotes = QuoteCache()
@@ -0,0 +1,89 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class RateLimiter:
+    """Thread-safe token bucket shared by concurrent fetchers.
+
+    `rate` tokens are added per second up to `burst`; `acquire()` blocks
+    until a token is available so worker threads never exceed the budget.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._last = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else 1.0
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class HostRateLimiter:
+    """One RateLimiter per upstream host, created on first use.
+
+    Hosts without an explicit entry in `limits` get `default_rate`/`default_burst`.
+    """
+
+    def __init__(self, default_rate: float = 1.0, default_burst: int = 1, limits: Optional[Dict[str, Tuple[float, int]]] = None):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.limits = dict(limits or {})
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url_or_host: str) -> str:
+        if "://" in url_or_host:
+            return urlsplit(url_or_host).hostname or url_or_host
+        return url_or_host
+
+    def limiter(self, url_or_host: str) -> RateLimiter:
+        host = self._host(url_or_host)
+        with self._lock:
+            lim = self._limiters.get(host)
+            if lim is None:
+                rate, burst = self.limits.get(host, (self.default_rate, self.default_burst))
+                lim = self._limiters[host] = RateLimiter(rate, burst)
+            return lim
+
+    def acquire(self, url_or_host: str, timeout: Optional[float] = None) -> bool:
+        return self.limiter(url_or_host).acquire(timeout)
+
+
+FINVIZ_HOST = "finviz.com"
+COINGECKO_HOST = "api.coingecko.com"
+
+# Process-wide limits so every module hitting the same upstream shares one budget.
+# CoinGecko's keyless API allows roughly 10-30 calls a minute depending on load;
+# 10/min keeps a one-page top-250 poll every minute well inside the low end.
+upstream_limiter = HostRateLimiter(default_rate=2.0, default_burst=2, limits={
+    FINVIZ_HOST: (1.0, 2),
+    COINGECKO_HOST: (10 / 60, 2),
+})
@@ -0,0 +1,285 @@
+"""Record upstream HTTP responses to disk fixtures and replay them offline.
+
+`install("record", dir)` wraps the three ways the service reaches the
+network (requests adapters, curl_cffi sessions used by yfinance, and the
+aiohttp OSINT fetcher) so every response is also written to `dir`.
+`install("replay", dir)` serves those fixtures instead and never touches the
+network; a request with no exact fixture falls back to the newest one
+recorded for the same host and the longest matching path prefix, so
+synthetic tickers and moving time windows still resolve. A request with no
+fixture at all raises ReplayMiss (a ConnectionError), which the modules
+already treat as an upstream failure.
+
+Set UPSTREAM_MODE=record|replay and UPSTREAM_FIXTURES=<dir> to enable it for
+main.py.
+"""
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+log = logging.getLogger(__name__)
+
+# Headers that describe the wire encoding rather than the stored (decoded) body
+_DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection", "set-cookie"}
+
+
+class ReplayMiss(requests.exceptions.ConnectionError):
+    """No fixture recorded for this request."""
+
+
+def _canonical(url: str, params: Any = None) -> Tuple[str, str, str]:
+    """(full canonical url, host, path) with query parameters sorted."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        items = params.items() if isinstance(params, dict) else params
+        query.extend((str(k), str(v)) for k, v in items)
+    host = (parts.hostname or "").lower()
+    path = parts.path or "/"
+    return f"{parts.scheme}://{host}{path}?{urlencode(sorted(query))}", host, path
+
+
+def _body_bytes(body: Any) -> bytes:
+    if body is None:
+        return b""
+    if isinstance(body, bytes):
+        return body
+    if isinstance(body, dict):
+        return urlencode(sorted((str(k), str(v)) for k, v in body.items())).encode()
+    return str(body).encode()
+
+
+class FixtureStore:
+    """One JSON file per response under <root>/<host>/, plus an in-memory route index."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, str] = {}
+        self._by_route: Dict[Tuple[str, str], List[Tuple[float, str]]] = {}
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"recorded": 0, "exact": 0, "fallback": 0, "missed": 0}
+        self._scan()
+
+    def _key(self, method: str, url: str, body: bytes) -> str:
+        return hashlib.sha1(method.upper().encode() + b" " + url.encode() + b"\n" + body).hexdigest()
+
+    def _index(self, path: str, doc: Dict[str, Any]) -> None:
+        self._by_key[doc["key"]] = path
+        route = self._by_route.setdefault((doc["method"], doc["host"]), [])
+        route.append((doc.get("recorded_at", 0.0), path))
+        route.sort(reverse=True)
+
+    def _scan(self) -> None:
+        if not os.path.isdir(self.root):
+            return
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        doc = json.load(f)
+                    self._index(path, {k: doc.get(k) for k in ("key", "method", "host", "path", "recorded_at")})
+                except Exception as e:
+                    log.warning("skipping unreadable fixture %s: %s", path, e)
+
+    def save(self, method: str, url: str, body: bytes, status: int, headers: Dict[str, str],
+             content: Optional[bytes] = None, payload: Any = None) -> None:
+        canon, host, path = _canonical(url)
+        key = self._key(method, canon, body)
+        doc = {
+            "key": key,
+            "method": method.upper(),
+            "url": canon,
+            "host": host,
+            "path": path,
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k.lower() not in _DROP_HEADERS},
+            "recorded_at": time.time(),
+        }
+        if payload is not None:
+            doc["json"] = payload
+        else:
+            doc["body_b64"] = base64.b64encode(content or b"").decode("ascii")
+        folder = os.path.join(self.root, host or "_")
+        os.makedirs(folder, exist_ok=True)
+        target = os.path.join(folder, f"{key}.json")
+        with open(target, "w", encoding="utf-8") as f:
+            json.dump(doc, f)
+        with self._lock:
+            self._cache.pop(target, None)
+            self._index(target, doc)
+            self.stats["recorded"] += 1
+
+    def _load(self, path: str) -> Dict[str, Any]:
+        doc = self._cache.get(path)
+        if doc is None:
+            with open(path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+            if "body_b64" in doc:
+                doc["content"] = base64.b64decode(doc.pop("body_b64"))
+            self._cache[path] = doc
+        return doc
+
+    def lookup(self, method: str, url: str, body: bytes) -> Dict[str, Any]:
+        canon, host, path = _canonical(url)
+        method = method.upper()
+        with self._lock:
+            hit = self._by_key.get(self._key(method, canon, body))
+            if hit is not None:
+                self.stats["exact"] += 1
+                return self._load(hit)
+            # Newest fixture on the same host whose path shares the longest prefix
+            best, best_len = None, -1
+            want = path.rstrip("/").split("/")
+            for _, candidate in self._by_route.get((method, host), ()):
+                doc = self._load(candidate)
+                have = (doc.get("path") or "/").rstrip("/").split("/")
+                n = 0
+                while n < min(len(want), len(have)) and want[n] == have[n]:
+                    n += 1
+                if n > best_len:
+                    best, best_len = doc, n
+            if best is not None:
+                self.stats["fallback"] += 1
+                return best
+            self.stats["missed"] += 1
+        raise ReplayMiss(f"No fixture for {method} {canon}")
+
+
+def _requests_response(doc: Dict[str, Any], request: Any) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = doc.get("status", 200)
+    resp.headers = CaseInsensitiveDict(doc.get("headers") or {})
+    content = doc.get("content")
+    if content is None:
+        content = json.dumps(doc.get("json")).encode()
+    resp.raw = io.BytesIO(content)
+    resp._content = content
+    resp.url = doc.get("url") or getattr(request, "url", "")
+    resp.request = request
+    resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+    return resp
+
+
+_installed: Optional[Tuple[str, FixtureStore]] = None
+_originals: Dict[str, Any] = {}
+
+
+def _patch_requests(mode: str, store: FixtureStore) -> None:
+    original = HTTPAdapter.send
+    _originals["requests"] = original
+
+    def send(self, request, *args, **kwargs):
+        body = _body_bytes(request.body)
+        if mode == "replay":
+            return _requests_response(store.lookup(request.method, request.url, body), request)
+        resp = original(self, request, *args, **kwargs)
+        content = resp.content
+        # Streaming callers read .raw; give them the already-decoded bytes again
+        resp.raw = io.BytesIO(content)
+        try:
+            store.save(request.method, request.url, body, resp.status_code, dict(resp.headers), content=content)
+        except Exception as e:
+            log.error("failed to record %s: %s", request.url, e)
+        return resp
+
+    HTTPAdapter.send = send
+
+
+def _patch_curl_cffi(mode: str, store: FixtureStore) -> None:
+    try:
+        from curl_cffi import requests as curl_requests
+    except ImportError:
+        return
+    original = curl_requests.Session.request
+    _originals["curl_cffi"] = original
+
+    def request(self, method, url, *args, **kwargs):
+        full, _, _ = _canonical(url, kwargs.get("params"))
+        body = _body_bytes(kwargs.get("data") or kwargs.get("json"))
+        if mode == "replay":
+            return _requests_response(store.lookup(method, full, body), None)
+        resp = original(self, method, url, *args, **kwargs)
+        try:
+            store.save(method, full, body, resp.status_code, dict(resp.headers), content=resp.content)
+        except Exception as e:
+            log.error("failed to record %s: %s", url, e)
+        return resp
+
+    curl_requests.Session.request = request
+
+
+def _patch_async_fetcher(mode: str, store: FixtureStore) -> None:
+    from app.fetcher import AsyncJSONFetcher, UpstreamHTTPError
+
+    original = AsyncJSONFetcher._once
+    _originals["aiohttp"] = original
+
+    async def _once(self, method, url, params, data, headers, timeout_s):
+        full, _, _ = _canonical(url, params)
+        body = _body_bytes(data)
+        if mode == "replay":
+            doc = store.lookup(method, full, body)
+            if doc.get("status", 200) >= 400:
+                raise UpstreamHTTPError(doc["status"], url)
+            if "json" in doc:
+                return doc["json"]
+            return json.loads(doc.get("content") or b"null")
+        payload = await original(self, method, url, params, data, headers, timeout_s)
+        try:
+            store.save(method, full, body, 200, {}, payload=payload)
+        except Exception as e:
+            log.error("failed to record %s: %s", url, e)
+        return payload
+
+    AsyncJSONFetcher._once = _once
+
+
+def install(mode: str, fixtures_dir: str) -> FixtureStore:
+    """Start recording to / replaying from `fixtures_dir`; returns the fixture store."""
+    global _installed
+    if mode not in ("record", "replay"):
+        raise ValueError(f"Unknown upstream mode: {mode}")
+    if _installed is not None:
+        uninstall()
+    store = FixtureStore(fixtures_dir)
+    _patch_requests(mode, store)
+    _patch_curl_cffi(mode, store)
+    _patch_async_fetcher(mode, store)
+    _installed = (mode, store)
+    log.info("Upstream %s mode: fixtures in %s", mode, fixtures_dir)
+    return store
+
+
+def uninstall() -> None:
+    global _installed
+    if "requests" in _originals:
+        HTTPAdapter.send = _originals.pop("requests")
+    if "curl_cffi" in _originals:
+        from curl_cffi import requests as curl_requests
+        curl_requests.Session.request = _originals.pop("curl_cffi")
+    if "aiohttp" in _originals:
+        from app.fetcher import AsyncJSONFetcher
+        AsyncJSONFetcher._once = _originals.pop("aiohttp")
+    _installed = None
+
+
+def install_from_env() -> Optional[FixtureStore]:
+    mode = os.getenv("UPSTREAM_MODE", "").strip().lower()
+    if mode in ("", "live"):
+        return None
+    return install(mode, os.getenv("UPSTREAM_FIXTURES", "fixtures"))
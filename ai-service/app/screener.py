@@ -1,3 +1,4 @@
+import logging
 import time
 from datetime import datetime
 from finvizfinance.screener.overview import Overview
@@ -6,14 +7,33 @@ from finvizfinance.screener.financial import Financial
 import pandas as pd
 from pymongo import MongoClient
 
+from app.snapshots import shared_publisher
+from app.writer import shared_writer
+
+log = logging.getLogger(__name__)
+
+# screener_results field -> backend ScreenerResult JSON name
+SNAPSHOT_FIELDS = {
+    "_id": "id", "Ticker": "ticker", "Company": "company", "Sector": "sector", "Industry": "industry",
+    "Country": "country", "Market Cap": "market_cap", "P/E": "pe", "Price": "price", "Change": "change",
+    "Volume": "volume", "Dividend Yield": "dividend_yield", "EPS (ttm)": "eps", "Sales": "revenue",
+    "Total Debt/Eq": "debt", "ROE": "roe", "Profit Margin": "profit_margin", "P/B": "book_value",
+    "strategy": "strategy", "fetched_at": "fetched_at",
+}
+# Rows kept in the screener snapshot; covers the backend's default page
+SNAPSHOT_ROWS = 200
+
 class ScreenerModule:
-    def __init__(self, db):
+    def __init__(self, db, writer=None, snapshots=None):
         self.collection = db['screener_results']
+        # Upserts are queued on the shared write-behind writer
+        self.writer = writer or shared_writer(db)
+        self.snapshots = snapshots or shared_publisher()
         # self.collection.create_index("Ticker", unique=True) # Ticker should be unique per run, but we might keep history
-        print("Initialized Screener Module")
+        log.info("Initialized Screener Module")
 
     def run_screen(self):
-        print(f"[{datetime.now()}] Running Stock Screener...")
+        log.info("Running Stock Screener...")
         try:
             # Filters can be customized. For now, let's just get the top stocks by default or specific signal
             filters_dict = {'Signal': 'Top Gainers'}
@@ -27,15 +47,15 @@ class ScreenerModule:
             fvaluation.set_filter(filters_dict=filters_dict)
             ffinancial.set_filter(filters_dict=filters_dict)
             
-            print("Fetching Overview...")
+            log.info("Fetching Overview...")
             df_overview = foverview.screener_view()
-            print("Fetching Valuation...")
+            log.info("Fetching Valuation...")
             df_valuation = fvaluation.screener_view()
-            print("Fetching Financial...")
+            log.info("Fetching Financial...")
             df_financial = ffinancial.screener_view()
             
             if df_overview is None or df_overview.empty:
-                print("No stocks found matching filters.")
+                log.warning("No stocks found matching filters.")
                 return
 
             # Merge DataFrames
@@ -86,13 +106,24 @@ class ScreenerModule:
                 # For simplicity, let's keep as is, Go driver handles BSON
                 
                 # Update or Insert based on Ticker and Strategy
-                self.collection.update_one(
+                self.writer.upsert(
+                    self.collection.name,
                     {"Ticker": record['Ticker'], "strategy": "Top Gainers"},
                     {"$set": record},
-                    upsert=True
                 )
-                
-            print(f"Screener: Updated {len(records)} stocks with comprehensive data.")
+
+            self.writer.flush()
+            log.info("Updated %d stocks with comprehensive data.", len(records))
+            self.publish_snapshot()
             
         except Exception as e:
-            print(f"Error in Screener Module: {e}")
+            log.error("Error in Screener Module: %s", e)
+
+    def publish_snapshot(self):
+        # Same query the backend runs for /screener, done once per job instead of per page load
+        try:
+            cursor = self.collection.find({}, list(SNAPSHOT_FIELDS)).sort("fetched_at", -1).limit(SNAPSHOT_ROWS)
+            rows = [{SNAPSHOT_FIELDS[k]: v for k, v in doc.items() if k in SNAPSHOT_FIELDS} for doc in cursor]
+            self.snapshots.publish("screener", rows, limit=SNAPSHOT_ROWS)
+        except Exception as e:
+            log.error("Error building screener snapshot: %s", e)
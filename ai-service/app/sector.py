@@ -1,83 +1,172 @@
+import logging
+import math
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 from finvizfinance.group.overview import Overview
 from pymongo import MongoClient
 
+from app.ratelimit import FINVIZ_HOST, RateLimiter, upstream_limiter
+from app.snapshots import SnapshotPublisher, shared_publisher
+from app.tracing import bind, current_span, span
+from app.writer import BatchWriter, shared_writer
+
+log = logging.getLogger(__name__)
+
+# Heatmap snapshot id -> finvizfinance.group grouping name
+HEATMAP_GROUPS: Dict[str, str] = {
+    "sector": "Sector",
+    "industry": "Industry",
+    "country": "Country",
+    "capitalization": "Capitalization",
+}
+
+# Numeric Finviz group columns carried into each heatmap cell
+CELL_FIELDS: Dict[str, str] = {
+    "Market Cap": "market_cap",
+    "P/E": "pe",
+    "Fwd P/E": "forward_pe",
+    "Volume": "volume",
+    "Stocks": "stocks",
+}
+
 class SectorModule:
-    def __init__(self, db):
+    def __init__(self, db, groups: Optional[Dict[str, str]] = None, max_workers: int = 4, rate_limiter: Optional[RateLimiter] = None, writer: Optional[BatchWriter] = None,
+                 snapshots: Optional[SnapshotPublisher] = None):
         self.collection = db['sector_performance']
-        print("Initialized Sector Module")
+        # One denormalized document per grouping, keyed by _id (e.g. "industry")
+        self.heatmaps = db['sector_heatmaps']
+        self.groups = dict(groups or HEATMAP_GROUPS)
+        self.max_workers = max_workers
+        # Finviz throttles aggressively; group fetches share the process-wide Finviz budget
+        self.rate_limiter = rate_limiter or upstream_limiter.limiter(FINVIZ_HOST)
+        self.writer = writer or shared_writer(db)
+        # Read views for the backend's /sector endpoints
+        self.snapshots = snapshots or shared_publisher()
+        log.info("Initialized Sector Module")
+
+    def _to_float(self, val: Any) -> Optional[float]:
+        if val is None:
+            return None
+        try:
+            f = float(val)
+        except (TypeError, ValueError):
+            return None
+        if math.isnan(f) or math.isinf(f):
+            return None
+        return f
+
+    def _normalize_changes(self, records: List[Dict[str, Any]]) -> None:
+        # Finviz returns 'Change' as a decimal (0.015 for 1.5%); the frontend expects
+        # percentages. Decide per grouping rather than per row so a single large
+        # mover cannot flip the scale of its neighbours.
+        values = [self._to_float(r.get('Change')) for r in records]
+        finite = [abs(v) for v in values if v is not None]
+        scale = 100.0 if finite and max(finite) < 0.5 else 1.0
+        for record, val in zip(records, values):
+            record['Change'] = val * scale if val is not None else None
+
+    def _fetch_group(self, group: str):
+        self.rate_limiter.acquire()
+        with span("upstream", source="finviz_groups", group=group) as sp:
+            df = Overview().screener_view(group=group)
+            sp.set(rows=0 if df is None else len(df))
+            return df
+
+    def _build_snapshot(self, key: str, group: str, records: List[Dict[str, Any]], batch_time: datetime) -> Dict[str, Any]:
+        changes = [r['Change'] for r in records if r.get('Change') is not None]
+        max_abs = max((abs(c) for c in changes), default=0.0)
+        cells = []
+        for r in records:
+            change = r.get('Change')
+            cell = {
+                "name": r.get('Name'),
+                "change": change,
+                # Colour intensity in [-1, 1] relative to the biggest mover in this grouping
+                "intensity": (change / max_abs) if change is not None and max_abs else 0.0,
+            }
+            for src, dst in CELL_FIELDS.items():
+                cell[dst] = self._to_float(r.get(src))
+            cells.append(cell)
+        cells.sort(key=lambda c: (c["market_cap"] is None, -(c["market_cap"] or 0)))
+        return {
+            "_id": key,
+            "group": group,
+            "fetched_at": batch_time,
+            "count": len(cells),
+            "max_abs_change": max_abs,
+            "advancers": sum(1 for c in changes if c > 0),
+            "decliners": sum(1 for c in changes if c < 0),
+            "cells": cells,
+        }
+
+    def _store_sector_rows(self, records: List[Dict[str, Any]], batch_time: datetime) -> None:
+        # Legacy per-sector rows read by the backend's /sector endpoint
+        for record in records:
+            record['fetched_at'] = batch_time
+            # One replace per sector instead of a delete + insert round trip pair
+            self.writer.replace(self.collection.name, {"Name": record['Name']}, record)
+
+    def _sector_view(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Same shape and order as the backend's SectorPerformance list, which
+        # also reports missing or non-finite numbers as 0
+        rows = []
+        for r in records:
+            stocks = r.get('Stocks')
+            rows.append({
+                "name": r.get('Name'),
+                "change": r.get('Change') or 0.0,
+                "volume": self._to_float(r.get('Volume')) or 0.0,
+                "stocks": "" if stocks is None else str(stocks),
+                "market_cap": self._to_float(r.get('Market Cap')) or 0.0,
+                "pe": self._to_float(r.get('P/E')) or 0.0,
+                "fetched_at": r.get('fetched_at'),
+            })
+        rows.sort(key=lambda row: row["name"] or "")
+        return rows
 
     def fetch_sector_performance(self):
-        print(f"[{datetime.now()}] Fetching Sector Performance...")
+        log.info("Fetching Sector Performance (%d groupings)", len(self.groups))
         try:
-            # Group by Sector
-            fg = Overview() 
-            # Default view is Sector, but let's be explicit if needed or just use default
-            # finvizfinance.group.overview.Overview defaults to group='Sector'
-            
-            df = fg.screener_view(group='Sector')
-            
-            if df is None or df.empty:
-                print("No sector data found.")
-                return
-
-            records = df.to_dict('records')
             batch_time = datetime.now()
-            
-            for record in records:
-                # Convert 'Change' from 0.015 (if Finviz returns decimal) or check if it's already %
-                # Finviz API usually returns float like 0.015 for 1.5% or sometimes strings "1.50%"
-                # Based on previous tests, it seems to return floats.
-                # However, our frontend expects percentages (e.g. 1.5).
-                
-                # Check if Change is already percentage (e.g. > 1 or < -1 could be %, but < 1 could be decimal)
-                # But sector changes are usually small. 
-                # Let's assume if abs(change) < 0.5, it is likely decimal. (50% daily move is rare for sector).
-                
-                # Explicitly replace the entire document to ensure the Change field update persists
-                # Check if it works with replace_one
-                
-                # Wait, I found the issue.
-                # In MongoDB, `upsert=True` with `replace_one` works.
-                # BUT, if the document already exists, it replaces it.
-                # If I use `update_one` with `$set`, it updates specific fields.
-                
-                # The issue might be that `record` variable holds the original dictionary from `records`.
-                # And `records` is `df.to_dict('records')`.
-                # If I modify `record['Change']`, it modifies the dict in memory.
-                # But why did `db.find` return decimal?
-                
-                # HYPOTHESIS: `df.to_dict('records')` returns a list of dicts.
-                # Maybe Finviz library returns a specific type (numpy float?) that resists in-place multiplication?
-                # Or maybe I am printing `record['Change']` but passing `df` somewhere else? No.
-                
-                # Let's force cast to float.
-                if 'Change' in record and record['Change'] is not None:
+            frames = {}
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = {pool.submit(bind(self._fetch_group), group): key for key, group in self.groups.items()}
+                for fut in as_completed(futures):
+                    key = futures[fut]
                     try:
-                        val = float(record['Change'])
-                        # If small decimal, convert to %
-                        # e.g. 0.015 -> 1.5
-                        # e.g. -0.0172 -> -1.72
-                        if abs(val) < 0.5:
-                            val = val * 100.0
-                        
-                        # FORCE UPDATE: Modify the record in place
-                        record['Change'] = val
-                        
-                        # Debug Print
-                        print(f"Sector: {record['Name']} -> {record['Change']}")
+                        frames[key] = fut.result()
                     except Exception as e:
-                        print(f"Error converting change: {e}")
-
-                record['fetched_at'] = batch_time
-                
-                # Delete existing to be absolutely sure
-                self.collection.delete_one({"Name": record['Name']})
-                # Insert the modified record
-                self.collection.insert_one(record)
-            
-            print(f"Sector: Updated {len(records)} sectors.")
-            
+                        log.error("Error fetching %s groups: %s", self.groups[key], e)
+
+            updated = 0
+            views: Dict[str, Any] = {}
+            for key, df in frames.items():
+                group = self.groups[key]
+                if df is None or df.empty:
+                    log.warning("No %s data found.", group)
+                    continue
+
+                records = df.to_dict('records')
+                self._normalize_changes(records)
+
+                snapshot = self._build_snapshot(key, group, records, batch_time)
+                self.writer.replace(self.heatmaps.name, {"_id": key}, snapshot)
+                updated += 1
+                views[f"sector_heatmap:{key}"] = {"id": key, **{k: v for k, v in snapshot.items() if k != "_id"}}
+
+                if group == 'Sector':
+                    self._store_sector_rows(records, batch_time)
+                    views["sector"] = self._sector_view(records)
+
+            self.writer.flush()
+            for name, view in views.items():
+                self.snapshots.publish(name, view)
+            job = current_span()
+            if job is not None:
+                job.set(groupings=len(self.groups), fetched=len(frames), updated=updated)
+            log.info("Updated %d heatmap snapshots (%s)", updated, ", ".join(sorted(frames)))
+
         except Exception as e:
-            print(f"Error in Sector Module: {e}")
+            log.error("Error in Sector Module: %s", e)
@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from pymongo.errors import BulkWriteError
+from textblob import TextBlob
+
+log = logging.getLogger(__name__)
+
+
+def headline_key(text: str) -> str:
+    """Fingerprint of a headline's wording, independent of case and spacing."""
+    norm = re.sub(r"\s+", " ", (text or "").strip().lower())
+    return hashlib.sha1(norm.encode("utf-8", errors="ignore")).hexdigest()
+
+
+def _polarity(text: str) -> float:
+    # Module-level so it can be shipped to a process pool
+    return float(TextBlob(text).sentiment.polarity)
+
+
+def _polarity_batch(texts: List[str]) -> List[float]:
+    return [_polarity(t) for t in texts]
+
+
+class SentimentScorer:
+    """Batched TextBlob polarity with an in-process LRU and a Mongo-backed cache.
+
+    `score_batch()` resolves each distinct headline from the LRU first, then
+    from `sentiment_cache` in one `$in` query, and only runs TextBlob on the
+    remainder, optionally chunked across a process pool.
+    """
+
+    def __init__(self, db, lru_size: int = 20000, processes: Optional[int] = None, pool_threshold: int = 64):
+        self.cache = db["sentiment_cache"]
+        self.cache.create_index("created_at", expireAfterSeconds=30 * 24 * 3600)
+        self.lru_size = lru_size
+        self.processes = int(os.getenv("SENTIMENT_PROCESSES", "0")) if processes is None else processes
+        self.pool_threshold = pool_threshold
+        self._lru: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.stats = {"lru_hits": 0, "store_hits": 0, "computed": 0}
+
+    def _lru_get(self, key: str) -> Optional[float]:
+        with self._lock:
+            val = self._lru.get(key)
+            if val is not None:
+                self._lru.move_to_end(key)
+            return val
+
+    def _lru_put(self, key: str, val: float) -> None:
+        with self._lock:
+            self._lru[key] = val
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def _compute(self, texts: List[str]) -> List[float]:
+        if self.processes <= 0 or len(texts) < self.pool_threshold:
+            return _polarity_batch(texts)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.processes)
+        size = max(1, len(texts) // (self.processes * 4))
+        chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+        out: List[float] = []
+        for part in self._pool.map(_polarity_batch, chunks):
+            out.extend(part)
+        return out
+
+    def score_batch(self, texts: Iterable[str]) -> Dict[str, float]:
+        """Return {headline_key(text): polarity} for every text given."""
+        pending: Dict[str, str] = {}
+        result: Dict[str, float] = {}
+        for text in texts:
+            key = headline_key(text)
+            if key in result or key in pending:
+                continue
+            cached = self._lru_get(key)
+            if cached is not None:
+                result[key] = cached
+                self.stats["lru_hits"] += 1
+            else:
+                pending[key] = text
+
+        if pending:
+            try:
+                for doc in self.cache.find({"_id": {"$in": list(pending)}}, {"polarity": 1}):
+                    result[doc["_id"]] = doc["polarity"]
+                    self._lru_put(doc["_id"], doc["polarity"])
+                    pending.pop(doc["_id"], None)
+                    self.stats["store_hits"] += 1
+            except Exception as e:
+                log.error("Error reading sentiment cache: %s", e)
+
+        if pending:
+            keys = list(pending)
+            scores = self._compute([pending[k] for k in keys])
+            now = datetime.utcnow()
+            for key, val in zip(keys, scores):
+                result[key] = val
+                self._lru_put(key, val)
+            self.stats["computed"] += len(keys)
+            try:
+                self.cache.insert_many(
+                    [{"_id": k, "polarity": v, "created_at": now} for k, v in zip(keys, scores)],
+                    ordered=False,
+                )
+            except BulkWriteError:
+                pass  # another writer cached the same headline first
+            except Exception as e:
+                log.error("Error writing sentiment cache: %s", e)
+
+        return result
+
+    def score(self, text: str) -> float:
+        return self.score_batch([text])[headline_key(text)]
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import redis
+except ImportError:  # optional; the local store stands in
+    redis = None
+
+from bson import ObjectId
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_PREFIX = "snapshot:"
+SNAPSHOT_CHANNEL = "snapshots"
+
+
+def _jsonable(value: Any) -> Any:
+    """Mongo/pandas values -> plain JSON types, with times in RFC 3339 as the Go backend expects."""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, datetime):
+        # Naive datetimes are read back from Mongo as UTC, so label them the same way
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat(timespec="milliseconds") + "Z"
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if hasattr(value, "item"):  # numpy scalars
+        return _jsonable(value.item())
+    return str(value)
+
+
+class LocalSnapshotStore:
+    """In-process stand-in for Redis: same keys, versions and notifications, kept in a dict."""
+
+    def __init__(self):
+        self._data: Dict[str, bytes] = {}
+        self._versions: Dict[str, int] = {}
+        self._subscribers: List[Callable[[str, bytes], None]] = []
+        self._lock = threading.Lock()
+
+    def next_version(self, key: str) -> int:
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            return self._versions[key]
+
+    def put(self, key: str, blob: bytes, channel: str, message: bytes) -> None:
+        with self._lock:
+            self._data[key] = blob
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(channel, message)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._data.get(key)
+
+    def exists(self, key: str) -> bool:
+        return key in self._data
+
+    def subscribe(self, callback: Callable[[str, bytes], None]) -> None:
+        with self._lock:
+            self._subscribers.append(callback)
+
+
+class RedisSnapshotStore:
+    """Snapshots as plain Redis strings; the SET and the PUBLISH go out in one MULTI."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def next_version(self, key: str) -> int:
+        return int(self.client.incr(key))
+
+    def put(self, key: str, blob: bytes, channel: str, message: bytes) -> None:
+        pipe = self.client.pipeline(transaction=True)
+        pipe.set(key, blob)
+        pipe.publish(channel, message)
+        pipe.execute()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def exists(self, key: str) -> bool:
+        return bool(self.client.exists(key))
+
+
+class SnapshotPublisher:
+    """Publishes each job's post-ingest "latest view" as one precomputed key.
+
+    A snapshot is stored under `snapshot:<name>` as compact JSON
+    `{"name", "version", "generated_at", "count", "limit", "data"}`. The
+    version comes from a per-name counter (`snapshot:<name>:version`), so it
+    keeps increasing across restarts. Readers serve the endpoint from one GET and
+    subscribe to the `snapshots` channel, which gets `{"name", "version"}`
+    on every change, instead of polling Mongo. A snapshot whose data is
+    unchanged since the last publish is not re-sent while its key still
+    exists; a key lost to eviction, a Redis restart or a backend
+    invalidation is republished. Failures are logged and
+    never fail the job that produced the data.
+    """
+
+    def __init__(self, store=None, prefix: str = SNAPSHOT_PREFIX, channel: str = SNAPSHOT_CHANNEL):
+        self.store = store or LocalSnapshotStore()
+        self.prefix = prefix
+        self.channel = channel
+        self._digests: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {"published": 0, "unchanged": 0, "errors": 0}
+
+    def key(self, name: str) -> str:
+        return f"{self.prefix}{name}"
+
+    def publish(self, name: str, data: Any, limit: Optional[int] = None) -> Optional[int]:
+        """Store `data` as snapshot `name` and notify readers; returns the new version, None if unchanged or failed.
+
+        `limit` marks a view capped at that many rows, so readers asking for
+        more than `count` know whether the snapshot holds everything.
+        """
+        try:
+            body = json.dumps(_jsonable(data), separators=(",", ":"), allow_nan=False)
+            digest = hashlib.blake2b(body.encode("utf-8"), digest_size=16).hexdigest()
+            with self._lock:
+                unchanged = self._digests.get(name) == digest
+            if unchanged and self.store.exists(self.key(name)):
+                with self._lock:
+                    self.stats["unchanged"] += 1
+                return None
+            version = self.store.next_version(f"{self.key(name)}:version")
+            generated_at = _jsonable(datetime.now(timezone.utc))
+            count = len(data) if isinstance(data, (list, dict)) else None
+            head = json.dumps({"name": name, "version": version, "generated_at": generated_at, "count": count, "limit": limit, "digest": digest}, separators=(",", ":"))
+            # Splice the already-encoded body in rather than encoding it twice
+            blob = (head[:-1] + ',"data":' + body + "}").encode("utf-8")
+            message = json.dumps({"name": name, "version": version}, separators=(",", ":")).encode("utf-8")
+            self.store.put(self.key(name), blob, self.channel, message)
+            with self._lock:
+                self._digests[name] = digest
+                self.stats["published"] += 1
+            return version
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            log.error("Error publishing %s snapshot: %s", name, e)
+            return None
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            blob = self.store.get(self.key(name))
+        except Exception as e:
+            log.error("Error reading %s snapshot: %s", name, e)
+            return None
+        return json.loads(blob) if blob else None
+
+
+_publisher: Optional[SnapshotPublisher] = None
+_publisher_lock = threading.Lock()
+
+
+def shared_publisher() -> SnapshotPublisher:
+    """Process-wide publisher: Redis at REDIS_ADDR when configured and reachable, else the local store."""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None:
+            store = None
+            addr = os.getenv("REDIS_ADDR", "").strip()
+            if addr and redis is not None:
+                host, _, port = addr.partition(":")
+                try:
+                    client = redis.Redis(host=host, port=int(port or 6379), db=int(os.getenv("REDIS_DB", "0")),
+                                         password=os.getenv("REDIS_PASSWORD") or None, socket_timeout=5)
+                    client.ping()
+                    store = RedisSnapshotStore(client)
+                    log.info("publishing to Redis at %s", addr)
+                except Exception as e:
+                    log.warning("Redis at %s unavailable, using local store: %s", addr, e)
+            elif addr:
+                log.warning("redis package not installed, using local store")
+            _publisher = SnapshotPublisher(store)
+        return _publisher
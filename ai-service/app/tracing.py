@@ -0,0 +1,294 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Every `logging.getLogger(__name__)` in the app package sits under this logger
+ROOT_LOGGER = "app"
+
+# Default 1-in-N sampling for high-volume events; override with TRACE_SAMPLE="name=N,..."
+DEFAULT_SAMPLE_RATES: Dict[str, int] = {
+    "news.article": 20,
+    "news.ticker": 10,
+    "upstream.finviz": 10,
+    "mongo.bulk_write": 5,
+}
+
+
+def parse_sample_rates(spec: str) -> Dict[str, int]:
+    """`"news.article=50, upstream.finviz=1"` -> {name: N}; N <= 1 keeps every event."""
+    out: Dict[str, int] = {}
+    for part in (spec or "").split(","):
+        name, _, n = part.partition("=")
+        name = name.strip()
+        if name and n.strip().isdigit():
+            out[name] = int(n)
+    return out
+
+
+class Sampler(logging.Filter):
+    """Keeps one in N records per `sample` key; warnings, errors and unkeyed records always pass."""
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = dict(rates)
+        self._seen: Dict[str, int] = {}
+        self.dropped: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample", None)
+        if key is None or record.levelno >= logging.WARNING:
+            return True
+        n = self.rates.get(key, 1)
+        if n <= 1:
+            return True
+        with self._lock:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+            if seen % n == 0:
+                return True
+            self.dropped[key] = self.dropped.get(key, 0) + 1
+        return False
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler over a bounded queue: a full queue drops the record rather than block the caller."""
+
+    def __init__(self, q: "queue.Queue"):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only the message is rendered on the calling thread; layout happens on the listener
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _fmt_value(value: Any) -> str:
+    if isinstance(value, float):
+        value = round(value, 3)
+    text = str(value)
+    if not text or any(c in text for c in ' ="'):
+        return json.dumps(text)
+    return text
+
+
+class StructuredFormatter(logging.Formatter):
+    """One line per record: logfmt `key=value` pairs, or a JSON object with `json_lines`."""
+
+    def __init__(self, json_lines: bool = False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+            "level": record.levelname.lower(),
+            "logger": record.name[len(ROOT_LOGGER) + 1:] if record.name.startswith(ROOT_LOGGER + ".") else record.name,
+        }
+        span = getattr(record, "span", None)
+        if span is not None:
+            fields.update(span)
+        if record.getMessage():
+            fields["msg"] = record.getMessage()
+        attrs = getattr(record, "attrs", None)
+        if attrs:
+            fields.update(attrs)
+        if record.exc_text:
+            fields["exc"] = record.exc_text
+        if self.json_lines:
+            return json.dumps(fields, default=str, separators=(",", ":"))
+        return " ".join(f"{k}={_fmt_value(v)}" for k, v in fields.items() if v is not None)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[_DroppingQueueHandler] = None
+_sampler: Optional[Sampler] = None
+_install_lock = threading.Lock()
+
+
+def install(level: Optional[str] = None, json_lines: Optional[bool] = None, queue_size: Optional[int] = None,
+            sample_rates: Optional[Dict[str, int]] = None) -> None:
+    """Route the `app.*` loggers through a bounded queue to a stdout writer thread (idempotent).
+
+    Settings default to LOG_LEVEL, LOG_FORMAT (`text` | `json`), LOG_QUEUE_SIZE
+    and TRACE_SAMPLE. The app package calls this on import, so modules only
+    need `logging.getLogger(__name__)`.
+    """
+    global _listener, _handler, _sampler
+    with _install_lock:
+        if _listener is not None:
+            return
+        level = level or os.getenv("LOG_LEVEL", "INFO")
+        if json_lines is None:
+            json_lines = os.getenv("LOG_FORMAT", "text").lower() == "json"
+        queue_size = queue_size or int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+        rates = dict(DEFAULT_SAMPLE_RATES)
+        rates.update(sample_rates if sample_rates is not None else parse_sample_rates(os.getenv("TRACE_SAMPLE", "")))
+
+        out = logging.StreamHandler(sys.stdout)
+        out.setFormatter(StructuredFormatter(json_lines))
+        _sampler = Sampler(rates)
+        _handler = _DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        _handler.addFilter(_sampler)
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(level.upper())
+        root.addHandler(_handler)
+        root.propagate = False
+        _listener = logging.handlers.QueueListener(_handler.queue, out, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown)
+
+
+def shutdown() -> None:
+    """Drain the queue and stop the writer thread."""
+    global _listener
+    with _install_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def dropped() -> Dict[str, Any]:
+    """Records dropped so far, by sampling key and because the queue was full."""
+    return {
+        "sampled": dict(_sampler.dropped) if _sampler else {},
+        "queue_full": _handler.dropped if _handler else 0,
+    }
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger `app.<name>`, for code outside the package (e.g. main.py)."""
+    install()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def event(logger: logging.Logger, msg: str, sample: Optional[str] = None, level: int = logging.INFO, **attrs: Any) -> None:
+    """Log `msg` with structured `attrs`; `sample` names the rate it is thinned by."""
+    if logger.isEnabledFor(level):
+        logger.log(level, msg, extra={"attrs": attrs, "sample": sample})
+
+
+_trace_log = get_logger("trace")
+_current: contextvars.ContextVar = contextvars.ContextVar("scope_span", default=None)
+
+
+class Span:
+    """One timed unit of work; nested spans share the trace id of the outermost one."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "status", "sample", "_t0")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, sample: Optional[str] = None, **attrs: Any):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(8)
+        self.span_id = secrets.token_hex(4)
+        self.parent_id = parent.span_id if parent else None
+        self.attrs: Dict[str, Any] = attrs
+        self.status = "ok"
+        self.sample = sample
+        self._t0 = time.perf_counter()
+
+    def set(self, **attrs: Any) -> "Span":
+        self.attrs.update(attrs)
+        return self
+
+    def add(self, key: str, n: float = 1) -> "Span":
+        """Increment a counter attribute (items, bytes, ...)."""
+        self.attrs[key] = self.attrs.get(key, 0) + n
+        return self
+
+    def fail(self, error: BaseException) -> "Span":
+        """Mark the span failed for an error that was handled rather than raised."""
+        self.status = "error"
+        self.attrs["error"] = f"{type(error).__name__}: {error}"
+        return self
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if error is not None:
+            self.fail(error)
+        # Failed spans are logged as warnings, which sampling never drops
+        level = logging.WARNING if self.status == "error" else logging.INFO
+        if not _trace_log.isEnabledFor(level):
+            return
+        _trace_log.log(level, "", extra={
+            "span": {
+                "span": self.name,
+                "duration_ms": round((time.perf_counter() - self._t0) * 1000.0, 2),
+                "status": self.status,
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "parent_id": self.parent_id,
+            },
+            "attrs": self.attrs,
+            "sample": self.sample,
+        })
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, sample: Optional[str] = None, **attrs: Any) -> Iterator[Span]:
+    """Time a block as a child of the current span; exceptions are recorded and re-raised."""
+    s = Span(name, _current.get(), sample=sample, **attrs)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.end(e)
+        raise
+    else:
+        s.end()
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def adopt(parent: Optional[Span]) -> Iterator[None]:
+    """Make `parent` the current span, for work handed to another thread or event loop."""
+    token = _current.set(parent)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def bind(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """`fn` carrying the caller's current span, for `ThreadPoolExecutor.submit`."""
+    parent = _current.get()
+
+    def _bound(*args, **kwargs):
+        with adopt(parent):
+            return fn(*args, **kwargs)
+    return _bound
+
+
+def traced(name: str, fn: Callable[..., Any], **attrs: Any) -> Callable[..., Any]:
+    """`fn` wrapped in a span per call."""
+    def _traced(*args, **kwargs):
+        with span(name, **attrs):
+            return fn(*args, **kwargs)
+    _traced.__name__ = getattr(fn, "__name__", name)
+    return _traced
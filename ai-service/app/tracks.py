@@ -0,0 +1,174 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.writer import BatchWriter, shared_writer
+
+log = logging.getLogger(__name__)
+
+# OpenSky state vector positions used by the ingest (the API sends 17-18 per row)
+STATE_COLUMNS: Dict[str, int] = {
+    "icao24": 0,
+    "callsign": 1,
+    "origin": 2,
+    "time_position": 3,
+    "last_contact": 4,
+    "lon": 5,
+    "lat": 6,
+    "baro_altitude": 7,
+    "on_ground": 8,
+    "velocity": 9,
+    "heading": 10,
+}
+_STRING_COLUMNS = ("icao24", "callsign", "origin")
+_WIDTH = max(STATE_COLUMNS.values()) + 1
+
+
+def parse_states(states: Any) -> Dict[str, np.ndarray]:
+    """Turn OpenSky's list-of-rows `states` into one NumPy array per column.
+
+    Missing numbers become NaN and missing strings "", so every column has the
+    same length and filters can be applied to all aircraft at once.
+    """
+    rows = [s[:_WIDTH] for s in (states or []) if isinstance(s, list) and len(s) >= _WIDTH]
+    if not rows:
+        empty = {name: np.empty(0, dtype=object if name in _STRING_COLUMNS else float) for name in STATE_COLUMNS}
+        empty["on_ground"] = np.empty(0, dtype=bool)
+        return empty
+    cols = list(zip(*rows))
+    out: Dict[str, np.ndarray] = {}
+    for name, idx in STATE_COLUMNS.items():
+        if name in _STRING_COLUMNS:
+            out[name] = np.array([(v or "").strip() if isinstance(v, str) else "" for v in cols[idx]], dtype=object)
+        elif name == "on_ground":
+            out[name] = np.array([bool(v) for v in cols[idx]], dtype=bool)
+        else:
+            # np.array(..., dtype=float) maps None to NaN; strings would raise, so guard them
+            try:
+                out[name] = np.array(cols[idx], dtype=float)
+            except (TypeError, ValueError):
+                out[name] = np.array([v if isinstance(v, (int, float)) else np.nan for v in cols[idx]], dtype=float)
+    return out
+
+
+def valid_positions(cols: Dict[str, np.ndarray], now_ts: float, max_age_s: float = 120.0) -> np.ndarray:
+    """Mask of rows with a real, recent position and a non-empty icao24."""
+    lon, lat = cols["lon"], cols["lat"]
+    mask = np.isfinite(lon) & np.isfinite(lat)
+    mask &= (np.abs(lat) <= 90.0) & (np.abs(lon) <= 180.0)
+    mask &= cols["icao24"] != ""
+    contact = cols["last_contact"]
+    mask &= np.isfinite(contact) & (now_ts - contact <= max_age_s)
+    return mask
+
+
+class TrackStore:
+    """Bucketed per-aircraft position history with downsampling and a TTL.
+
+    One document per aircraft per `bucket_s` window holds its positions as
+    compact [t_offset, lat, lon, alt, velocity, heading] arrays plus the latest
+    fix, so the whole fleet costs one upsert per aircraft per poll, queued on
+    the shared write-behind writer, and at most bucket_s / min_interval_s
+    points per document. Mongo drops buckets `ttl_hours` after they close.
+    The last-written time per aircraft is kept in sorted NumPy arrays and
+    pruned every poll, so memory tracks the number of aircraft currently
+    flying rather than the history.
+    """
+
+    def __init__(self, db, bucket_s: int = 3600, min_interval_s: int = 60, ttl_hours: int = 24,
+                 writer: Optional[BatchWriter] = None):
+        self.collection = db["osint_tracks"]
+        self.writer = writer or shared_writer(db)
+        self.bucket_s = bucket_s
+        self.min_interval_s = min_interval_s
+        self.forget_s = max(min_interval_s, 300)
+        self.ttl = timedelta(hours=ttl_hours)
+        self._ids = np.empty(0, dtype=object)
+        self._ts = np.empty(0, dtype=float)
+        try:
+            self.collection.create_index([("icao24", 1), ("bucket", -1)], name="icao24_bucket")
+            self.collection.create_index([("bucket", -1), ("last.t", -1)], name="bucket_last")
+            self.collection.create_index("expire_at", expireAfterSeconds=0, name="expire_at_ttl")
+        except Exception as e:
+            log.error("Error creating track indexes: %s", e)
+
+    def _due(self, ids: np.ndarray, ts: np.ndarray) -> np.ndarray:
+        """Mask of aircraft whose last stored point is at least min_interval_s old."""
+        if not len(self._ids):
+            return np.ones(len(ids), dtype=bool)
+        pos = np.searchsorted(self._ids, ids)
+        pos_c = np.minimum(pos, len(self._ids) - 1)
+        found = (pos < len(self._ids)) & (self._ids[pos_c] == ids)
+        prev = np.where(found, self._ts[pos_c], -np.inf)
+        return ts - prev >= self.min_interval_s
+
+    def _remember(self, ids: np.ndarray, ts: np.ndarray, now_ts: float) -> None:
+        all_ids = np.concatenate([ids, self._ids])
+        all_ts = np.concatenate([ts, self._ts])
+        # First occurrence wins, i.e. the freshly written point
+        all_ids, first = np.unique(all_ids, return_index=True)
+        all_ts = all_ts[first]
+        # Positions older than forget_s no longer pass valid_positions(); forgetting
+        # them bounds memory to the aircraft currently reporting
+        keep = now_ts - all_ts < self.forget_s
+        self._ids, self._ts = all_ids[keep], all_ts[keep]
+
+    def record(self, cols: Dict[str, np.ndarray], mask: Optional[np.ndarray] = None, now_ts: Optional[float] = None) -> Dict[str, int]:
+        """Append one downsampled point per aircraft selected by `mask`; returns counts."""
+        if now_ts is None:
+            now_ts = datetime.now(timezone.utc).timestamp()
+        if mask is None:
+            mask = np.ones(len(cols["icao24"]), dtype=bool)
+        ids = cols["icao24"][mask]
+        ts = np.where(np.isfinite(cols["time_position"][mask]), cols["time_position"][mask], cols["last_contact"][mask])
+        # Duplicate icao24 rows occasionally appear; keep the freshest fix of each
+        order = np.argsort(-ts, kind="stable")
+        _, first = np.unique(ids[order], return_index=True)
+        sel = np.flatnonzero(mask)[order[first]]
+        ids, ts = ids[order[first]], ts[order[first]]
+
+        due = self._due(ids, ts)
+        sel, ids, ts = sel[due], ids[due], ts[due]
+        stats = {"seen": int(mask.sum()), "written": 0, "skipped": int((~due).sum())}
+        if not len(ids):
+            self._remember(ids, ts, now_ts)
+            return stats
+
+        bucket = (ts // self.bucket_s).astype(np.int64) * self.bucket_s
+        offset = (ts - bucket).astype(np.int64)
+        lat = np.round(cols["lat"][sel], 4)
+        lon = np.round(cols["lon"][sel], 4)
+        alt = np.round(np.nan_to_num(cols["baro_altitude"][sel], nan=-1.0))
+        vel = np.round(cols["velocity"][sel], 1)
+        hdg = np.round(cols["heading"][sel])
+        callsign = cols["callsign"][sel]
+        origin = cols["origin"][sel]
+        on_ground = cols["on_ground"][sel]
+
+        bucket_len = timedelta(seconds=self.bucket_s)
+        for i, icao in enumerate(ids.tolist()):
+            b = int(bucket[i])
+            start = datetime.fromtimestamp(b, tz=timezone.utc)
+            v = None if np.isnan(vel[i]) else float(vel[i])
+            h = None if np.isnan(hdg[i]) else int(hdg[i])
+            point = [int(offset[i]), float(lat[i]), float(lon[i]), int(alt[i]), v, h]
+            self.writer.upsert(
+                self.collection.name,
+                {"_id": f"{icao}:{b}"},
+                {
+                    "$setOnInsert": {"icao24": icao, "bucket": start, "expire_at": start + bucket_len + self.ttl},
+                    "$set": {
+                        "callsign": callsign[i],
+                        "origin": origin[i],
+                        "last": {"t": datetime.fromtimestamp(float(ts[i]), tz=timezone.utc), "lat": point[1], "lon": point[2],
+                                 "alt": point[3], "velocity": v, "heading": h, "on_ground": bool(on_ground[i])},
+                    },
+                    "$push": {"points": point},
+                    "$inc": {"n": 1},
+                },
+            )
+        self._remember(ids, ts, now_ts)
+        stats["written"] = len(ids)
+        return stats
@@ -0,0 +1,365 @@
+import atexit
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError, ServerSelectionTimeoutError
+
+from app.tracing import span
+
+log = logging.getLogger(__name__)
+
+# Update operators whose effect is preserved when two updates of the same document are folded into one
+_MERGEABLE_OPERATORS = frozenset({"$set", "$setOnInsert"})
+# Attempts per chunk on transient connection errors, with the delay before each retry
+WRITE_ATTEMPTS = 4
+RETRY_BACKOFF_S = (0.5, 2.0, 5.0)
+
+
+class WriteResult:
+    """Outcome of the writes queued with it, filled in by the writer thread.
+
+    Pass one handle to every call of a logical batch; once `flush()` returns
+    True (or `done` is set) its counts cover exactly those writes, whatever
+    else shares the writer. Writes folded into one operation count once.
+    """
+
+    __slots__ = ("ops", "written", "upserted", "errors")
+
+    def __init__(self):
+        self.ops = 0
+        self.written = 0
+        self.upserted = 0
+        self.errors = 0
+
+    @property
+    def done(self) -> bool:
+        return self.written + self.errors >= self.ops
+
+    @property
+    def ok(self) -> bool:
+        """Every write landed; duplicate-key rejections of inserts count as landed."""
+        return self.done and self.errors == 0
+
+    def __repr__(self) -> str:
+        return f"WriteResult(ops={self.ops}, written={self.written}, upserted={self.upserted}, errors={self.errors})"
+
+
+class _Op:
+    __slots__ = ("kind", "filter", "doc", "upsert", "results")
+
+    def __init__(self, kind: str, filter: Optional[Dict[str, Any]], doc: Any, upsert: bool,
+                 result: Optional[WriteResult] = None):
+        self.kind = kind
+        self.filter = filter
+        self.doc = doc
+        self.upsert = upsert
+        self.results: Tuple[WriteResult, ...] = (result,) if result is not None else ()
+
+    def mergeable(self) -> bool:
+        return self.kind == "update" and isinstance(self.doc, dict) and set(self.doc) <= _MERGEABLE_OPERATORS
+
+    def idempotent(self) -> bool:
+        """Sending it twice leaves the same document as sending it once ($inc/$push would not)."""
+        return self.kind in ("replace", "delete", "insert") or self.mergeable()
+
+    def absorb(self, later: "_Op") -> bool:
+        """Fold a later write of the same document into this one; False if they cannot be combined."""
+        if later.kind == "replace" and self.kind in ("update", "replace"):
+            self.kind, self.doc, self.upsert = "replace", later.doc, later.upsert
+            self._take_results(later)
+            return True
+        if self.mergeable() and later.mergeable():
+            merged = {op: dict(fields) for op, fields in self.doc.items()}
+            merged.setdefault("$set", {}).update(later.doc.get("$set") or {})
+            on_insert = merged.setdefault("$setOnInsert", {})
+            for k, v in (later.doc.get("$setOnInsert") or {}).items():
+                on_insert.setdefault(k, v)
+            # $setOnInsert must not touch a path that $set also writes
+            for k in merged["$set"]:
+                on_insert.pop(k, None)
+            self.doc = {op: fields for op, fields in merged.items() if fields}
+            self.upsert = self.upsert or later.upsert
+            self._take_results(later)
+            return True
+        return False
+
+    def _take_results(self, later: "_Op") -> None:
+        for r in later.results:
+            if not any(r is mine for mine in self.results):
+                r.ops += 1
+                self.results += (r,)
+
+    def to_pymongo(self):
+        if self.kind == "update":
+            return UpdateOne(self.filter, self.doc, upsert=self.upsert)
+        if self.kind == "replace":
+            return ReplaceOne(self.filter, self.doc, upsert=self.upsert)
+        if self.kind == "delete":
+            return DeleteOne(self.filter)
+        if self.kind == "insert":
+            return InsertOne(self.doc)
+        return self.doc  # pre-built pymongo operation
+
+
+def _filter_key(filter: Dict[str, Any]) -> Tuple:
+    return tuple(sorted((k, repr(v)) for k, v in filter.items()))
+
+
+class BatchWriter:
+    """Write-behind Mongo writer shared by the ingestion modules.
+
+    Modules enqueue upserts/replaces/inserts and return immediately; a
+    background thread coalesces them per collection and writes each
+    collection with one unordered bulk_write once `batch_size` operations
+    are pending or the oldest has waited `flush_interval_s`. Writes to the
+    same document (same filter) are folded together while queued: a later
+    replace wins, and `$set`/`$setOnInsert` updates merge. Writes that cannot
+    be folded start a new segment, so their relative order is kept.
+
+    When `max_pending` operations are queued, enqueue blocks until the
+    writer catches up (backpressure). `flush()` is the end-of-job barrier: it
+    returns once everything enqueued before the call has been written.
+    Chunks that hit a transient connection error (AutoReconnect,
+    NetworkTimeout, ...) are retried with backoff before their writes are
+    reported as failed.
+    """
+
+    def __init__(self, db, batch_size: int = 500, flush_interval_s: float = 1.0, max_pending: int = 20_000):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_pending = max_pending
+        # collection -> segments; each segment maps a coalescing key to its pending op
+        self._buffers: Dict[str, List[Dict[Any, _Op]]] = {}
+        self._pending = 0
+        self._oldest: Optional[float] = None
+        self._enqueued_seq = 0
+        self._written_seq = 0
+        self._flush_target = 0
+        self._anon = 0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    # --- producer side ---
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="mongo-batch-writer", daemon=True)
+            self._thread.start()
+
+    def _enqueue(self, collection: str, op: _Op, key: Any = None, barrier: bool = False) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BatchWriter is closed")
+            self._ensure_thread()
+            while self._pending >= self.max_pending:
+                self._cond.notify_all()
+                self._cond.wait(0.5)
+            self._enqueued_seq += 1
+            stats = self.stats.setdefault(collection, {"queued": 0, "coalesced": 0, "written": 0, "upserted": 0, "modified": 0, "errors": 0, "batches": 0})
+            stats["queued"] += 1
+            segments = self._buffers.setdefault(collection, [{}])
+            if key is None:
+                self._anon += 1
+                key = ("_anon", self._anon)
+            if barrier and segments[-1]:
+                segments.append({})
+            current = segments[-1]
+            prev = current.get(key)
+            if prev is not None and prev.absorb(op):
+                stats["coalesced"] += 1
+            else:
+                if prev is not None:
+                    segments.append({})
+                segments[-1][key] = op
+                for r in op.results:
+                    r.ops += 1
+                self._pending += 1
+                if self._oldest is None:
+                    # Wake the writer so it starts the flush_interval_s timer
+                    self._oldest = time.monotonic()
+                    self._cond.notify_all()
+            if barrier:
+                segments.append({})
+            if self._pending >= self.batch_size:
+                self._cond.notify_all()
+
+    def upsert(self, collection: str, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = True,
+               result: Optional[WriteResult] = None) -> None:
+        """Queue update_one(filter, update); folded with other queued updates of the same filter."""
+        self._enqueue(collection, _Op("update", filter, update, upsert, result), _filter_key(filter))
+
+    def replace(self, collection: str, filter: Dict[str, Any], doc: Dict[str, Any], upsert: bool = True,
+                result: Optional[WriteResult] = None) -> None:
+        self._enqueue(collection, _Op("replace", filter, doc, upsert, result), _filter_key(filter))
+
+    def insert(self, collection: str, doc: Dict[str, Any], result: Optional[WriteResult] = None) -> None:
+        self._enqueue(collection, _Op("insert", None, doc, False, result))
+
+    def write(self, collection: str, op: Any, result: Optional[WriteResult] = None, barrier: bool = False) -> None:
+        """Queue a pre-built pymongo operation (UpdateOne with a pipeline, DeleteOne, ...); never coalesced.
+
+        With `barrier`, the op is written after every write queued on the
+        collection before it and before any queued after it, e.g. a
+        DeleteMany that must see earlier updates.
+        """
+        self._enqueue(collection, _Op("raw", None, op, False, result), barrier=barrier)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything enqueued so far is written; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = self._enqueued_seq
+            if self._written_seq >= target:
+                return True
+            self._ensure_thread()
+            self._flush_target = max(self._flush_target, target)
+            self._cond.notify_all()
+            while self._written_seq < target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else 1.0)
+        return True
+
+    def close(self, timeout: Optional[float] = 30.0) -> None:
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    # --- writer thread ---
+
+    def _due(self) -> bool:
+        if not self._pending:
+            return False
+        if self._pending >= self.batch_size or self._flush_target > self._written_seq or self._closed:
+            return True
+        return self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval_s
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._due():
+                    if self._closed:
+                        return
+                    if self._pending == 0 and self._flush_target > self._written_seq:
+                        # Everything queued so far was folded into ops already written
+                        self._written_seq = self._enqueued_seq
+                        self._cond.notify_all()
+                        continue
+                    wait = self.flush_interval_s
+                    if self._oldest is not None:
+                        wait = max(0.0, self.flush_interval_s - (time.monotonic() - self._oldest))
+                    self._cond.wait(wait if self._pending else None)
+                buffers, self._buffers = self._buffers, {}
+                seq = self._enqueued_seq
+                self._pending = 0
+                self._oldest = None
+                # Producers blocked on backpressure can refill while this batch is written
+                self._cond.notify_all()
+
+            for collection, segments in buffers.items():
+                for segment in segments:
+                    self._write(collection, list(segment.values()))
+
+            with self._cond:
+                self._written_seq = max(self._written_seq, seq)
+                self._cond.notify_all()
+
+    def _write(self, collection: str, ops: List[_Op]) -> None:
+        stats = self.stats[collection]
+        for start in range(0, len(ops), self.batch_size):
+            batch = ops[start:start + self.batch_size]
+            if not batch:
+                continue
+            with span("mongo.bulk_write", sample="mongo.bulk_write", collection=collection, ops=len(batch)) as sp:
+                upserted, failed = self._write_chunk(collection, batch, stats, sp)
+            stats["batches"] += 1
+            self._settle(batch, upserted, failed)
+
+    def _write_chunk(self, collection: str, batch: List[_Op], stats: Dict[str, int], sp) -> Tuple[Set[int], Set[int]]:
+        """bulk_write one chunk, retrying transient connection errors; returns (upserted, failed) op indexes.
+
+        A server that was never reached gets the whole chunk again. After any
+        other connection error the chunk may have partly applied, so only ops
+        that are safe to send twice are retried and the rest count as failed.
+        """
+        send = list(range(len(batch)))
+        failed: Set[int] = set()
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                res = self.db[collection].bulk_write([batch[i].to_pymongo() for i in send], ordered=False)
+                stats["written"] += len(send)
+                stats["upserted"] += res.upserted_count
+                stats["modified"] += res.modified_count
+                sp.set(upserted=res.upserted_count, modified=res.modified_count, errors=len(failed), attempts=attempt + 1)
+                return {send[j] for j in (res.upserted_ids or ())}, failed
+            except BulkWriteError as bwe:
+                errors = bwe.details.get("writeErrors", [])
+                stats["written"] += len(send) - len(errors)
+                stats["upserted"] += bwe.details.get("nUpserted", 0)
+                stats["modified"] += bwe.details.get("nModified", 0)
+                real = [e for e in errors if e.get("code") != 11000]
+                stats["errors"] += len(real)
+                sp.set(upserted=bwe.details.get("nUpserted", 0), modified=bwe.details.get("nModified", 0),
+                       duplicates=len(errors) - len(real), errors=len(real) + len(failed), attempts=attempt + 1)
+                if real:
+                    log.warning("write errors on %s: %s", collection, real[0].get("errmsg"),
+                                extra={"attrs": {"collection": collection, "errors": len(real)}})
+                return {send[u["index"]] for u in bwe.details.get("upserted", [])}, failed | {send[e["index"]] for e in real}
+            except AutoReconnect as e:
+                if not isinstance(e, ServerSelectionTimeoutError):
+                    unsafe = [i for i in send if not batch[i].idempotent()]
+                    if unsafe:
+                        # May have been applied already; resending could apply them twice
+                        failed.update(unsafe)
+                        stats["errors"] += len(unsafe)
+                        send = [i for i in send if batch[i].idempotent()]
+                if not send or attempt + 1 == WRITE_ATTEMPTS:
+                    failed.update(send)
+                    stats["errors"] += len(send)
+                    sp.set(errors=len(failed), attempts=attempt + 1).fail(e)
+                    log.error("failed to write %d ops to %s: %s", len(failed), collection, e)
+                    return set(), failed
+                log.warning("transient error writing to %s, retrying %d ops: %s", collection, len(send), e)
+                time.sleep(RETRY_BACKOFF_S[min(attempt, len(RETRY_BACKOFF_S) - 1)])
+            except Exception as e:
+                failed.update(send)
+                stats["errors"] += len(send)
+                sp.set(errors=len(failed)).fail(e)
+                log.error("failed to write %d ops to %s: %s", len(failed), collection, e)
+                return set(), failed
+        return set(), failed
+
+    @staticmethod
+    def _settle(ops: List[_Op], upserted: Set[int], failed: Set[int]) -> None:
+        """Credit each op's outcome to the result handles it was queued with."""
+        for i, op in enumerate(ops):
+            for r in op.results:
+                if i in failed:
+                    r.errors += 1
+                    continue
+                r.written += 1
+                if i in upserted:
+                    r.upserted += 1
+
+
+_writers: Dict[Tuple[int, str], BatchWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def shared_writer(db) -> BatchWriter:
+    """The process-wide BatchWriter for `db`, created on first use and flushed at exit."""
+    key = (id(db.client), db.name)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = BatchWriter(db)
+            atexit.register(writer.close)
+        return writer
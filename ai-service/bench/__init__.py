@@ -0,0 +1 @@
+# Offline benchmarks for ai-service hot paths
@@ -0,0 +1,230 @@
+"""Micro-benchmarks for per-record CPU hot paths, gated against stored baselines.
+
+Run from ai-service/:
+    python -m bench.bench_hotpaths             # compare with bench/baselines.json
+    python -m bench.bench_hotpaths --update    # re-record the baselines
+
+Each case is timed over several rounds, and each round is divided by a fixed
+pure-Python calibration loop timed right next to it, so a baseline recorded on
+one machine still applies on a faster or slower CI runner. A case keeps its
+fastest round: noise only ever adds time, so the minimum is far steadier than
+the median. The table prints that relative time ("rel", per mille of one
+calibration loop) for the run and the baseline, and "change" is the ratio of
+those two columns; us/call is this run's absolute time, for reference only.
+
+A case slower than its baseline by more than --threshold (default 25%) is
+measured again, up to --retries times, keeping its best result. The run exits
+non-zero only when a case is still over the threshold after that.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+FINVIZ_VALUES = ["1.50B", "2.5%", "-", "1,234.56", "350.12M", "12.7K", "0.85", "-3.20%", None, 42, "n/a", " 18.33 "]
+HEADLINE_WORDS = (
+    "fed signals rate cut as inflation cools while oil prices jump on opec supply worries "
+    "and china tariff talks stall amid earnings season nvidia apple tesla shares surge "
+    "after guidance beats estimates bitcoin slips sec lawsuit merger acquisition layoffs"
+).split()
+SOURCES = ["Reuters Business", "Google News Top", "Finviz Aggregated", "CNBC Top News", "Yahoo Finance"]
+
+
+class _NullCollection:
+    """In-memory no-op collection so modules can be built without MongoDB."""
+
+    def __getattr__(self, name):
+        def _noop(*args, **kwargs):
+            if name in ("find", "aggregate"):
+                return []
+            if name in ("estimated_document_count", "count_documents"):
+                return 0
+            return None
+        return _noop
+
+
+class _NullDB:
+    def __getitem__(self, name):
+        return _NullCollection()
+
+    def __getattr__(self, name):
+        return _NullCollection()
+
+
+def _fund_data(rng: random.Random) -> Dict[str, Any]:
+    keys = [
+        "Market Cap", "Enterprise Value", "P/E", "Forward P/E", "PEG", "P/S", "P/B", "P/C", "P/FCF", "EV/EBITDA",
+        "EV/Sales", "Gross Margin", "Oper. Margin", "Profit Margin", "ROA", "ROE", "ROI", "ROIC", "Sales", "Income",
+        "EPS (ttm)", "EPS next Y", "EPS next 5Y", "EPS past 5Y", "Sales past 5Y", "EPS Q/Q", "Sales Q/Q", "Quick Ratio",
+        "Current Ratio", "Debt/Eq", "LT Debt/Eq", "Dividend", "Dividend %", "Payout", "Insider Own", "Insider Trans",
+        "Inst Own", "Inst Trans", "Short Float", "Short Ratio", "Beta", "Volatility W", "Volatility M", "ATR (14)",
+        "Avg Volume", "Rel Volume", "Price", "Employees", "Shs Outstand", "Shs Float", "52W High", "52W Low",
+        "SMA20", "SMA50", "SMA200", "Perf Week", "Perf Month", "Perf Year", "RSI (14)", "Target Price",
+    ]
+    data = {k: rng.choice(["12.34", "1.25B", "3.4%", "-", "845.2M", "0.92", "-1.5%"]) for k in keys}
+    data.update({"Sector": "Technology", "Industry": "Semiconductors", "Country": "USA", "Exchange": "NASD", "IPO": "Jan 22, 1999"})
+    return data
+
+
+def _yf_frames(rng: random.Random):
+    import pandas as pd
+
+    rows = [
+        "Free Cash Flow", "Operating Cash Flow", "Capital Expenditure", "Total Debt", "Cash And Cash Equivalents",
+        "Total Revenue", "Gross Profit", "Operating Income", "Net Income", "EBITDA", "Total Assets",
+        "Total Liabilities Net Minority Interest", "Stockholders Equity", "Current Assets", "Current Liabilities",
+        "Inventory", "Accounts Receivable", "Interest Expense", "Tax Provision", "Research And Development",
+    ] + [f"Line Item {i}" for i in range(20)]
+    dates = [pd.Timestamp(datetime(2025, 12, 31) - timedelta(days=91 * i)) for i in range(5)]
+    values = [[rng.choice([rng.uniform(-5e9, 5e10), float("nan")]) for _ in dates] for _ in rows]
+    return pd.DataFrame(values, index=rows, columns=dates)
+
+
+def _headlines(rng: random.Random, n: int) -> List[str]:
+    return [" ".join(rng.choice(HEADLINE_WORDS) for _ in range(rng.randint(7, 16))).capitalize() for _ in range(n)]
+
+
+def _calibration_work() -> int:
+    """Fixed pure-Python workload; every result is expressed in units of its runtime."""
+    d = {}
+    for i in range(20000):
+        d[str(i)] = i * 2
+    return sum(len(k) for k in d)
+
+
+def _timeit(fn: Callable[[], Any], number: int) -> float:
+    # Same as timeit: keep collector pauses out of the sample
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return (time.perf_counter() - start) / number
+    finally:
+        gc.enable()
+
+
+def _cases(rng: random.Random) -> Dict[str, Tuple[Callable[[], Any], int]]:
+    """name -> (callable doing one unit of work, calls per round)."""
+    from app.fundamentals import build_comprehensive_metrics, parse_finviz_val, process_yf_df
+    from app.news import NewsModule
+    from app.osint import OSINTModule
+
+    fund = _fund_data(rng)
+    frame = _yf_frames(rng)
+    news = NewsModule(_NullDB())
+    # _hash_id and _truncate need no state; skip the constructor's fetcher thread and indexes
+    osint = OSINTModule.__new__(OSINTModule)
+
+    headlines = _headlines(rng, 512)
+    fresh_rng = random.Random(99)
+    payloads = [{"url": f"https://example.com/a/{i}", "seendate": f"20261018T{i % 24:02d}1500Z", "title": h} for i, h in enumerate(headlines)]
+    long_texts = [("  ".join(headlines[i:i + 8]) + "\n") * 2 for i in range(0, 256, 8)]
+
+    def cycle(items):
+        state = {"i": 0}
+
+        def _next():
+            state["i"] = (state["i"] + 1) % len(items)
+            return items[state["i"]]
+        return _next
+
+    next_val, next_hl, next_payload, next_long = cycle(FINVIZ_VALUES), cycle(headlines), cycle(payloads), cycle(long_texts)
+    next_src = cycle(SOURCES)
+
+    return {
+        "parse_finviz_val": (lambda: parse_finviz_val(next_val()), 20000),
+        "comprehensive_metrics": (lambda: build_comprehensive_metrics(fund, frame, frame), 50),
+        "process_yf_df": (lambda: process_yf_df(frame), 50),
+        "news._score_headline": (lambda: news._score_headline(next_hl(), next_src()), 5000),
+        "news.generate_tags": (lambda: news.generate_tags(next_hl(), "NVDA"), 5000),
+        # Unseen headlines, so this measures the TextBlob path rather than the LRU
+        "news.analyze_sentiment": (lambda: news.analyze_sentiment(_headlines(fresh_rng, 1)[0]), 500),
+        "osint._hash_id": (lambda: osint._hash_id("gdelt", next_payload()), 20000),
+        "osint._truncate": (lambda: osint._truncate(next_long(), 320), 20000),
+    }
+
+
+def _measure_case(fn: Callable[[], Any], number: int, rounds: int) -> Dict[str, float]:
+    fn()  # warm-up
+    units, samples = [], []
+    # Calibrate right next to every sample so frequency scaling affects both
+    # sides alike; each side keeps its own fastest time, since a minimum taken
+    # over ratios would favour rounds where only the calibration was slowed
+    for _ in range(rounds):
+        units.append(_timeit(_calibration_work, 1))
+        samples.append(_timeit(fn, number))
+    return {"us_per_call": min(samples) * 1e6, "relative": min(samples) / min(units)}
+
+
+def measure(cases: Dict[str, Tuple[Callable[[], Any], int]], rounds: int = 15) -> Dict[str, Any]:
+    results = {name: _measure_case(fn, number, rounds) for name, (fn, number) in cases.items()}
+    calibration = min(_timeit(_calibration_work, 1) for _ in range(rounds))
+    return {"calibration_s": calibration, "results": results}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update", action="store_true", help="write the current results as the new baselines")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--rounds", type=int, default=15)
+    parser.add_argument("--retries", type=int, default=2, help="re-measure a case over the threshold this many times")
+    parser.add_argument("--baselines", default=BASELINES)
+    args = parser.parse_args()
+
+    cases = _cases(random.Random(11))
+    run = measure(cases, args.rounds)
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines, "r", encoding="utf-8") as f:
+            baselines = json.load(f).get("results", {})
+
+    def change(name: str) -> float:
+        return run["results"][name]["relative"] / baselines[name]["relative"] - 1.0
+
+    if not args.update:
+        for name in run["results"]:
+            for _ in range(args.retries):
+                if name not in baselines or change(name) <= args.threshold:
+                    break
+                fn, number = cases[name]
+                again = _measure_case(fn, number, args.rounds)
+                if again["relative"] < run["results"][name]["relative"]:
+                    run["results"][name] = again
+
+    failed = []
+    print(f"{'case':<26} {'us/call':>10} {'rel':>9} {'base rel':>9} {'change':>8}")
+    for name, r in run["results"].items():
+        base = baselines.get(name)
+        rel = r["relative"] * 1e3
+        if base:
+            base_rel = base["relative"] * 1e3
+            flag = "  REGRESSION" if change(name) > args.threshold else ""
+            print(f"{name:<26} {r['us_per_call']:>10.2f} {rel:>9.4f} {base_rel:>9.4f} {change(name):>+7.0%}{flag}")
+            if flag:
+                failed.append(name)
+        else:
+            print(f"{name:<26} {r['us_per_call']:>10.2f} {rel:>9.4f} {'-':>9} {'new':>8}")
+
+    if args.update:
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], **run}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baselines written to {args.baselines}")
+        return 0
+    if failed:
+        print(f"{len(failed)} hot path(s) regressed more than {args.threshold:.0%}: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
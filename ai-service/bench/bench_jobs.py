@@ -0,0 +1,174 @@
+"""End-to-end job throughput against recorded upstream responses.
+
+bench/fixtures holds a small committed fixture set (see its README), so the
+benchmark replays offline out of the box (the default mode):
+    python -m bench.bench_jobs --scales 1,10,100 --jobs news,osint
+Re-capture it from the live upstreams with network access:
+    python -m bench.bench_jobs --record
+
+The committed fixtures are synthetic, not a live capture, so replayed
+figures measure parsing and writing of made-up pages; the results table says
+so. Nothing runs this automatically. It needs a MongoDB reachable at
+BENCH_MONGO_URI (default mongodb://localhost:27017); each job runs against a
+freshly dropped `scope_bench` database. To run it by hand from ai-service/
+next to a throwaway MongoDB container:
+    docker run -d --name bench-mongo -p 27017:27017 mongo:6-jammy
+    BENCH_MONGO_URI=mongodb://localhost:27017 python -m bench.bench_jobs --scales 1
+    docker rm -f bench-mongo
+
+Scale means more work units per run: ticker-driven jobs (news, fundamentals)
+get `scale` times as many tickers (synthetic ones are served by the replay
+fallback), the single-poll jobs (screener, insider, sector, osint) run
+`scale` consecutive polls. "records" is the number of Mongo documents
+inserted, updated or deleted, counted by a command listener.
+"""
+import argparse
+import os
+import resource
+import time
+from typing import Callable, Dict, List
+
+from pymongo import MongoClient, monitoring
+
+from app import replay
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+BASE_TICKERS = ["AAPL", "GOOGL", "TSLA", "MSFT", "AMZN", "NVDA", "AMD"]
+WRITE_COMMANDS = {"insert", "update", "delete", "findAndModify"}
+
+
+class WriteCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.records = 0
+        self._pending: Dict[int, str] = {}
+
+    def started(self, event):
+        if event.command_name in WRITE_COMMANDS:
+            self._pending[event.request_id] = event.command_name
+
+    def succeeded(self, event):
+        if self._pending.pop(event.request_id, None) is not None:
+            reply = event.reply or {}
+            self.records += int(reply.get("n", 0) or 0) + len(reply.get("upserted", []) or [])
+
+    def failed(self, event):
+        self._pending.pop(event.request_id, None)
+
+
+def _tickers(scale: int) -> List[str]:
+    out = list(BASE_TICKERS)
+    for i in range(1, scale):
+        out.extend(f"{t}{i}" for t in BASE_TICKERS)
+    return out
+
+
+def _jobs(db, scale: int, recording: bool = False) -> Dict[str, Callable[[], None]]:
+    from app import osint as osint_module
+    from app.fundamentals import run_fundamentals_batch
+    from app.insider import InsiderModule
+    from app.news import NewsModule
+    from app.osint import OSINTModule
+    from app.quotecache import finviz_quotes
+    from app.screener import ScreenerModule
+    from app.sector import SectorModule
+
+    def repeat(make):
+        def _run():
+            poll = make()
+            for _ in range(scale):
+                poll()
+        return _run
+
+    def news():
+        finviz_quotes.invalidate()
+        NewsModule(db).fetch_all_news(_tickers(scale))
+
+    def fundamentals():
+        finviz_quotes.invalidate()
+        run_fundamentals_batch(db, _tickers(scale))
+
+    def osint():
+        if not recording:
+            # Replayed GDELT windows need no rate-limit pacing
+            osint_module.GDELT_MIN_INTERVAL_S = 0.0
+        module = OSINTModule(db)
+        try:
+            for _ in range(scale):
+                module.fetch_all()
+        finally:
+            module.fetcher.close()
+
+    return {
+        "screener": repeat(lambda: ScreenerModule(db).run_screen),
+        "insider": repeat(lambda: InsiderModule(db).fetch_insider_trades),
+        "sector": repeat(lambda: SectorModule(db).fetch_sector_performance),
+        "news": news,
+        "osint": osint,
+        "fundamentals": fundamentals,
+    }
+
+
+def _cpu_seconds() -> float:
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def run(jobs: List[str], scales: List[int], mongo_uri: str, fixtures: str, record: bool) -> List[Dict[str, float]]:
+    store = replay.install("record" if record else "replay", fixtures)
+    counter = WriteCounter()
+    client = MongoClient(mongo_uri, event_listeners=[counter])
+    results = []
+    try:
+        for scale in ([1] if record else scales):
+            for name in jobs:
+                client.drop_database("scope_bench")
+                db = client["scope_bench"]
+                job = _jobs(db, scale, record)[name]
+                counter.records = 0
+                served = store.stats["exact"] + store.stats["fallback"]
+                wall0, cpu0 = time.perf_counter(), _cpu_seconds()
+                job()
+                wall, cpu = time.perf_counter() - wall0, _cpu_seconds() - cpu0
+                results.append({
+                    "job": name,
+                    "scale": scale,
+                    "wall_s": wall,
+                    "cpu_s": cpu,
+                    "records": counter.records,
+                    "records_per_s": counter.records / wall if wall > 0 else 0.0,
+                    "responses": store.stats["exact"] + store.stats["fallback"] - served,
+                })
+    finally:
+        replay.uninstall()
+        client.close()
+
+    print(f"\n{'job':<13} {'scale':>5} {'wall s':>9} {'cpu s':>9} {'records':>9} {'records/s':>11} {'responses':>10}")
+    for r in results:
+        print(f"{r['job']:<13} {r['scale']:>5} {r['wall_s']:>9.2f} {r['cpu_s']:>9.2f} {r['records']:>9} {r['records_per_s']:>11.1f} {r['responses']:>10}")
+    if record:
+        print(f"Recorded {store.stats['recorded']} responses to {fixtures}")
+    elif os.path.abspath(fixtures) == os.path.abspath(FIXTURES):
+        print("Replayed from the committed synthetic fixtures (see bench/fixtures/README.md): "
+              "these figures measure parsing and writing of made-up pages, not live upstream throughput.")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--record", action="store_true", help="hit the live upstreams once and write fixtures")
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--jobs", default="screener,insider,sector,news,osint,fundamentals")
+    parser.add_argument("--scales", default="1,10,100")
+    parser.add_argument("--mongo-uri", default=os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017"))
+    args = parser.parse_args()
+    run(
+        [j.strip() for j in args.jobs.split(",") if j.strip()],
+        [int(s) for s in args.scales.split(",") if s.strip()],
+        args.mongo_uri,
+        args.fixtures,
+        args.record,
+    )
+
+
+if __name__ == "__main__":
+    main()
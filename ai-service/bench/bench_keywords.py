@@ -0,0 +1,57 @@
+"""Headline keyword matching: compiled matcher vs per-keyword substring scan.
+
+Run from ai-service/:  python -m bench.bench_keywords
+"""
+import random
+import string
+import time
+from typing import List, Tuple
+
+from app.keywords import KeywordMatcher
+
+HEADLINE_WORDS = (
+    "fed signals rate cut as inflation cools while oil prices jump on opec "
+    "supply worries and china tariff talks stall amid earnings season said "
+    "analysts offered guidance on semiconductor demand from ai data centers"
+).split()
+
+
+def _synthetic_keywords(n: int, rng: random.Random) -> List[Tuple[str, int]]:
+    out = []
+    for i in range(n):
+        words = 1 if i % 4 else 2
+        kw = " ".join("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))) for _ in range(words))
+        out.append((kw, rng.randint(1, 8)))
+    return out
+
+
+def _headlines(n: int, rng: random.Random) -> List[str]:
+    return [" ".join(rng.choice(HEADLINE_WORDS) for _ in range(rng.randint(8, 18))).capitalize() for _ in range(n)]
+
+
+def _substring_score(keywords: List[Tuple[str, int]], title: str) -> int:
+    t = title.lower()
+    return sum(w for kw, w in keywords if kw in t)
+
+
+def _time_per_headline(fn, headlines: List[str]) -> float:
+    start = time.perf_counter()
+    for h in headlines:
+        fn(h)
+    return (time.perf_counter() - start) / len(headlines) * 1e6
+
+
+def run(sizes=(60, 600, 6000, 60000), n_headlines: int = 2000, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    headlines = _headlines(n_headlines, rng)
+    print(f"{'keywords':>9} {'matcher us/hl':>14} {'substring us/hl':>16}")
+    for n in sizes:
+        keywords = _synthetic_keywords(n, rng) + [("fed", 6), ("oil", 4), ("rate cut", 7)]
+        matcher = KeywordMatcher([(kw, w) for kw, w in keywords])
+        compiled = _time_per_headline(lambda h: sum(w for _, w in matcher.find(h)), headlines)
+        naive = _time_per_headline(lambda h: _substring_score(keywords, h), headlines[: max(50, n_headlines * 60 // n)])
+        print(f"{n:>9} {compiled:>14.2f} {naive:>16.2f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,281 @@
+"""In-memory stand-in for the slice of pymongo the app uses, for the behaviour tests.
+
+Covers the filters, update operators and bulk operations the ingest modules
+send (equality, $in/$nin/$lt/$lte/$gt/$gte/$ne/$exists; $set, $setOnInsert,
+$inc, $max, $min, $push and $set pipelines) and nothing more. Not a general
+Mongo emulator: unsupported operators raise, so a test never passes by
+silently ignoring one.
+"""
+import copy
+import itertools
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+_MISSING = object()
+_ids = itertools.count(1)
+
+
+def _get(doc: Any, path: str) -> Any:
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return _MISSING
+        doc = doc[part]
+    return doc
+
+
+def _set(doc: Dict[str, Any], path: str, value: Any) -> None:
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _cmp(value: Any, op: str, arg: Any) -> bool:
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op == "$in":
+        return value is not _MISSING and value in arg
+    if op == "$nin":
+        return value is _MISSING or value not in arg
+    if op == "$ne":
+        return (None if value is _MISSING else value) != arg
+    if value is _MISSING or value is None:
+        return False
+    if op == "$lt":
+        return value < arg
+    if op == "$lte":
+        return value <= arg
+    if op == "$gt":
+        return value > arg
+    if op == "$gte":
+        return value >= arg
+    raise NotImplementedError(op)
+
+
+def matches(doc: Dict[str, Any], flt: Optional[Dict[str, Any]]) -> bool:
+    for key, cond in (flt or {}).items():
+        value = _get(doc, key)
+        if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            if not all(_cmp(value, op, arg) for op, arg in cond.items()):
+                return False
+        elif (None if value is _MISSING else value) != cond:
+            return False
+    return True
+
+
+def _eval(expr: Any, doc: Dict[str, Any]) -> Any:
+    if isinstance(expr, str) and expr.startswith("$"):
+        value = _get(doc, expr[1:])
+        return None if value is _MISSING else value
+    if isinstance(expr, dict):
+        if len(expr) == 1 and next(iter(expr)).startswith("$"):
+            op, args = next(iter(expr.items()))
+            vals = [_eval(a, doc) for a in args]
+            if op == "$ifNull":
+                return next((v for v in vals if v is not None), None)
+            present = [v for v in vals if v is not None]
+            if op == "$max":
+                return max(present) if present else None
+            if op == "$min":
+                return min(present) if present else None
+            raise NotImplementedError(op)
+        return {k: _eval(v, doc) for k, v in expr.items()}
+    return expr
+
+
+def _apply_update(doc: Dict[str, Any], update: Any, inserting: bool) -> None:
+    if isinstance(update, list):
+        for stage in update:
+            for op, fields in stage.items():
+                if op not in ("$set", "$addFields"):
+                    raise NotImplementedError(op)
+                values = {path: _eval(expr, doc) for path, expr in fields.items()}
+                for path, value in values.items():
+                    _set(doc, path, value)
+        return
+    for op, fields in update.items():
+        for path, arg in fields.items():
+            current = _get(doc, path)
+            if op == "$set":
+                _set(doc, path, copy.deepcopy(arg))
+            elif op == "$setOnInsert":
+                if inserting:
+                    _set(doc, path, copy.deepcopy(arg))
+            elif op == "$inc":
+                _set(doc, path, (0 if current is _MISSING else current) + arg)
+            elif op == "$max":
+                _set(doc, path, arg if current is _MISSING or current is None or arg > current else current)
+            elif op == "$min":
+                _set(doc, path, arg if current is _MISSING or current is None or arg < current else current)
+            elif op == "$push":
+                _set(doc, path, ([] if current is _MISSING else current) + [copy.deepcopy(arg)])
+            else:
+                raise NotImplementedError(op)
+
+
+class _Result:
+    def __init__(self):
+        self.inserted_count = 0
+        self.matched_count = 0
+        self.modified_count = 0
+        self.deleted_count = 0
+        self.upserted_count = 0
+        self.upserted_ids: Dict[int, Any] = {}
+
+
+class FakeCursor(list):
+    def limit(self, n: int) -> "FakeCursor":
+        return FakeCursor(self[:n] if n else self)
+
+    def sort(self, key: str, direction: int = 1) -> "FakeCursor":
+        return FakeCursor(sorted(self, key=lambda d: _get(d, key), reverse=direction < 0))
+
+
+class FakeCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self.docs: List[Dict[str, Any]] = []
+        self.indexes: List[Any] = []
+        self.bulk_writes = 0
+        # Raised, in order, by the next bulk_write calls
+        self.failures: List[Exception] = []
+
+    # --- reads ---
+
+    def find(self, flt: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None) -> FakeCursor:
+        out = FakeCursor()
+        for doc in self.docs:
+            if matches(doc, flt):
+                out.append(self._project(doc, projection))
+        return out
+
+    def find_one(self, flt: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None):
+        found = self.find(flt, projection)
+        return found[0] if found else None
+
+    def distinct(self, key: str, flt: Optional[Dict[str, Any]] = None) -> List[Any]:
+        out: List[Any] = []
+        for doc in self.find(flt):
+            value = _get(doc, key)
+            if value is not _MISSING and value not in out:
+                out.append(value)
+        return out
+
+    def count_documents(self, flt: Dict[str, Any]) -> int:
+        return len(self.find(flt))
+
+    def estimated_document_count(self) -> int:
+        return len(self.docs)
+
+    @staticmethod
+    def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        doc = copy.deepcopy(doc)
+        if not projection:
+            return doc
+        include = {k.split(".")[0] for k, v in projection.items() if v and k != "_id"}
+        if include:
+            doc = {k: v for k, v in doc.items() if k in include or k == "_id"}
+        else:
+            doc = {k: v for k, v in doc.items() if projection.get(k, 1)}
+        if projection.get("_id", 1) == 0:
+            doc.pop("_id", None)
+        return doc
+
+    # --- writes ---
+
+    def create_index(self, keys: Any, **kwargs: Any) -> str:
+        self.indexes.append((keys, kwargs))
+        return kwargs.get("name") or str(keys)
+
+    def insert_one(self, doc: Dict[str, Any]) -> _Result:
+        return self.bulk_write([InsertOne(doc)])
+
+    def insert_many(self, docs: Iterable[Dict[str, Any]], ordered: bool = True) -> _Result:
+        return self.bulk_write([InsertOne(d) for d in docs], ordered=ordered)
+
+    def update_one(self, flt: Dict[str, Any], update: Any, upsert: bool = False) -> _Result:
+        return self.bulk_write([UpdateOne(flt, update, upsert=upsert)])
+
+    def replace_one(self, flt: Dict[str, Any], doc: Dict[str, Any], upsert: bool = False) -> _Result:
+        return self.bulk_write([ReplaceOne(flt, doc, upsert=upsert)])
+
+    def delete_many(self, flt: Dict[str, Any]) -> _Result:
+        return self.bulk_write([DeleteMany(flt)])
+
+    def bulk_write(self, ops: List[Any], ordered: bool = True) -> _Result:
+        self.bulk_writes += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        res = _Result()
+        errors = []
+        for i, op in enumerate(ops):
+            if isinstance(op, InsertOne):
+                doc = copy.deepcopy(op._doc)
+                doc.setdefault("_id", next(_ids))
+                if any(d["_id"] == doc["_id"] for d in self.docs):
+                    errors.append({"index": i, "code": 11000, "errmsg": "duplicate key"})
+                    continue
+                self.docs.append(doc)
+                res.inserted_count += 1
+            elif isinstance(op, (DeleteOne, DeleteMany)):
+                hits = [d for d in self.docs if matches(d, op._filter)]
+                if isinstance(op, DeleteOne):
+                    hits = hits[:1]
+                self.docs = [d for d in self.docs if not any(d is h for h in hits)]
+                res.deleted_count += len(hits)
+            elif isinstance(op, (UpdateOne, UpdateMany, ReplaceOne)):
+                hits = [d for d in self.docs if matches(d, op._filter)]
+                if not isinstance(op, UpdateMany):
+                    hits = hits[:1]
+                for doc in hits:
+                    if isinstance(op, ReplaceOne):
+                        _id = doc["_id"]
+                        doc.clear()
+                        doc.update({**copy.deepcopy(op._doc), "_id": _id})
+                    else:
+                        _apply_update(doc, op._doc, inserting=False)
+                res.matched_count += len(hits)
+                res.modified_count += len(hits)
+                if not hits and op._upsert:
+                    doc = {k: v for k, v in op._filter.items() if not (isinstance(v, dict) and any(str(x).startswith("$") for x in v))}
+                    if isinstance(op, ReplaceOne):
+                        doc.update(copy.deepcopy(op._doc))
+                    else:
+                        _apply_update(doc, op._doc, inserting=True)
+                    doc.setdefault("_id", next(_ids))
+                    self.docs.append(doc)
+                    res.upserted_count += 1
+                    res.upserted_ids[i] = doc["_id"]
+            else:
+                raise NotImplementedError(type(op).__name__)
+        if errors:
+            raise BulkWriteError({
+                "writeErrors": errors, "nInserted": res.inserted_count, "nUpserted": res.upserted_count,
+                "nModified": res.modified_count, "upserted": [{"index": i, "_id": v} for i, v in res.upserted_ids.items()],
+            })
+        return res
+
+
+class FakeClient:
+    pass
+
+
+class FakeDB:
+    """Collections created on first access, like a real Database."""
+
+    def __init__(self, name: str = "test"):
+        self.name = name
+        self.client = FakeClient()
+        self.collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(name)
+        return self.collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
@@ -0,0 +1,110 @@
+"""Behaviour checks for the CoinGecko OHLC bars and the markets poll budget.
+
+Run from ai-service/:  python -m pytest -q bench
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.crypto import BAR_INTERVALS, CryptoBars, markets_requests
+from app.osint import OSINTModule
+from app.ratelimit import RateLimiter
+from app.snapshots import LocalSnapshotStore, SnapshotPublisher
+from app.writer import BatchWriter
+from bench.fakemongo import FakeDB
+
+T0 = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _bars(intervals=("1m", "1h")):
+    db = FakeDB()
+    return db, CryptoBars(db, intervals=intervals, writer=BatchWriter(db, flush_interval_s=60))
+
+
+def _flush(bars: CryptoBars) -> int:
+    queued = bars.flush()
+    assert bars.writer.flush(timeout=5)
+    return queued
+
+
+def _bar(db, coin, interval, at):
+    bar_s, bucket_s, _ = BAR_INTERVALS[interval]
+    ts = int(at.timestamp())
+    doc = db["crypto_bars"].find_one({"_id": f"{coin}:{interval}:{ts - ts % bucket_s}"})
+    return doc["bars"][str(ts % bucket_s // bar_s)]
+
+
+def test_markets_requests_page_the_top_n():
+    assert [r["params"]["page"] for r in markets_requests(250)] == [1]
+    reqs = markets_requests(600)
+    assert [r["params"]["page"] for r in reqs] == [1, 2, 3]
+    assert {r["params"]["per_page"] for r in reqs} == {250}
+
+
+def test_ticks_fold_into_ohlc_bars():
+    db, bars = _bars()
+    for sec, price in [(5, 100.0), (20, 110.0), (40, 95.0), (59, 105.0), (65, 106.0)]:
+        bars.add_tick("btc", price, T0 + timedelta(seconds=sec))
+    assert _flush(bars) == 2
+    assert _bar(db, "btc", "1m", T0 + timedelta(minutes=1)) == {"o": 106.0, "h": 106.0, "l": 106.0, "c": 106.0}
+    assert _bar(db, "btc", "1h", T0) == {"o": 100.0, "h": 110.0, "l": 95.0, "c": 106.0}
+
+
+def test_stale_ticks_are_ignored_and_unchanged_bars_not_rewritten():
+    db, bars = _bars(("1m",))
+    assert bars.add_tick("eth", 10.0, T0)
+    assert not bars.add_tick("eth", 99.0, T0)
+    assert _flush(bars) == 1
+    assert _flush(bars) == 0
+
+
+def test_writes_merge_with_the_stored_bar_after_a_restart():
+    db, bars = _bars(("1h",))
+    bars.add_tick("btc", 100.0, T0 + timedelta(minutes=1))
+    bars.add_tick("btc", 120.0, T0 + timedelta(minutes=2))
+    _flush(bars)
+    # A fresh process only sees ticks from here on
+    restarted = CryptoBars(db, intervals=("1h",), writer=bars.writer)
+    restarted.add_tick("btc", 90.0, T0 + timedelta(minutes=30))
+    _flush(restarted)
+    assert _bar(db, "btc", "1h", T0) == {"o": 100.0, "h": 120.0, "l": 90.0, "c": 90.0}
+
+
+def test_fine_buckets_expire_and_hourly_ones_are_kept():
+    db, bars = _bars(("1m", "1h"))
+    bars.add_tick("btc", 1.0, T0)
+    _flush(bars)
+    by_interval = {d["interval"]: d for d in db["crypto_bars"].docs}
+    assert by_interval["1m"]["expire_at"] == T0.replace(hour=0) + timedelta(days=15)
+    assert "expire_at" not in by_interval["1h"]
+
+
+def test_ingest_markets_drops_coins_that_left_the_top_n():
+    db, bars = _bars(("1m",))
+    page = [{"id": "btc", "current_price": 1.0, "last_updated": "2026-01-01T12:00:00Z"},
+            {"id": "old", "current_price": 2.0, "last_updated": "2026-01-01T12:00:00Z"},
+            {"id": "bad", "current_price": None}]
+    rows, queued = bars.ingest_markets([page, RuntimeError("page 2")], now=T0)
+    assert [r["id"] for r in rows] == ["btc", "old"] and queued == 2
+    bars.writer.flush(timeout=5)
+    bars.ingest_markets([[{"id": "btc", "current_price": 1.5, "last_updated": "2026-01-01T12:00:30Z"}]], now=T0)
+    assert {k[0] for k in bars._bars} == {"btc"} and set(bars._last_tick) == {"btc"}
+
+
+class _Fetcher:
+    def __init__(self):
+        self.requests = []
+
+    def gather(self, requests):
+        self.requests.append(requests)
+        return {name: [] for name in requests}
+
+
+def test_coingecko_poll_skips_pages_over_the_budget():
+    db = FakeDB()
+    fetcher = _Fetcher()
+    osint = OSINTModule(db, fetcher=fetcher, writer=BatchWriter(db, flush_interval_s=60),
+                        snapshots=SnapshotPublisher(LocalSnapshotStore()))
+    osint.crypto_top_n = 500
+    osint.coingecko_limiter = RateLimiter(rate=1 / 60, burst=1)
+    osint.fetch_coingecko_prices()
+    osint.fetch_coingecko_prices()
+    assert [len(r) for r in fetcher.requests] == [1]
@@ -0,0 +1,45 @@
+"""Behaviour checks for the near-duplicate headline index.
+
+Run from ai-service/:  python -m pytest -q bench
+"""
+from datetime import datetime, timedelta
+
+from app.dedup import NearDuplicateIndex
+
+
+def test_dedup_matches_publisher_suffix_variant():
+    idx = NearDuplicateIndex()
+    idx.add("a", "Nvidia shares surge after record data center revenue forecast")
+    assert idx.query("Nvidia shares surge after record data center revenue forecast - Reuters") == "a"
+
+
+def test_dedup_never_matches_across_entities():
+    idx = NearDuplicateIndex()
+    title = "Quarterly earnings beat analyst estimates on strong cloud demand"
+    idx.add("apple", title, entities=frozenset({"AAPL"}))
+    assert idx.query(title, entities=frozenset({"MSFT"})) is None
+    assert idx.query(title, entities=frozenset({"AAPL"})) == "apple"
+
+
+def test_dedup_ignores_short_and_dissimilar_titles():
+    idx = NearDuplicateIndex()
+    assert idx.match_or_add("short", "Stocks rise") is None
+    assert len(idx) == 0
+    idx.add("a", "Oil prices jump after supply disruption in the Gulf region")
+    assert idx.query("Gold prices slip as dollar firms ahead of central bank decision") is None
+
+
+def test_dedup_match_or_add_keeps_the_first_key():
+    idx = NearDuplicateIndex()
+    title = "Tesla recalls thousands of vehicles over steering software issue"
+    assert idx.match_or_add("first", title) is None
+    assert idx.match_or_add("second", title + " - AP News") == "first"
+    assert len(idx) == 1
+
+
+def test_dedup_evicts_entries_older_than_the_window():
+    idx = NearDuplicateIndex(window=timedelta(hours=1))
+    title = "Central bank raises interest rates to fight persistent inflation"
+    idx.add("old", title, seen_at=datetime.utcnow() - timedelta(hours=2))
+    idx.add("fresh", "Shipping costs climb as vessels avoid the Red Sea route")
+    assert idx.query(title) is None
@@ -0,0 +1,109 @@
+"""Behaviour checks for the OSINT fetcher's retries and circuit breakers.
+
+Run from ai-service/:  python -m pytest -q bench
+"""
+import asyncio
+
+import pytest
+
+from app import fetcher as fetcher_mod
+from app.fetcher import AsyncJSONFetcher, CircuitBreaker, CircuitOpenError, UpstreamHTTPError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(fetcher_mod.time, "monotonic", lambda: now[0])
+    return now
+
+
+# --- CircuitBreaker ---
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    br = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    br.record_failure()
+    assert br.allow()
+    br.record_failure()
+    assert br.state == CircuitBreaker.OPEN and not br.allow()
+
+
+def test_breaker_success_resets_the_failure_count(clock):
+    br = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    br.record_failure()
+    br.record_success()
+    br.record_failure()
+    assert br.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_lets_one_probe_through_after_the_timeout(clock):
+    br = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    br.record_failure()
+    clock[0] += 59
+    assert not br.allow()
+    clock[0] += 1
+    assert br.allow() and br.state == CircuitBreaker.HALF_OPEN
+    assert not br.allow()
+    br.record_failure()
+    assert br.state == CircuitBreaker.OPEN and not br.allow()
+    clock[0] += 60
+    assert br.allow()
+    br.record_success()
+    assert br.state == CircuitBreaker.CLOSED and br.allow()
+
+
+# --- AsyncJSONFetcher ---
+
+@pytest.fixture
+def fetcher():
+    f = AsyncJSONFetcher("test", max_retries=2, backoff_base=0, backoff_max=0, failure_threshold=2)
+    yield f
+    f.close()
+
+
+def _script(fetcher, outcomes):
+    """Replace the HTTP call with one that yields `outcomes` in order; returns the call log."""
+    calls = []
+
+    async def _once(method, url, params, data, headers, timeout_s):
+        calls.append(url)
+        out = outcomes.pop(0)
+        if isinstance(out, BaseException):
+            raise out
+        return out
+    fetcher._once = _once
+    return calls
+
+
+def test_fetcher_retries_transient_errors(fetcher):
+    calls = _script(fetcher, [UpstreamHTTPError(503, "u"), asyncio.TimeoutError(), {"ok": 1}])
+    assert fetcher.request_json("usgs", "GET", "u") == {"ok": 1}
+    assert len(calls) == 3
+    st = fetcher.status()["usgs"]
+    assert st["retries"] == 2 and st["errors"] == 0 and st["breaker"] == CircuitBreaker.CLOSED
+
+
+def test_fetcher_does_not_retry_client_errors(fetcher):
+    calls = _script(fetcher, [UpstreamHTTPError(404, "u")])
+    with pytest.raises(UpstreamHTTPError):
+        fetcher.request_json("usgs", "GET", "u")
+    assert len(calls) == 1 and fetcher.status()["usgs"]["consecutive_failures"] == 1
+
+
+def test_fetcher_open_breaker_skips_the_network(fetcher):
+    calls = _script(fetcher, [UpstreamHTTPError(400, "u"), UpstreamHTTPError(400, "u")])
+    for _ in range(2):
+        with pytest.raises(UpstreamHTTPError):
+            fetcher.request_json("gdelt", "GET", "u")
+    with pytest.raises(CircuitOpenError):
+        fetcher.request_json("gdelt", "GET", "u")
+    assert len(calls) == 2
+    assert fetcher.status()["gdelt"]["breaker"] == CircuitBreaker.OPEN
+
+
+def test_fetcher_gather_returns_failures_as_exceptions(fetcher):
+    _script(fetcher, [{"a": 1}, UpstreamHTTPError(404, "b")])
+    out = fetcher.gather({
+        "a": {"source": "a", "method": "GET", "url": "a"},
+        "b": {"source": "b", "method": "GET", "url": "b"},
+    })
+    assert out["a"] == {"a": 1} and isinstance(out["b"], UpstreamHTTPError)
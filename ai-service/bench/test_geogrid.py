@@ -0,0 +1,148 @@
+"""Behaviour checks for the OSINT grid aggregates and how ingest keeps them in step.
+
+Run from ai-service/:  python -m pytest -q bench
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.geogrid import ZOOM_LEVELS, GridAggregator, quadkey, tile_bounds
+from app.osint import EVENT_RETENTION, OSINTModule
+from app.snapshots import LocalSnapshotStore, SnapshotPublisher
+from app.writer import BatchWriter
+from bench.fakemongo import FakeDB
+
+TOKYO = (139.69, 35.68)
+LIMA = (-77.04, -12.05)
+
+
+def _cells(db: FakeDB, zoom: int = 4):
+    return {d["quadkey"]: d for d in db["osint_grid"].docs if d["zoom"] == zoom}
+
+
+def _count(db: FakeDB, lonlat, zoom: int = 4) -> int:
+    cell = _cells(db, zoom).get(quadkey(*lonlat)[:zoom])
+    return cell["count"] if cell else 0
+
+
+def _grid():
+    db = FakeDB()
+    return db, GridAggregator(db, writer=BatchWriter(db, flush_interval_s=60))
+
+
+# --- GridAggregator ---
+
+def test_quadkey_prefixes_nest_and_bound_the_point():
+    key = quadkey(*TOKYO)
+    assert len(key) == max(ZOOM_LEVELS)
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(key[:6])
+    assert min_lon <= TOKYO[0] <= max_lon and min_lat <= TOKYO[1] <= max_lat
+
+
+def test_grid_apply_counts_every_zoom_and_kind():
+    db, grid = _grid()
+    cell = quadkey(*TOKYO)
+    grid.apply([(None, None, cell, "earthquake", 5.1), (None, None, cell, "aviation", None)])
+    assert grid.writer.flush(timeout=5)
+    for zoom in ZOOM_LEVELS:
+        doc = _cells(db, zoom)[cell[:zoom]]
+        assert doc["count"] == 2
+        assert doc["kinds"] == {"earthquake": 1, "aviation": 1}
+        assert doc["max_magnitude"] == 5.1
+
+
+def test_grid_move_leaves_the_old_cell_and_deletes_it_when_empty():
+    db, grid = _grid()
+    old, new = quadkey(*TOKYO), quadkey(*LIMA)
+    grid.apply([(None, None, old, "earthquake", None)])
+    grid.apply([(old, "earthquake", new, "earthquake", None)])
+    assert grid.writer.flush(timeout=5)
+    assert _count(db, TOKYO) == 0 and old[:4] not in _cells(db)
+    assert _count(db, LIMA) == 1
+
+
+def test_grid_rebuild_recomputes_from_events():
+    db, grid = _grid()
+    db["osint_events"].insert_many([
+        {"kind": "earthquake", "geo": {"type": "Point", "coordinates": list(TOKYO)}, "metrics": {"magnitude": 4.0}},
+        {"kind": "earthquake", "geo": {"type": "Point", "coordinates": list(TOKYO)}, "metrics": {"magnitude": 6.0}},
+        {"kind": "cyber", "geo": None},
+    ])
+    db["osint_grid"].insert_one({"_id": "4:stale", "zoom": 4, "quadkey": "stale", "count": 9})
+    assert grid.rebuild() == len(ZOOM_LEVELS)
+    assert grid.writer.flush(timeout=5)
+    assert set(_cells(db)) == {quadkey(*TOKYO)[:4]}
+    assert _count(db, TOKYO) == 2 and _cells(db)[quadkey(*TOKYO)[:4]]["max_magnitude"] == 6.0
+    # Each located event is stamped with its finest cell
+    assert [e.get("grid_cell") for e in db["osint_events"].docs[:2]] == [quadkey(*TOKYO)] * 2
+
+
+# --- OSINTModule keeps the grid in step with confirmed writes ---
+
+def _osint():
+    db = FakeDB()
+    osint = OSINTModule(db, fetcher=object(), writer=BatchWriter(db, flush_interval_s=60),
+                        snapshots=SnapshotPublisher(LocalSnapshotStore()))
+    return db, osint
+
+
+def _event(sid: str, lonlat, kind: str = "earthquake", mag: float = 5.0):
+    return {
+        "source": "USGS" if kind == "earthquake" else "OpenSky",
+        "source_id": sid,
+        "kind": kind,
+        "title": sid,
+        "published_at": datetime(2026, 1, 1, tzinfo=timezone.utc),
+        "geo": {"type": "Point", "coordinates": list(lonlat)},
+        "metrics": {"magnitude": mag},
+    }
+
+
+def test_grid_moves_wait_for_the_event_write():
+    db, osint = _osint()
+    osint._upsert_many([_event("q1", TOKYO)])
+    assert _count(db, TOKYO) == 0
+    assert osint.flush_writes()
+    assert _count(db, TOKYO) == 1
+
+
+def test_failed_event_write_is_retried_and_counted_once():
+    db, osint = _osint()
+    db["osint_events"].failures.append(ValueError("write refused"))
+    osint._upsert_many([_event("q1", TOKYO)])
+    osint.flush_writes()
+    assert db["osint_events"].docs == [] and _count(db, TOKYO) == 0
+    assert osint._upsert_many([_event("q1", TOKYO)]) == 1
+    osint.flush_writes()
+    assert len(db["osint_events"].docs) == 1 and _count(db, TOKYO) == 1
+
+
+def test_event_still_in_flight_is_not_queued_twice():
+    db, osint = _osint()
+    osint._upsert_many([_event("q1", TOKYO)])
+    # Not flushed yet: a second poll must not count the same event again
+    assert osint._upsert_many([_event("q1", LIMA)]) == 0
+    osint.flush_writes()
+    assert _count(db, TOKYO) == 1 and _count(db, LIMA) == 0
+    assert osint._upsert_many([_event("q1", LIMA)]) == 1
+    osint.flush_writes()
+    assert _count(db, TOKYO) == 0 and _count(db, LIMA) == 1
+
+
+def test_expired_events_leave_the_grid():
+    db, osint = _osint()
+    osint._upsert_many([_event("q1", TOKYO), _event("a1", LIMA, kind="aviation")])
+    osint.flush_writes()
+    assert _count(db, TOKYO) == 1 and _count(db, LIMA) == 1
+    now = datetime.now(timezone.utc)
+    for doc in db["osint_events"].docs:
+        doc["updated_at"] = now - timedelta(days=1)
+    # Aircraft expire after hours, quakes only after EVENT_RETENTION
+    assert osint.expire_events() == 1
+    osint.flush_writes()
+    assert [d["source_id"] for d in db["osint_events"].docs] == ["q1"]
+    assert _count(db, LIMA) == 0 and _count(db, TOKYO) == 1
+    db["osint_events"].docs[0]["updated_at"] = now - EVENT_RETENTION - timedelta(hours=1)
+    assert osint.expire_events() == 1
+    osint.flush_writes()
+    assert db["osint_events"].docs == [] and _count(db, TOKYO) == 0
+    # A forgotten hash means the quake is written again if it reappears
+    assert osint._upsert_many([_event("q1", TOKYO)]) == 1
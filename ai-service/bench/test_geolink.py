@@ -0,0 +1,77 @@
+"""Behaviour checks for linking located OSINT events to nearby tickers.
+
+Run from ai-service/:  python -m pytest -q bench
+"""
+from app.geolink import GeoLinker, haversine_km, quake_radius_km
+from bench.fakemongo import FakeDB
+
+SITES = [
+    ("AAPL", "Cupertino HQ", 37.3349, -122.0090),
+    ("NVDA", "TSMC Hsinchu foundry", 24.7736, 120.9996),
+    ("FJI", "Suva", -18.14, 178.44),
+]
+
+
+def _quake(lat, lon, mag):
+    return {"kind": "earthquake", "geo": {"type": "Point", "coordinates": [lon, lat]}, "metrics": {"magnitude": mag}}
+
+
+def _linker(countries=None):
+    linker = GeoLinker(FakeDB())
+    sectors = {"AAPL": "Technology", "NVDA": "Technology", "FJI": None, "TSM": "Technology", "ASML": "Technology", "XOM": "Energy"}
+    linker.load(SITES, sectors=sectors, countries=countries or {})
+    return linker
+
+
+def test_quake_radius_scales_with_magnitude():
+    assert quake_radius_km(4.0) == 25.0 and quake_radius_km(6.0) == 100.0
+    assert quake_radius_km(9.5) == 800.0 and quake_radius_km(None) == 50.0
+    assert round(haversine_km(0, 0, 0, 1)) == 111
+
+
+def test_enrich_links_sites_within_the_radius_nearest_first():
+    linker = _linker()
+    event = _quake(37.0, -121.9, 6.0)
+    linker.enrich(event)
+    assert event["related_tickers"] == ["AAPL"] and event["related_sectors"] == ["Technology"]
+    assert event["impacted_assets"][0]["precision"] == "site"
+    small = _quake(37.0, -121.9, 4.0)
+    linker.enrich(small)
+    assert small["related_tickers"] == []
+
+
+def test_sites_are_found_across_the_antimeridian():
+    hits = _linker().nearby(-18.0, -179.9, 200)
+    assert [h["ticker"] for h in hits] == ["FJI"]
+
+
+def test_profile_country_links_tickers_without_a_site():
+    linker = _linker({"TSM": "Taiwan", "NVDA": "Taiwan", "ASML": "Netherlands", "XOM": "USA"})
+    # NVDA has a site, so only TSM is placed by country; USA is too large to place
+    assert linker.country_tickers == {"Taiwan": ["TSM"], "Netherlands": ["ASML"]}
+    event = _quake(23.9, 121.6, 6.5)
+    linker.enrich(event)
+    assert event["related_tickers"] == ["NVDA", "TSM"]
+    assert [a["precision"] for a in event["impacted_assets"]] == ["site", "country"]
+
+
+def test_small_events_do_not_link_whole_countries():
+    linker = _linker({"ASML": "Netherlands"})
+    plane = {"kind": "aviation", "geo": {"type": "Point", "coordinates": [5.3, 52.2]}}
+    linker.enrich(plane)
+    assert plane["related_tickers"] == []
+
+
+def test_load_reads_sites_and_countries_from_mongo():
+    db = FakeDB()
+    db["fundamentals"].insert_many([
+        {"ticker": "tsm", "timeframe": "current", "metrics": {"sector": "Technology", "country": "Taiwan"}},
+        {"ticker": "AAPL", "timeframe": "current", "metrics": {"sector": "Technology", "country": "USA"}},
+        {"ticker": "OLD", "timeframe": "history", "metrics": {"country": "Taiwan"}},
+    ])
+    db["asset_locations"].insert_one({"ticker": "aapl", "label": "Austin campus", "lat": 30.4, "lon": -97.7})
+    linker = GeoLinker(db)
+    linker.refresh_if_stale()
+    assert linker.country_tickers == {"Taiwan": ["TSM"]}
+    assert [h["label"] for h in linker.nearby(30.4, -97.7, 10)] == ["Austin campus"]
+    assert set(linker.sectors) == {"TSM", "AAPL"}
@@ -0,0 +1,49 @@
+"""Behaviour checks for the headline keyword matcher and its tokenizer.
+
+Run from ai-service/:  python -m pytest -q bench
+"""
+from app.dedup import STOPWORDS, story_tokens
+from app.keywords import KeywordMatcher, tokenize
+
+
+def test_keywords_match_whole_words_only():
+    m = KeywordMatcher([("oil", 3), ("war", 5)])
+    assert m.find("Oil prices jump") == [("oil", 3)]
+    assert m.find("Toil and software awards") == []
+
+
+def test_keywords_match_phrases_and_plurals():
+    m = KeywordMatcher([("interest rate", "macro"), ("sanction", "geo")])
+    hits = m.find("Fed weighs interest rates as EU widens sanctions")
+    assert ("interest rate", "macro") in hits
+    assert ("sanction", "geo") in hits
+
+
+def test_keywords_report_each_keyword_once_with_every_payload():
+    m = KeywordMatcher([("strike", 5), ("strike", "Conflict")])
+    assert m.find("Strike after strike") == [("strike", 5), ("strike", "Conflict")]
+
+
+def test_keywords_remove_one_payload():
+    m = KeywordMatcher([("strike", 5), ("strike", "Conflict")])
+    m.remove("strike", "Conflict")
+    assert m.find("Rail strike") == [("strike", 5)]
+    m.remove("strike")
+    assert m.find("Rail strike") == []
+
+
+def test_tokenize_only_strips_plural_s():
+    assert tokenize("Iran's sanctions hit chips, cuts and says") == ["iran", "sanction", "hit", "chip", "cut", "and", "say"]
+    assert tokenize("This news: crisis, analysis, bonus, status, boss, gas") == [
+        "this", "news", "crisis", "analysis", "bonus", "status", "boss", "gas",
+    ]
+
+
+def test_keywords_do_not_hit_on_non_plural_s():
+    m = KeywordMatcher([("new", 1), ("thi", 2), ("statu", 3)])
+    assert m.find("This news changes the status quo") == []
+
+
+def test_stopwords_match_their_stemmed_tokens():
+    assert {"this", "say", "new"} <= STOPWORDS
+    assert story_tokens("This says news") == frozenset({"news"})
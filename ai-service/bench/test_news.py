@@ -0,0 +1,129 @@
+"""Behaviour checks for RSS feed fetching and parsing in the news module.
+
+Run from ai-service/:  python -m pytest -q bench
+"""
+import io
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, List
+
+import pytest
+import requests
+
+from app.news import WATERMARK_STOP_AFTER, NewsModule
+
+
+def _feed(items: List[Dict[str, Any]]) -> str:
+    body = "".join(
+        f"<item><title>{i['guid']}</title><link>https://x.test/{i['guid']}</link>"
+        f"<guid>{i['guid']}</guid><pubDate>{format_datetime(i['at'])}</pubDate></item>"
+        for i in items
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>{body}</channel></rss>'
+
+
+def _parse(items, seen=None, watermark=None) -> List[str]:
+    news = NewsModule.__new__(NewsModule)
+    return [i["guid"] for i in news._parse_rss(_feed(items), seen=seen, watermark=watermark)]
+
+
+T0 = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _naive(dt: datetime) -> datetime:
+    # Watermarks are naive UTC, as Mongo returns them
+    return dt.replace(tzinfo=None)
+
+
+def test_rss_returns_everything_without_state():
+    items = [{"guid": g, "at": T0 - timedelta(minutes=n)} for n, g in enumerate("abcde")]
+    assert _parse(items) == list("abcde")
+
+
+def test_rss_skips_seen_guids_but_keeps_old_unseen_items():
+    # "c" is older than the watermark yet unseen, so it is still returned
+    items = [
+        {"guid": "a", "at": T0},
+        {"guid": "b", "at": T0 - timedelta(hours=1)},
+        {"guid": "c", "at": T0 - timedelta(hours=5)},
+        {"guid": "d", "at": T0 - timedelta(minutes=5)},
+    ]
+    assert _parse(items, seen={"b"}, watermark=_naive(T0 - timedelta(hours=2))) == ["a", "c", "d"]
+
+
+def test_rss_stops_after_a_streak_of_seen_or_stale_items():
+    new = [{"guid": f"n{i}", "at": T0 - timedelta(minutes=i)} for i in range(2)]
+    known = [{"guid": f"k{i}", "at": T0 - timedelta(hours=3 + i)} for i in range(WATERMARK_STOP_AFTER)]
+    tail = [{"guid": "late", "at": T0 - timedelta(minutes=1)}]
+    seen = {i["guid"] for i in known}
+    # Stale-but-unseen items count toward the streak and are still returned
+    stale = [{"guid": f"s{i}", "at": T0 - timedelta(hours=3 + i)} for i in range(WATERMARK_STOP_AFTER)]
+    assert _parse(new + known + tail, seen=seen) == ["n0", "n1"]
+    assert _parse(new + stale + tail, watermark=_naive(T0 - timedelta(hours=2))) == ["n0", "n1"] + [i["guid"] for i in stale]
+
+
+def test_rss_streak_resets_on_a_fresh_item():
+    items = [
+        {"guid": "k0", "at": T0}, {"guid": "k1", "at": T0},
+        {"guid": "new", "at": T0},
+        {"guid": "k2", "at": T0}, {"guid": "k3", "at": T0},
+        {"guid": "end", "at": T0},
+    ]
+    assert _parse(items, seen={"k0", "k1", "k2", "k3"}) == ["new", "end"]
+
+
+# --- NewsModule._fetch_feed status handling ---
+
+class _Response:
+    def __init__(self, status: int, body: str = "", headers=None):
+        self.status_code = status
+        self.headers = headers or {}
+        self.raw = io.BytesIO(body.encode("utf-8"))
+        self.raw.decode_content = False
+        self.url = "https://x.test/feed"
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} for {self.url}", response=self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Session:
+    def __init__(self, response: _Response):
+        self.response = response
+        self.headers: List[Dict[str, str]] = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.headers.append(headers or {})
+        return self.response
+
+
+def _news(response: _Response, state=None) -> NewsModule:
+    news = NewsModule.__new__(NewsModule)
+    news.session = _Session(response)
+    news._feed_state = state or {}
+    return news
+
+
+def test_fetch_feed_returns_items_and_validators():
+    items = [{"guid": "a", "at": T0}]
+    news = _news(_Response(200, _feed(items), {"ETag": '"v1"'}))
+    name, url, got, validators = news._fetch_feed("Wire", "https://x.test/feed")
+    assert [i["guid"] for i in got] == ["a"] and validators == {"etag": '"v1"'}
+
+
+def test_fetch_feed_treats_304_as_unchanged():
+    news = _news(_Response(304), state={"https://x.test/feed": {"etag": '"v1"'}})
+    assert news._fetch_feed("Wire", "https://x.test/feed")[2] is None
+    assert news.session.headers == [{"If-None-Match": '"v1"'}]
+
+
+@pytest.mark.parametrize("status", [404, 503, 204])
+def test_fetch_feed_raises_on_other_statuses(status):
+    with pytest.raises(requests.HTTPError):
+        _news(_Response(status))._fetch_feed("Wire", "https://x.test/feed")
@@ -0,0 +1,114 @@
+"""Behaviour checks for the OSINT incremental watermarks.
+
+Run from ai-service/:  python -m pytest -q bench
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.osint import GDELT_WINDOW, USGS_OVERLAP, OSINTModule
+from app.snapshots import LocalSnapshotStore, SnapshotPublisher
+from app.writer import BatchWriter
+from bench.fakemongo import FakeDB
+
+
+def _osint():
+    db = FakeDB()
+    osint = OSINTModule(db, fetcher=object(), writer=BatchWriter(db, flush_interval_s=60),
+                        snapshots=SnapshotPublisher(LocalSnapshotStore()))
+    return db, osint
+
+
+def _ms(dt: datetime) -> float:
+    return dt.timestamp() * 1000
+
+
+def _quakes(*updated: datetime):
+    return {"features": [
+        {"id": f"q{i}", "properties": {"updated": _ms(u), "time": _ms(u), "mag": 4.5, "place": "somewhere"},
+         "geometry": {"coordinates": [139.7, 35.7, 10.0]}}
+        for i, u in enumerate(updated)
+    ]}
+
+
+def _stored_watermark(db: FakeDB, source: str):
+    doc = db["osint_watermarks"].find_one({"_id": source})
+    return doc and doc["event_time"]
+
+
+def test_usgs_watermark_moves_only_once_the_events_are_written():
+    db, osint = _osint()
+    t = datetime.now(timezone.utc) - timedelta(minutes=10)
+    assert osint._ingest_usgs(_quakes(t)) == 1
+    assert osint._watermark("USGS") is None
+    assert osint.flush_writes()
+    assert osint._watermark("USGS") == t
+    assert _stored_watermark(db, "USGS") == osint._watermark("USGS")
+
+
+def test_usgs_watermark_stays_when_the_write_fails():
+    db, osint = _osint()
+    t = datetime.now(timezone.utc) - timedelta(minutes=10)
+    db["osint_events"].failures.append(ValueError("write refused"))
+    osint._ingest_usgs(_quakes(t))
+    osint.flush_writes()
+    assert osint._watermark("USGS") is None and _stored_watermark(db, "USGS") is None
+    # The next poll still covers the quake and stores it
+    assert osint._ingest_usgs(_quakes(t)) == 1
+    osint.flush_writes()
+    assert [d["source_id"] for d in db["osint_events"].docs] == ["usgs:q0"]
+    assert osint._watermark("USGS") is not None
+
+
+def test_usgs_skips_events_not_updated_since_the_watermark():
+    db, osint = _osint()
+    t = datetime.now(timezone.utc) - timedelta(hours=1)
+    osint._watermarks["USGS"] = t
+    old, new = t - USGS_OVERLAP - timedelta(minutes=1), t + timedelta(minutes=1)
+    assert osint._ingest_usgs(_quakes(old, new)) == 1
+    osint.flush_writes()
+    assert [d["source_id"] for d in db["osint_events"].docs] == ["usgs:q1"]
+
+
+def test_usgs_watermark_waits_for_deferred_events():
+    db, osint = _osint()
+    t = datetime.now(timezone.utc) - timedelta(minutes=10)
+    osint._ingest_usgs(_quakes(t))
+    # Second poll before the first write is confirmed: the quake is deferred
+    later = t + timedelta(minutes=2)
+    assert osint._ingest_usgs(_quakes(later)) == 0
+    osint.flush_writes()
+    assert osint._watermark("USGS") < later
+
+
+def _gdelt_pages(osint, fail_at=None):
+    specs = osint._gdelt_request()
+    pages = []
+    for i, spec in enumerate(specs):
+        if i == fail_at:
+            pages.append(RuntimeError("refused"))
+            continue
+        start = datetime.strptime(spec["params"]["startdatetime"], "%Y%m%d%H%M%S")
+        pages.append({"articles": [{"url": f"https://x.test/{i}", "title": f"a{i}", "seendate": start.strftime("%Y%m%dT%H%M%SZ")}]})
+    return specs, pages
+
+
+def test_gdelt_watermark_covers_contiguous_windows_once_written():
+    db, osint = _osint()
+    osint._watermarks["GDELT"] = datetime.now(timezone.utc) - 3 * GDELT_WINDOW
+    specs, pages = _gdelt_pages(osint, fail_at=2)
+    assert osint._ingest_gdelt(pages, specs) == len(specs) - 1
+    before = osint._watermark("GDELT")
+    osint.flush_writes()
+    covered = datetime.strptime(specs[1]["params"]["enddatetime"], "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
+    assert before < covered == osint._watermark("GDELT")
+
+
+def test_gdelt_watermark_stays_when_the_write_fails():
+    db, osint = _osint()
+    start = datetime.now(timezone.utc) - 2 * GDELT_WINDOW
+    osint._watermarks["GDELT"] = start
+    specs, pages = _gdelt_pages(osint)
+    db["osint_events"].failures.append(ValueError("write refused"))
+    osint._ingest_gdelt(pages, specs)
+    osint.flush_writes()
+    assert osint._watermark("GDELT") == start
+    assert osint._gdelt_request()[0]["params"]["startdatetime"] == specs[0]["params"]["startdatetime"]
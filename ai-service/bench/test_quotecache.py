@@ -0,0 +1,123 @@
+"""Behaviour checks for the shared, single-flight Finviz quote-page cache.
+
+Run from ai-service/:  python -m pytest -q bench
+"""
+import threading
+import time
+
+import pytest
+
+from app.quotecache import QuoteCache, load_quote_page
+from app.ratelimit import RateLimiter
+
+
+def _cache(loader, **kwargs):
+    return QuoteCache(loader=loader, rate_limiter=RateLimiter(rate=1000, burst=1000), **kwargs)
+
+
+def _page(ticker):
+    return {"fundament": {"Ticker": ticker}, "news": []}
+
+
+def test_concurrent_gets_share_one_download():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def loader(ticker):
+        calls.append(ticker)
+        started.set()
+        release.wait(5)
+        return _page(ticker)
+
+    cache = _cache(loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("aapl"))) for _ in range(4)]
+    threads[0].start()
+    assert started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    # Followers are parked on the flight before the leader finishes
+    deadline = time.monotonic() + 5
+    while cache.stats["shared"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert calls == ["AAPL"] and len(results) == 4
+    assert cache.stats["misses"] == 1 and cache.stats["shared"] == 3
+    # Every caller got its own copy
+    results[0]["fundament"]["Ticker"] = "changed"
+    assert results[1]["fundament"]["Ticker"] == "AAPL"
+    assert cache.get("AAPL")["fundament"]["Ticker"] == "AAPL" and cache.stats["hits"] == 1
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    outcomes = [RuntimeError("blocked"), _page("X")]
+
+    def loader(ticker):
+        out = outcomes.pop(0)
+        if isinstance(out, Exception):
+            raise out
+        return out
+
+    cache = _cache(loader)
+    with pytest.raises(RuntimeError):
+        cache.get("X")
+    assert len(cache) == 0 and cache.stats["errors"] == 1
+    assert cache.get("X") == _page("X")
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    from app import quotecache
+    now = [100.0]
+    monkeypatch.setattr(quotecache.time, "monotonic", lambda: now[0])
+    calls = []
+    cache = _cache(lambda t: calls.append(t) or _page(t), ttl_s=60)
+    cache.get("A")
+    now[0] += 59
+    cache.get("A")
+    now[0] += 1
+    cache.get("A")
+    assert calls == ["A", "A"]
+
+
+def test_lru_eviction_and_size_for_the_universe():
+    cache = _cache(_page, max_entries=2)
+    for t in ("A", "B", "C"):
+        cache.get(t)
+    assert len(cache) == 2
+    cache.size_for(500)
+    cache.size_for(10)
+    assert cache.max_entries == 500
+    for t in ("D", "E", "F"):
+        cache.get(t)
+    assert len(cache) == 5
+
+
+class _Stock:
+    fundament = None
+    news = None
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+    def ticker_fundament(self):
+        if isinstance(self.fundament, Exception):
+            raise self.fundament
+        return self.fundament
+
+    def ticker_news(self):
+        if isinstance(self.news, Exception):
+            raise self.news
+        return self.news
+
+
+def test_load_quote_page_raises_when_no_table_extracts(monkeypatch):
+    monkeypatch.setattr("finvizfinance.quote.finvizfinance", _Stock)
+    monkeypatch.setattr(_Stock, "fundament", AttributeError("layout changed"))
+    monkeypatch.setattr(_Stock, "news", AttributeError("layout changed"))
+    with pytest.raises(ValueError, match="layout changed"):
+        load_quote_page("AAPL")
+    # One table is still worth caching
+    monkeypatch.setattr(_Stock, "fundament", {"P/E": "30"})
+    assert load_quote_page("AAPL") == {"fundament": {"P/E": "30"}, "news": None}
@@ -0,0 +1,73 @@
+"""Behaviour checks for the shared token-bucket rate limiters.
+
+Run from ai-service/:  python -m pytest -q bench
+"""
+import pytest
+
+from app import ratelimit
+from app.ratelimit import HostRateLimiter, RateLimiter
+
+
+class _Clock:
+    """Stands in for time.monotonic/time.sleep so waits are instant and exact."""
+
+    def __init__(self):
+        self.now = 100.0
+        self.slept = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept += seconds
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", c.monotonic)
+    monkeypatch.setattr(ratelimit.time, "sleep", c.sleep)
+    return c
+
+
+def test_burst_is_free_then_calls_are_paced(clock):
+    lim = RateLimiter(rate=2.0, burst=3)
+    for _ in range(3):
+        assert lim.acquire()
+    assert clock.slept == 0
+    for _ in range(4):
+        assert lim.acquire()
+    assert clock.slept == pytest.approx(2.0)
+
+
+def test_tokens_refill_up_to_the_burst_only(clock):
+    lim = RateLimiter(rate=1.0, burst=2)
+    for _ in range(2):
+        lim.acquire()
+    clock.now += 60
+    for _ in range(2):
+        lim.acquire()
+    assert clock.slept == 0
+    lim.acquire()
+    assert clock.slept == pytest.approx(1.0)
+
+
+def test_acquire_gives_up_at_the_timeout(clock):
+    lim = RateLimiter(rate=0.5, burst=1)
+    assert lim.acquire()
+    assert lim.acquire(timeout=1.0) is False
+    assert clock.slept == 0
+    assert lim.acquire(timeout=2.0)
+
+
+def test_hosts_get_separate_budgets(clock):
+    hosts = HostRateLimiter(default_rate=1.0, default_burst=1, limits={"finviz.com": (0.5, 1)})
+    assert hosts.limiter("https://finviz.com/quote.ashx?t=A") is hosts.limiter("finviz.com")
+    assert hosts.limiter("finviz.com").rate == 0.5
+    assert hosts.limiter("https://api.gdeltproject.org/x").rate == 1.0
+    hosts.acquire("https://finviz.com/a")
+    hosts.acquire("https://api.gdeltproject.org/x")
+    assert clock.slept == 0
+    hosts.acquire("https://finviz.com/b")
+    assert clock.slept == pytest.approx(2.0)
@@ -0,0 +1,94 @@
+"""Behaviour checks for the upstream record/replay layer used by the job benchmarks.
+
+Run from ai-service/:  python -m pytest -q bench
+"""
+import io
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from app import replay
+from app.fetcher import AsyncJSONFetcher, UpstreamHTTPError
+from app.replay import FixtureStore, ReplayMiss
+
+
+@pytest.fixture
+def installed():
+    yield
+    replay.uninstall()
+
+
+def test_lookup_is_exact_regardless_of_query_order(tmp_path):
+    store = FixtureStore(str(tmp_path))
+    store.save("get", "https://x.test/a?b=2&a=1", b"", 200, {}, payload={"n": 1})
+    assert store.lookup("GET", "https://x.test/a?a=1&b=2", b"")["json"] == {"n": 1}
+    assert store.stats["exact"] == 1
+    # A fresh store finds it on disk
+    assert FixtureStore(str(tmp_path)).lookup("GET", "https://x.test/a?b=2&a=1", b"")["json"] == {"n": 1}
+
+
+def test_lookup_falls_back_to_the_longest_path_prefix(tmp_path):
+    store = FixtureStore(str(tmp_path))
+    store.save("GET", "https://x.test/quote/AAPL", b"", 200, {}, content=b"aapl")
+    store.save("GET", "https://x.test/other", b"", 200, {}, content=b"other")
+    assert store.lookup("GET", "https://x.test/quote/ZZZZ?t=1", b"")["content"] == b"aapl"
+    assert store.stats["fallback"] == 1
+    with pytest.raises(ReplayMiss):
+        store.lookup("GET", "https://y.test/quote/AAPL", b"")
+    with pytest.raises(requests.ConnectionError):
+        store.lookup("POST", "https://x.test/quote/AAPL", b"")
+
+
+def test_record_then_replay_through_requests(tmp_path, monkeypatch, installed):
+    def live(self, request, *args, **kwargs):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = b"<rss>live</rss>"
+        resp.raw = io.BytesIO(resp._content)
+        resp.headers["Content-Type"] = "application/rss+xml"
+        resp.headers["Set-Cookie"] = "session=1"
+        resp.request = request
+        return resp
+
+    monkeypatch.setattr(HTTPAdapter, "send", live)
+    store = replay.install("record", str(tmp_path))
+    assert requests.get("https://feeds.test/rss", params={"q": "x"}).text == "<rss>live</rss>"
+    assert store.stats["recorded"] == 1
+    replay.uninstall()
+    assert HTTPAdapter.send is live
+
+    def offline(self, request, *args, **kwargs):
+        raise AssertionError("replay touched the network")
+
+    monkeypatch.setattr(HTTPAdapter, "send", offline)
+    replay.install("replay", str(tmp_path))
+    res = requests.get("https://feeds.test/rss?q=x")
+    assert res.text == "<rss>live</rss>" and res.raw.read() == b"<rss>live</rss>"
+    assert res.headers["Content-Type"] == "application/rss+xml" and "Set-Cookie" not in res.headers
+    replay.uninstall()
+    assert HTTPAdapter.send is offline
+
+
+def test_replay_serves_the_async_fetcher(tmp_path, installed):
+    store = FixtureStore(str(tmp_path))
+    store.save("GET", "https://api.test/coins?page=1", b"", 200, {}, payload=[{"id": "btc"}])
+    store.save("GET", "https://down.test/x", b"", 503, {}, content=b"")
+    replay.install("replay", str(tmp_path))
+    fetcher = AsyncJSONFetcher("test", max_retries=0)
+    try:
+        assert fetcher.request_json("api", "get", "https://api.test/coins", params={"page": 1}) == [{"id": "btc"}]
+        with pytest.raises(UpstreamHTTPError):
+            fetcher.request_json("down", "get", "https://down.test/x")
+    finally:
+        fetcher.close()
+
+
+def test_install_from_env(monkeypatch, tmp_path, installed):
+    monkeypatch.setenv("UPSTREAM_MODE", "live")
+    assert replay.install_from_env() is None
+    monkeypatch.setenv("UPSTREAM_MODE", "replay")
+    monkeypatch.setenv("UPSTREAM_FIXTURES", str(tmp_path))
+    assert isinstance(replay.install_from_env(), FixtureStore)
+    with pytest.raises(ValueError):
+        replay.install("bogus", str(tmp_path))
@@ -0,0 +1,65 @@
+"""Behaviour checks for the precomputed snapshot publisher.
+
+Run from ai-service/:  python -m pytest -q bench
+"""
+import json
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from app.snapshots import LocalSnapshotStore, SnapshotPublisher
+
+
+def _publisher():
+    store = LocalSnapshotStore()
+    messages = []
+    store.subscribe(lambda channel, message: messages.append((channel, json.loads(message))))
+    return store, SnapshotPublisher(store), messages
+
+
+def test_publish_stores_the_snapshot_and_notifies():
+    store, pub, messages = _publisher()
+    data = [{"_id": ObjectId("0123456789abcdef01234567"), "at": datetime(2026, 1, 1, tzinfo=timezone.utc), "score": float("nan")}]
+    assert pub.publish("news", data, limit=50) == 1
+    snap = pub.get("news")
+    assert snap["name"] == "news" and snap["version"] == 1 and snap["count"] == 1 and snap["limit"] == 50
+    assert snap["data"] == [{"_id": "0123456789abcdef01234567", "at": "2026-01-01T00:00:00.000Z", "score": None}]
+    assert messages == [("snapshots", {"name": "news", "version": 1})]
+
+
+def test_unchanged_data_is_not_republished():
+    store, pub, messages = _publisher()
+    pub.publish("sector", {"a": 1})
+    assert pub.publish("sector", {"a": 1}) is None
+    assert pub.publish("sector", {"a": 2}) == 2
+    assert pub.stats == {"published": 2, "unchanged": 1, "errors": 0}
+    assert [m[1]["version"] for m in messages] == [1, 2]
+
+
+def test_lost_key_is_republished_with_a_new_version():
+    store, pub, _ = _publisher()
+    pub.publish("map", [1, 2])
+    del store._data[pub.key("map")]
+    assert pub.publish("map", [1, 2]) == 2
+    assert pub.get("map")["data"] == [1, 2]
+
+
+def test_versions_keep_increasing_across_publishers():
+    store = LocalSnapshotStore()
+    assert SnapshotPublisher(store).publish("x", [1]) == 1
+    # A restarted process has no digests but shares the version counter
+    assert SnapshotPublisher(store).publish("x", [1]) == 2
+
+
+class _BrokenStore(LocalSnapshotStore):
+    def put(self, key, blob, channel, message):
+        raise ConnectionError("redis down")
+
+
+def test_store_failures_are_counted_not_raised():
+    pub = SnapshotPublisher(_BrokenStore())
+    assert pub.publish("news", [1]) is None
+    assert pub.stats["errors"] == 1 and pub.get("news") is None
+    # Nothing was stored, so the same data is tried again next time
+    pub.store = LocalSnapshotStore()
+    assert pub.publish("news", [1]) == 1
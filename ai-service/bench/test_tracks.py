@@ -0,0 +1,73 @@
+"""Behaviour checks for the OpenSky state parsing and bucketed track store.
+
+Run from ai-service/:  python -m pytest -q bench
+"""
+import numpy as np
+
+from app.tracks import TrackStore, parse_states, valid_positions
+from app.writer import BatchWriter
+from bench.fakemongo import FakeDB
+
+T0 = 1_767_268_800.0  # 2026-01-01 12:00 UTC, on an hour boundary
+
+
+def _state(icao, t, lon=10.0, lat=50.0, alt=9000.0, velocity=230.0, heading=90.0, callsign="DLH1  "):
+    return [icao, callsign, "Germany", t, t, lon, lat, alt, False, velocity, heading, None, None, None, None, False, 0]
+
+
+def _store(**kwargs):
+    db = FakeDB()
+    return db, TrackStore(db, writer=BatchWriter(db, flush_interval_s=60), **kwargs)
+
+
+def _record(store, states, now):
+    stats = store.record(parse_states(states), now_ts=now)
+    assert store.writer.flush(timeout=5)
+    return stats
+
+
+def test_parse_states_pads_missing_values():
+    cols = parse_states([_state("abc", T0, alt=None, callsign=None), ["short"], "junk"])
+    assert list(cols["icao24"]) == ["abc"] and list(cols["callsign"]) == [""]
+    assert np.isnan(cols["baro_altitude"][0]) and cols["lon"][0] == 10.0
+    assert len(parse_states(None)["icao24"]) == 0
+
+
+def test_valid_positions_drops_stale_and_unlocated_rows():
+    cols = parse_states([
+        _state("ok", T0),
+        _state("stale", T0 - 600),
+        _state("nolon", T0, lon=None),
+        _state("", T0),
+        _state("bad", T0, lat=95.0),
+    ])
+    assert list(cols["icao24"][valid_positions(cols, T0)]) == ["ok"]
+
+
+def test_record_writes_one_bucket_per_aircraft_and_downsamples():
+    db, store = _store(min_interval_s=60)
+    assert _record(store, [_state("a1", T0 + 10), _state("b2", T0 + 20)], T0 + 30)["written"] == 2
+    # 30s later: too soon for another point
+    stats = _record(store, [_state("a1", T0 + 40, lat=50.1)], T0 + 45)
+    assert stats == {"seen": 1, "written": 0, "skipped": 1}
+    _record(store, [_state("a1", T0 + 75, lat=50.2)], T0 + 80)
+    doc = db["osint_tracks"].find_one({"_id": f"a1:{int(T0)}"})
+    assert doc["n"] == 2 and [p[:2] for p in doc["points"]] == [[10, 50.0], [75, 50.2]]
+    assert doc["last"]["lat"] == 50.2 and doc["callsign"] == "DLH1"
+    assert len(db["osint_tracks"].docs) == 2
+
+
+def test_record_keeps_the_freshest_duplicate_and_opens_new_buckets():
+    db, store = _store(bucket_s=3600)
+    _record(store, [_state("a1", T0 + 3590, lat=1.0), _state("a1", T0 + 3595, lat=2.0)], T0 + 3600)
+    _record(store, [_state("a1", T0 + 3700, lat=3.0)], T0 + 3700)
+    docs = sorted(db["osint_tracks"].docs, key=lambda d: d["bucket"])
+    assert [d["_id"] for d in docs] == [f"a1:{int(T0)}", f"a1:{int(T0) + 3600}"]
+    assert [p[1] for p in docs[0]["points"]] == [2.0]
+    assert docs[1]["points"][0][0] == 100
+
+
+def test_record_forgets_aircraft_that_stopped_reporting():
+    _, store = _store(min_interval_s=60)
+    _record(store, [_state("a1", T0), _state("b2", T0 + 400)], T0 + 400)
+    assert list(store._ids) == ["b2"]
@@ -0,0 +1,140 @@
+"""Behaviour checks for the shared write-behind writer.
+
+Run from ai-service/:  python -m pytest -q bench
+"""
+from typing import Any, List
+
+from pymongo import DeleteMany
+from pymongo.errors import AutoReconnect, NetworkTimeout, ServerSelectionTimeoutError
+
+from app import writer as writer_module
+from app.writer import BatchWriter, WriteResult
+
+
+class _Result:
+    def __init__(self, n: int):
+        self.upserted_count = n
+        self.modified_count = 0
+        self.upserted_ids = {i: i for i in range(n)}
+
+
+class _Collection:
+    def __init__(self, db: "_DB"):
+        self.db = db
+
+    def bulk_write(self, ops, ordered=False):
+        self.db.calls.append(list(ops))
+        if self.db.failures:
+            raise self.db.failures.pop(0)
+        return _Result(len(ops))
+
+
+class _DB:
+    """Records every bulk_write; raises the queued `failures` on the next calls."""
+
+    def __init__(self, failures: List[Exception] = ()):
+        self.calls: List[List[Any]] = []
+        self.failures = list(failures)
+
+    def __getitem__(self, name):
+        return _Collection(self)
+
+
+def _written(db: _DB) -> List[Any]:
+    return [op for call in db.calls for op in call]
+
+
+def _no_backoff(monkeypatch) -> None:
+    monkeypatch.setattr(writer_module, "RETRY_BACKOFF_S", (0.0,))
+
+
+def test_writer_folds_set_updates_of_one_document():
+    db = _DB()
+    w = BatchWriter(db, flush_interval_s=60)
+    w.upsert("c", {"_id": 1}, {"$set": {"a": 1}, "$setOnInsert": {"created": 1, "b": 0}})
+    w.upsert("c", {"_id": 1}, {"$set": {"b": 2}, "$setOnInsert": {"created": 2}})
+    assert w.flush(timeout=5)
+    (op,) = _written(db)
+    # Later $set wins, the first $setOnInsert is kept, and no path is in both
+    assert op._doc == {"$set": {"a": 1, "b": 2}, "$setOnInsert": {"created": 1}}
+    assert w.stats["c"]["coalesced"] == 1
+
+
+def test_writer_replace_supersedes_queued_update():
+    db = _DB()
+    w = BatchWriter(db, flush_interval_s=60)
+    w.upsert("c", {"_id": 1}, {"$set": {"a": 1}})
+    w.replace("c", {"_id": 1}, {"_id": 1, "z": 9})
+    assert w.flush(timeout=5)
+    (op,) = _written(db)
+    assert op._doc == {"_id": 1, "z": 9}
+
+
+def test_writer_keeps_order_of_unmergeable_writes():
+    db = _DB()
+    w = BatchWriter(db, flush_interval_s=60)
+    w.upsert("c", {"_id": 1}, {"$set": {"a": 1}})
+    w.upsert("c", {"_id": 1}, {"$inc": {"n": 1}})
+    w.upsert("c", {"_id": 1}, {"$set": {"a": 2}})
+    assert w.flush(timeout=5)
+    docs = [op._doc for op in _written(db)]
+    assert docs == [{"$set": {"a": 1}}, {"$inc": {"n": 1}}, {"$set": {"a": 2}}]
+
+
+def test_writer_result_counts_only_its_own_writes():
+    db = _DB()
+    w = BatchWriter(db, flush_interval_s=60)
+    mine, other = WriteResult(), WriteResult()
+    w.upsert("c", {"_id": 1}, {"$set": {"a": 1}}, result=mine)
+    w.upsert("c", {"_id": 1}, {"$set": {"a": 2}}, result=mine)
+    w.upsert("c", {"_id": 2}, {"$set": {"a": 1}}, result=other)
+    assert w.flush(timeout=5)
+    assert (mine.ops, mine.written, mine.upserted, mine.ok) == (1, 1, 1, True)
+    assert (other.ops, other.written) == (1, 1)
+
+
+def test_writer_barrier_orders_a_delete_between_writes():
+    db = _DB()
+    w = BatchWriter(db, flush_interval_s=60)
+    w.upsert("c", {"_id": 1}, {"$inc": {"n": -1}})
+    w.write("c", DeleteMany({"n": {"$lte": 0}}), barrier=True)
+    w.upsert("c", {"_id": 2}, {"$inc": {"n": 1}})
+    assert w.flush(timeout=5)
+    # Three separate bulk writes, in queue order
+    assert [[type(op).__name__ for op in call] for call in db.calls] == [["UpdateOne"], ["DeleteMany"], ["UpdateOne"]]
+
+
+def test_writer_retries_a_chunk_the_server_never_saw(monkeypatch):
+    _no_backoff(monkeypatch)
+    db = _DB([ServerSelectionTimeoutError("no primary"), AutoReconnect("reset")])
+    w = BatchWriter(db, flush_interval_s=60)
+    result = WriteResult()
+    w.upsert("c", {"_id": 1}, {"$set": {"a": 1}}, result=result)
+    w.upsert("c", {"_id": 2}, {"$inc": {"n": 1}}, result=result)
+    assert w.flush(timeout=5)
+    # Every op is resent after server selection failed; after the reset only the $set is
+    assert [len(call) for call in db.calls] == [2, 2, 1]
+    assert (result.written, result.errors) == (1, 1)
+    assert w.stats["c"]["errors"] == 1
+
+
+def test_writer_reports_failure_after_the_last_attempt(monkeypatch):
+    _no_backoff(monkeypatch)
+    db = _DB([NetworkTimeout("timed out")] * writer_module.WRITE_ATTEMPTS)
+    w = BatchWriter(db, flush_interval_s=60)
+    result = WriteResult()
+    w.upsert("c", {"_id": 1}, {"$set": {"a": 1}}, result=result)
+    assert w.flush(timeout=5)
+    assert len(db.calls) == writer_module.WRITE_ATTEMPTS
+    assert result.done and not result.ok
+    assert w.stats["c"]["errors"] == 1
+
+
+def test_writer_does_not_retry_other_errors():
+    db = _DB([ValueError("bad document")])
+    w = BatchWriter(db, flush_interval_s=60)
+    result = WriteResult()
+    w.upsert("c", {"_id": 1}, {"$set": {"a": 1}}, result=result)
+    assert w.flush(timeout=5)
+    assert len(db.calls) == 1
+    assert (result.written, result.errors) == (0, 1)
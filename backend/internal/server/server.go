@@ -1,12 +1,15 @@
 package server
 
 import (
+	"context"
+	"encoding/json"
 	"fmt"
 	"log"
 	"scope-backend/internal/config"
 	"scope-backend/internal/services"
 	"scope-backend/internal/worker"
 
+	"sort"
 	"strconv"
 	"strings"
 	"time"
@@ -34,6 +37,7 @@ type Server struct {
 	sectorService   *services.SectorService
 	fundService     *services.FundamentalsService
 	redisClient     *redis.Client
+	snapshots       *services.SnapshotService
 }
 
 func NewServer(cfg *config.Config, db *gorm.DB, mongoDB *mongo.Database, redisClient *redis.Client, taskDistributor *worker.TaskDistributor, authService *services.AuthService, marketService *services.MarketService, newsService *services.NewsService, screenerService *services.ScreenerService, insiderService *services.InsiderService, sectorService *services.SectorService, fundService *services.FundamentalsService) *Server {
@@ -52,6 +56,14 @@ func NewServer(cfg *config.Config, db *gorm.DB, mongoDB *mongo.Database, redisCl
 		fundService:     fundService,
 		router:          gin.Default(),
 	}
+	if redisClient != nil {
+		// Precomputed views published by the ai-service; invalidated on push
+		s.snapshots = services.NewSnapshotService(redisClient)
+		go s.snapshots.Listen(context.Background())
+		if newsService != nil {
+			newsService.SetSnapshots(s.snapshots)
+		}
+	}
 
 	// Add CORS middleware
 	s.router.Use(func(c *gin.Context) {
@@ -90,6 +102,7 @@ func (s *Server) SetupRoutes() {
 			market.GET("/orderbook/:symbol", s.handleGetOrderBook)
 			market.GET("/movers", s.handleGetMovers)
 			market.GET("/candles/:symbol", s.handleGetCandles)
+			market.GET("/crypto/:coin/bars", s.handleGetCryptoBars)
 		}
 
 		news := v1.Group("/news")
@@ -111,6 +124,7 @@ func (s *Server) SetupRoutes() {
 		sector := v1.Group("/sector")
 		{
 			sector.GET("/", s.handleGetSectorPerformance)
+			sector.GET("/heatmap/:group", s.handleGetSectorHeatmap)
 		}
 
 		fundamentals := v1.Group("/fundamentals")
@@ -121,10 +135,108 @@ func (s *Server) SetupRoutes() {
 		monitor := v1.Group("/monitor")
 		{
 			monitor.GET("/feed", s.handleGetMonitorFeed)
+			monitor.GET("/grid", s.handleGetMonitorGrid)
+		}
+	}
+}
+
+// parseBBox parses "minLon,minLat,maxLon,maxLat".
+func parseBBox(raw string) ([4]float64, bool) {
+	var box [4]float64
+	parts := strings.Split(raw, ",")
+	if len(parts) != 4 {
+		return box, false
+	}
+	for i, p := range parts {
+		v, err := strconv.ParseFloat(strings.TrimSpace(p), 64)
+		if err != nil {
+			return box, false
 		}
+		box[i] = v
+	}
+	if box[0] >= box[2] || box[1] >= box[3] {
+		return box, false
+	}
+	return box, true
+}
+
+func bboxPolygon(box [4]float64) bson.M {
+	return bson.M{
+		"type": "Polygon",
+		"coordinates": [][][]float64{{
+			{box[0], box[1]}, {box[2], box[1]}, {box[2], box[3]}, {box[0], box[3]}, {box[0], box[1]},
+		}},
 	}
 }
 
+// snapshot returns the named ai-service snapshot, or nil when there is none
+// (callers then fall back to querying Mongo).
+func (s *Server) snapshot(c *gin.Context, name string) *services.Snapshot {
+	if s.snapshots == nil {
+		return nil
+	}
+	snap, err := s.snapshots.Get(c.Request.Context(), name)
+	if err != nil {
+		log.Printf("Snapshot %s unavailable: %v", name, err)
+		return nil
+	}
+	return snap
+}
+
+// latestNews serves the newest articles from the news_latest snapshot when it
+// holds enough of them, otherwise from Mongo.
+func (s *Server) latestNews(c *gin.Context, limit int64) ([]services.NewsArticle, error) {
+	if snap := s.snapshot(c, "news_latest"); snap != nil && snap.Covers(limit) {
+		if articles, err := s.newsService.LatestFromSnapshot(snap.Data, limit); err == nil {
+			return articles, nil
+		}
+	}
+	return s.newsService.GetLatestNews(c.Request.Context(), limit)
+}
+
+// handleGetMonitorGrid returns precomputed OSINT cell aggregates for one zoom level.
+func (s *Server) handleGetMonitorGrid(c *gin.Context) {
+	if s.mongoDB == nil {
+		c.JSON(503, gin.H{"error": "OSINT store unavailable"})
+		return
+	}
+	zoom, err := strconv.Atoi(c.DefaultQuery("zoom", "4"))
+	if err != nil {
+		zoom = 4
+	}
+	// Snap to the coarsest precomputed level at or above the requested zoom
+	levels := []int{2, 4, 6, 8, 10}
+	level := levels[len(levels)-1]
+	for _, l := range levels {
+		if zoom <= l {
+			level = l
+			break
+		}
+	}
+
+	filter := bson.M{"zoom": level, "count": bson.M{"$gt": 0}}
+	if box, ok := parseBBox(c.Query("bbox")); ok {
+		filter["center"] = bson.M{"$geoWithin": bson.M{"$geometry": bboxPolygon(box)}}
+	} else if snap := s.snapshot(c, fmt.Sprintf("osint_grid:%d", level)); snap != nil {
+		c.Data(200, "application/json; charset=utf-8", snap.Data)
+		return
+	}
+	opts := options.Find().
+		SetProjection(bson.M{"_id": 0, "quadkey": 1, "zoom": 1, "bbox": 1, "center": 1, "count": 1, "kinds": 1, "max_magnitude": 1}).
+		SetLimit(5000)
+	cursor, err := s.mongoDB.Collection("osint_grid").Find(c.Request.Context(), filter, opts)
+	if err != nil {
+		c.JSON(500, gin.H{"error": err.Error()})
+		return
+	}
+	var cells []bson.M
+	if err := cursor.All(c.Request.Context(), &cells); err != nil {
+		c.JSON(500, gin.H{"error": err.Error()})
+		return
+	}
+	c.JSON(200, gin.H{"zoom": level, "cells": cells})
+}
+
 func (s *Server) handleGetMonitorFeed(c *gin.Context) {
 	now := time.Now().UTC()
 	stream := c.DefaultQuery("stream", "news")
@@ -170,7 +282,7 @@ func (s *Server) handleGetMonitorFeed(c *gin.Context) {
 		if !after.IsZero() {
 			articles, err = s.newsService.GetLatestNewsAfter(c.Request.Context(), baseLimit, after)
 		} else {
-			articles, err = s.newsService.GetLatestNews(c.Request.Context(), baseLimit)
+			articles, err = s.latestNews(c, baseLimit)
 		}
 		if err == nil && len(articles) > 0 {
 			isBroadCategory := func(s string) bool {
@@ -289,6 +401,9 @@ func (s *Server) handleGetMonitorFeed(c *gin.Context) {
 		if !after.IsZero() {
 			filter["published_at"] = bson.M{"$gte": after}
 		}
+		if box, ok := parseBBox(c.Query("bbox")); ok {
+			filter["geo"] = bson.M{"$geoWithin": bson.M{"$geometry": bboxPolygon(box)}}
+		}
 
 		opts := options.Find().SetSort(bson.D{{Key: "published_at", Value: -1}}).SetLimit(limit)
 		cursor, err := s.mongoDB.Collection("osint_events").Find(c.Request.Context(), filter, opts)
@@ -544,6 +659,84 @@ func (s *Server) handleGetMovers(c *gin.Context) {
 	})
 }
 
+// handleGetCryptoBars reads OHLC bars for one CoinGecko coin from the bucketed
+// crypto_bars collection: one range read over (coin, interval, bucket).
+func (s *Server) handleGetCryptoBars(c *gin.Context) {
+	if s.mongoDB == nil {
+		c.JSON(503, gin.H{"error": "Crypto store unavailable"})
+		return
+	}
+	coin := strings.ToLower(c.Param("coin"))
+	interval := c.DefaultQuery("interval", "5m")
+	bucketSpan := map[string]time.Duration{
+		"1m": 24 * time.Hour,
+		"5m": 7 * 24 * time.Hour,
+		"1h": 90 * 24 * time.Hour,
+	}
+	span, ok := bucketSpan[interval]
+	if !ok {
+		c.JSON(400, gin.H{"error": "interval must be one of 1m, 5m, 1h"})
+		return
+	}
+
+	to := time.Now().UTC()
+	if t, err := time.Parse(time.RFC3339, c.Query("to")); err == nil {
+		to = t.UTC()
+	}
+	from := to.Add(-24 * time.Hour)
+	if t, err := time.Parse(time.RFC3339, c.Query("from")); err == nil {
+		from = t.UTC()
+	}
+
+	filter := bson.M{
+		"coin":     coin,
+		"interval": interval,
+		"bucket":   bson.M{"$gt": from.Add(-span), "$lte": to},
+	}
+	opts := options.Find().SetSort(bson.D{{Key: "bucket", Value: 1}})
+	cursor, err := s.mongoDB.Collection("crypto_bars").Find(c.Request.Context(), filter, opts)
+	if err != nil {
+		c.JSON(500, gin.H{"error": err.Error()})
+		return
+	}
+	var docs []struct {
+		Bucket     time.Time                     `bson:"bucket"`
+		BarSeconds int64                         `bson:"bar_seconds"`
+		Bars       map[string]map[string]float64 `bson:"bars"`
+	}
+	if err := cursor.All(c.Request.Context(), &docs); err != nil {
+		c.JSON(500, gin.H{"error": err.Error()})
+		return
+	}
+
+	bars := make([]gin.H, 0)
+	for _, d := range docs {
+		offsets := make([]int64, 0, len(d.Bars))
+		for k := range d.Bars {
+			if off, err := strconv.ParseInt(k, 10, 64); err == nil {
+				offsets = append(offsets, off)
+			}
+		}
+		sort.Slice(offsets, func(i, j int) bool { return offsets[i] < offsets[j] })
+		for _, off := range offsets {
+			b := d.Bars[strconv.FormatInt(off, 10)]
+			t := d.Bucket.Add(time.Duration(off*d.BarSeconds) * time.Second)
+			if t.Before(from) || t.After(to) {
+				continue
+			}
+			bars = append(bars, gin.H{
+				"time":  t.Format(time.RFC3339),
+				"open":  b["o"],
+				"high":  b["h"],
+				"low":   b["l"],
+				"close": b["c"],
+			})
+		}
+	}
+
+	c.JSON(200, gin.H{"coin": coin, "interval": interval, "bars": bars})
+}
+
 func (s *Server) handleGetCandles(c *gin.Context) {
 	symbol := c.Param("symbol")
 	timeframe := c.DefaultQuery("timeframe", "5m")
@@ -574,7 +767,7 @@ func (s *Server) handleGetLatestNews(c *gin.Context) {
 		limit = 20
 	}
 
-	news, err := s.newsService.GetLatestNews(c.Request.Context(), limit)
+	news, err := s.latestNews(c, limit)
 	if err != nil {
 		c.JSON(500, gin.H{"error": err.Error()})
 		return
@@ -663,6 +856,17 @@ func (s *Server) handleGetScreenerResults(c *gin.Context) {
 		limit = 50
 	}
 
+	if snap := s.snapshot(c, "screener"); snap != nil && strategy == "" && snap.Covers(limit) {
+		results := []services.ScreenerResult{}
+		if err := json.Unmarshal(snap.Data, &results); err == nil {
+			if int64(len(results)) > limit {
+				results = results[:limit]
+			}
+			c.JSON(200, results)
+			return
+		}
+	}
+
 	results, err := s.screenerService.GetScreenerResults(c.Request.Context(), strategy, limit)
 	if err != nil {
 		c.JSON(500, gin.H{"error": err.Error()})
@@ -700,6 +904,11 @@ func (s *Server) handleGetSectorPerformance(c *gin.Context) {
 		return
 	}
 
+	if snap := s.snapshot(c, "sector"); snap != nil {
+		c.Data(200, "application/json; charset=utf-8", snap.Data)
+		return
+	}
+
 	results, err := s.sectorService.GetSectorPerformance(c.Request.Context())
 	if err != nil {
 		log.Printf("Sector Error: %v", err)
@@ -710,6 +919,32 @@ func (s *Server) handleGetSectorPerformance(c *gin.Context) {
 	c.JSON(200, results)
 }
 
+func (s *Server) handleGetSectorHeatmap(c *gin.Context) {
+	if s.sectorService == nil {
+		c.JSON(503, gin.H{"error": "Sector service unavailable"})
+		return
+	}
+
+	group := strings.ToLower(c.Param("group"))
+	if cached := s.snapshot(c, "sector_heatmap:"+group); cached != nil {
+		c.Data(200, "application/json; charset=utf-8", cached.Data)
+		return
+	}
+
+	snap, err := s.sectorService.GetHeatmap(c.Request.Context(), group)
+	if err != nil {
+		log.Printf("Sector Heatmap Error: %v", err)
+		c.JSON(500, gin.H{"error": err.Error()})
+		return
+	}
+	if snap == nil {
+		c.JSON(404, gin.H{"error": "no heatmap found"})
+		return
+	}
+
+	c.JSON(200, snap)
+}
+
 func (s *Server) handleGetFundamentals(c *gin.Context) {
 	symbol := c.Param("symbol")
 	if s.fundService == nil {
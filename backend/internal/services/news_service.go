@@ -2,6 +2,8 @@ package services
 
 import (
 	"context"
+	"encoding/json"
+	"log"
 	"time"
 
 	"go.mongodb.org/mongo-driver/bson"
@@ -10,6 +12,13 @@ import (
 	"go.mongodb.org/mongo-driver/mongo/options"
 )
 
+// NewsSource is one outlet's copy of a story that was folded into a single article
+type NewsSource struct {
+	Source string `bson:"source" json:"source"`
+	URL    string `bson:"url" json:"url"`
+	Title  string `bson:"title" json:"title"`
+}
+
 type NewsArticle struct {
 	ID        primitive.ObjectID `bson:"_id,omitempty" json:"id"`
 	Title     string             `bson:"title" json:"title"`
@@ -20,10 +29,22 @@ type NewsArticle struct {
 	Sentiment float64            `bson:"sentiment" json:"sentiment"`
 	Tags      []string           `bson:"tags" json:"tags"`
 	Relevance int                `bson:"relevance,omitempty" json:"relevance,omitempty"`
+	Sources   []NewsSource       `bson:"sources,omitempty" json:"sources,omitempty"`
+}
+
+// fillDerived restores fields the ai-service no longer stores because they are
+// derivable from the rest of the document.
+func fillDerived(articles []NewsArticle) {
+	for i := range articles {
+		if articles[i].Content == "" && articles[i].Title != "" {
+			articles[i].Content = articles[i].Title + ". Read more at " + articles[i].URL
+		}
+	}
 }
 
 type NewsService struct {
 	collection *mongo.Collection
+	snapshots  *SnapshotService
 }
 
 func NewNewsService(db *mongo.Database) *NewsService {
@@ -32,10 +53,23 @@ func NewNewsService(db *mongo.Database) *NewsService {
 	}
 }
 
+// SetSnapshots lets article writes invalidate the ai-service's news_latest
+// snapshot, which would otherwise miss them until the next news job.
+func (s *NewsService) SetSnapshots(snapshots *SnapshotService) {
+	s.snapshots = snapshots
+}
+
 func (s *NewsService) CreateArticle(ctx context.Context, article *NewsArticle) error {
 	article.Timestamp = time.Now()
-	_, err := s.collection.InsertOne(ctx, article)
-	return err
+	if _, err := s.collection.InsertOne(ctx, article); err != nil {
+		return err
+	}
+	if s.snapshots != nil {
+		if err := s.snapshots.Invalidate(ctx, "news_latest"); err != nil {
+			log.Printf("Failed to invalidate news_latest snapshot: %v", err)
+		}
+	}
+	return nil
 }
 
 func (s *NewsService) GetLatestNews(ctx context.Context, limit int64) ([]NewsArticle, error) {
@@ -50,6 +84,21 @@ func (s *NewsService) GetLatestNews(ctx context.Context, limit int64) ([]NewsArt
 	if err := cursor.All(ctx, &articles); err != nil {
 		return nil, err
 	}
+	fillDerived(articles)
+	return articles, nil
+}
+
+// LatestFromSnapshot decodes the ai-service's news_latest snapshot and returns
+// its first `limit` articles, in the same form as GetLatestNews.
+func (s *NewsService) LatestFromSnapshot(data json.RawMessage, limit int64) ([]NewsArticle, error) {
+	articles := []NewsArticle{}
+	if err := json.Unmarshal(data, &articles); err != nil {
+		return nil, err
+	}
+	if int64(len(articles)) > limit {
+		articles = articles[:limit]
+	}
+	fillDerived(articles)
 	return articles, nil
 }
 
@@ -66,6 +115,7 @@ func (s *NewsService) GetLatestNewsAfter(ctx context.Context, limit int64, after
 	if err := cursor.All(ctx, &articles); err != nil {
 		return nil, err
 	}
+	fillDerived(articles)
 	return articles, nil
 }
 
@@ -83,5 +133,6 @@ func (s *NewsService) GetNewsByTag(ctx context.Context, tag string, limit int64)
 	if err := cursor.All(ctx, &articles); err != nil {
 		return nil, err
 	}
+	fillDerived(articles)
 	return articles, nil
 }
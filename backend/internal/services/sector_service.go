@@ -70,3 +70,42 @@ func (s *SectorService) GetSectorPerformance(ctx context.Context) ([]SectorPerfo
 
 	return results, nil
 }
+
+type HeatmapCell struct {
+	Name      string   `bson:"name" json:"name"`
+	Change    *float64 `bson:"change" json:"change"`
+	Intensity float64  `bson:"intensity" json:"intensity"`
+	MarketCap *float64 `bson:"market_cap" json:"market_cap"`
+	PE        *float64 `bson:"pe" json:"pe"`
+	ForwardPE *float64 `bson:"forward_pe" json:"forward_pe"`
+	Volume    *float64 `bson:"volume" json:"volume"`
+	Stocks    *float64 `bson:"stocks" json:"stocks"`
+}
+
+// SectorHeatmap is the precomputed snapshot the ai-service writes per grouping
+// (sector, industry, country, capitalization), keyed by _id.
+type SectorHeatmap struct {
+	ID           string        `bson:"_id" json:"id"`
+	Group        string        `bson:"group" json:"group"`
+	FetchedAt    time.Time     `bson:"fetched_at" json:"fetched_at"`
+	Count        int           `bson:"count" json:"count"`
+	MaxAbsChange float64       `bson:"max_abs_change" json:"max_abs_change"`
+	Advancers    int           `bson:"advancers" json:"advancers"`
+	Decliners    int           `bson:"decliners" json:"decliners"`
+	Cells        []HeatmapCell `bson:"cells" json:"cells"`
+}
+
+func (s *SectorService) GetHeatmap(ctx context.Context, group string) (*SectorHeatmap, error) {
+	var snap SectorHeatmap
+	err := s.collection.Database().Collection("sector_heatmaps").FindOne(ctx, bson.M{"_id": group}).Decode(&snap)
+	if err == mongo.ErrNoDocuments {
+		return nil, nil
+	}
+	if err != nil {
+		return nil, err
+	}
+	if snap.Cells == nil {
+		snap.Cells = []HeatmapCell{}
+	}
+	return &snap, nil
+}
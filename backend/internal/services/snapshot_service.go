@@ -0,0 +1,137 @@
+package services
+
+import (
+	"context"
+	"encoding/json"
+	"log"
+	"sync"
+	"time"
+
+	"github.com/redis/go-redis/v9"
+)
+
+const (
+	snapshotPrefix  = "snapshot:"
+	snapshotChannel = "snapshots"
+)
+
+// Snapshot is a precomputed "latest view" published by the ai-service after
+// each job (see ai-service/app/snapshots.py). Data is already in the JSON
+// shape of the endpoint it backs.
+type Snapshot struct {
+	Name        string          `json:"name"`
+	Version     int64           `json:"version"`
+	GeneratedAt time.Time       `json:"generated_at"`
+	Count       int             `json:"count"`
+	Limit       *int            `json:"limit"`
+	Data        json.RawMessage `json:"data"`
+}
+
+// Covers reports whether the snapshot can answer a request for `limit` rows:
+// either it holds that many, or it is not capped and so holds everything.
+func (s *Snapshot) Covers(limit int64) bool {
+	return limit <= int64(s.Count) || s.Limit == nil || s.Count < *s.Limit
+}
+
+type snapshotNotice struct {
+	Name    string `json:"name"`
+	Version int64  `json:"version"`
+}
+
+// SnapshotService serves snapshots from memory, fetching each from Redis once
+// and dropping it when the ai-service publishes a newer version.
+type SnapshotService struct {
+	redisClient *redis.Client
+	mu          sync.RWMutex
+	cache       map[string]*Snapshot
+}
+
+func NewSnapshotService(redisClient *redis.Client) *SnapshotService {
+	return &SnapshotService{
+		redisClient: redisClient,
+		cache:       make(map[string]*Snapshot),
+	}
+}
+
+// Get returns the named snapshot, or nil if none has been published.
+func (s *SnapshotService) Get(ctx context.Context, name string) (*Snapshot, error) {
+	s.mu.RLock()
+	snap, ok := s.cache[name]
+	s.mu.RUnlock()
+	if ok {
+		return snap, nil
+	}
+
+	raw, err := s.redisClient.Get(ctx, snapshotPrefix+name).Bytes()
+	if err == redis.Nil {
+		return nil, nil
+	}
+	if err != nil {
+		return nil, err
+	}
+	snap = &Snapshot{}
+	if err := json.Unmarshal(raw, snap); err != nil {
+		return nil, err
+	}
+
+	s.mu.Lock()
+	// A notification may have raced the fetch; keep whichever is newer
+	if cur, ok := s.cache[name]; !ok || cur.Version < snap.Version {
+		s.cache[name] = snap
+	}
+	s.mu.Unlock()
+	return snap, nil
+}
+
+// Invalidate drops the named snapshot for every reader after a write the
+// ai-service did not make. The key is deleted, so reads fall back to Mongo
+// until the ai-service next publishes it, and a newer version is announced so
+// other backend instances drop their cached copy too.
+func (s *SnapshotService) Invalidate(ctx context.Context, name string) error {
+	key := snapshotPrefix + name
+	version, err := s.redisClient.Incr(ctx, key+":version").Result()
+	if err != nil {
+		return err
+	}
+	notice, err := json.Marshal(snapshotNotice{Name: name, Version: version})
+	if err != nil {
+		return err
+	}
+	pipe := s.redisClient.TxPipeline()
+	pipe.Del(ctx, key)
+	pipe.Publish(ctx, snapshotChannel, notice)
+	_, err = pipe.Exec(ctx)
+
+	s.mu.Lock()
+	delete(s.cache, name)
+	s.mu.Unlock()
+	return err
+}
+
+// Listen invalidates cached snapshots on change notifications until ctx is done.
+func (s *SnapshotService) Listen(ctx context.Context) {
+	for ctx.Err() == nil {
+		sub := s.redisClient.Subscribe(ctx, snapshotChannel)
+		// Anything published while unsubscribed is unknown; start from a clean cache
+		s.mu.Lock()
+		s.cache = make(map[string]*Snapshot)
+		s.mu.Unlock()
+
+		for msg := range sub.Channel() {
+			var notice snapshotNotice
+			if err := json.Unmarshal([]byte(msg.Payload), &notice); err != nil {
+				continue
+			}
+			s.mu.Lock()
+			if cur, ok := s.cache[notice.Name]; ok && cur.Version < notice.Version {
+				delete(s.cache, notice.Name)
+			}
+			s.mu.Unlock()
+		}
+		sub.Close()
+		if ctx.Err() == nil {
+			log.Println("Snapshot subscription lost, reconnecting...")
+			time.Sleep(5 * time.Second)
+		}
+	}
+}